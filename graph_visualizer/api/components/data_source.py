@@ -1,16 +1,87 @@
+import io
+import os
+import shutil
+import tempfile
 from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Optional, Union
 from api.model.graph import Graph
 
+# a binary file object, or the file's bytes as chunks (e.g. Django's UploadedFile.chunks())
+Stream = Union[BinaryIO, Iterable[bytes]]
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only binary stream over an iterable of byte chunks; `tell()` counts the bytes read."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        self._position += n
+        return n
+
+    def tell(self) -> int:
+        return self._position
+
+
+def open_stream(source: Stream) -> BinaryIO:
+    """`source` as a binary file object: file objects pass through, chunk iterables are wrapped."""
+    if hasattr(source, "read"):
+        return source
+    return io.BufferedReader(ChunkReader(source), 1 << 16)
+
+
 class DataSourceService(ABC):
+    # set by callers that follow a load; loaders that support it call report_progress
+    progress: Optional[Callable[[Optional[int], Optional[int]], None]] = None
 
     @abstractmethod
     def load_data(self, file_path: str) -> Graph:
         pass
 
+    def load_stream(self, stream: Stream) -> Graph:
+        """
+        Builds the graph from a file's bytes as they are read. Loaders that
+        parse incrementally override this; the default writes the bytes to a
+        temporary file for `load_data`.
+        """
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(open_stream(stream), f)
+            return self.load_data(path)
+        finally:
+            os.remove(path)
+
     @abstractmethod
     def name(self) -> str:
         pass
 
     @abstractmethod
     def id(self) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    def config(self) -> Dict[str, Any]:
+        """Settings besides the file that decide the graph `load_data` builds; part of the loaded-graph cache key."""
+        return {}
+
+    def report_progress(self, bytes_read: Optional[int] = None, nodes: Optional[int] = None) -> None:
+        """
+        Passes (bytes of the file read, nodes built) to `progress`; None leaves
+        a value as it was. The callback may raise to abort the load.
+        """
+        if self.progress is not None:
+            self.progress(bytes_read, nodes)
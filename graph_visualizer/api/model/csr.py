@@ -0,0 +1,163 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+import numpy as np
+from api.model.edge import Edge
+from api.model.node import Node
+
+if TYPE_CHECKING:
+    from api.model.graph import Graph
+
+
+def _frozen(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+class CsrGraph:
+    """
+    Columnar, read-only storage of a graph's structure.
+
+    Nodes are numbered 0..n-1 (`node_ids` / `index_of` is the id <-> index
+    table). Outgoing edges of node `i` occupy the slots
+    `offsets[i]:offsets[i + 1]` of `targets` and `edge_type_codes`; codes map
+    to strings through `edge_types`. `sources` repeats the owning node index
+    for every slot, so `sources[k] -> targets[k]` is edge slot `k`.
+
+    All arrays are read-only and every accessor returns views into them.
+    The read side of the `Graph` API is implemented on top of the arrays, so a
+    `CsrGraph` can be handed to renderers and queries in place of a `Graph`.
+    """
+
+    def __init__(self, directed: bool, nodes: List[Node], edges: List[Edge],
+                 sources: np.ndarray, targets: np.ndarray, edge_type_codes: np.ndarray,
+                 edge_types: List[str], edge_positions: np.ndarray, version: int = 0):
+        n = len(nodes)
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=n)
+
+        self.directed = directed
+        self.version = version
+        self.edge_types = edge_types
+        self.node_ids = _frozen(np.array([node.id for node in nodes], dtype=object))
+        self.index_of: Dict[str, int] = {node.id: i for i, node in enumerate(nodes)}
+        self.offsets = _frozen(np.concatenate(([0], np.cumsum(counts))).astype(np.int64))
+        self.sources = _frozen(sources[order])
+        self.targets = _frozen(targets[order])
+        self.edge_type_codes = _frozen(edge_type_codes[order])
+        # slot -> position of the edge in the source graph's `edges` order
+        self.edge_positions = _frozen(edge_positions[order])
+        self.any_directed = directed or any(e.directed for e in edges)
+        self._nodes = nodes
+        self._edges = edges
+        self._in: Optional[tuple] = None
+        self._edge_by_id: Optional[Dict[str, Edge]] = None
+
+    @classmethod
+    def from_graph(cls, graph: "Graph") -> "CsrGraph":
+        nodes = list(graph.nodes)
+        index_of = {node.id: i for i, node in enumerate(nodes)}
+        type_codes: Dict[str, int] = {}
+        src, dst, codes, edges = [], [], [], []
+        for e in graph.edges:
+            i = index_of.get(e.from_node.id)
+            j = index_of.get(e.to_node.id)
+            if i is None or j is None:
+                continue
+            src.append(i); dst.append(j)
+            codes.append(type_codes.setdefault(e.type, len(type_codes)))
+            edges.append(e)
+        return cls(
+            graph.directed, nodes, edges,
+            np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+            np.array(codes, dtype=np.int32), list(type_codes),
+            np.arange(len(edges), dtype=np.int64), version=getattr(graph, "version", 0),
+        )
+
+    # --- array API ---
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def in_degree(self) -> np.ndarray:
+        return np.bincount(self.targets, minlength=self.num_nodes)
+
+    def out_neighbors(self, i: int) -> np.ndarray:
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def out_slots(self, i: int) -> range:
+        return range(self.offsets[i], self.offsets[i + 1])
+
+    def in_slots(self, i: int) -> np.ndarray:
+        """Edge slots pointing at node `i` (reverse index is built on first use)."""
+        if self._in is None:
+            order = _frozen(np.argsort(self.targets, kind="stable"))
+            counts = np.bincount(self.targets, minlength=self.num_nodes)
+            in_offsets = _frozen(np.concatenate(([0], np.cumsum(counts))).astype(np.int64))
+            self._in = (in_offsets, order)
+        in_offsets, order = self._in
+        return order[in_offsets[i]:in_offsets[i + 1]]
+
+    def node_mask(self, node_ids: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        idx = [self.index_of[i] for i in node_ids if i in self.index_of]
+        mask[idx] = True
+        return mask
+
+    def induced_slots(self, mask: np.ndarray) -> np.ndarray:
+        """Edge slots whose both endpoints are set in `mask`, in original edge order."""
+        slots = np.flatnonzero(mask[self.sources] & mask[self.targets])
+        return slots[np.argsort(self.edge_positions[slots], kind="stable")]
+
+    def node_at(self, i: int) -> Node:
+        return self._nodes[i]
+
+    def edge_at(self, slot: int) -> Edge:
+        return self._edges[self.edge_positions[slot]]
+
+    # --- Graph API (read-only) ---
+
+    @property
+    def nodes(self) -> List[Node]:
+        return self._nodes
+
+    @property
+    def edges(self) -> List[Edge]:
+        return self._edges
+
+    def get_node_by_id(self, node_id: str) -> Optional[Node]:
+        i = self.index_of.get(node_id)
+        return None if i is None else self._nodes[i]
+
+    def get_edge_by_id(self, edge_id: str) -> Optional[Edge]:
+        if self._edge_by_id is None:
+            self._edge_by_id = {e.id: e for e in self._edges}
+        return self._edge_by_id.get(edge_id)
+
+    def has_node(self, node_id: str) -> bool:
+        return node_id in self.index_of
+
+    def out_edges(self, node_id: str) -> List[Edge]:
+        i = self.index_of.get(node_id)
+        return [] if i is None else [self.edge_at(k) for k in self.out_slots(i)]
+
+    def in_edges(self, node_id: str) -> List[Edge]:
+        i = self.index_of.get(node_id)
+        return [] if i is None else [self.edge_at(k) for k in self.in_slots(i)]
+
+    def neighbors(self, node_id: str) -> List[Node]:
+        i = self.index_of.get(node_id)
+        if i is None:
+            return []
+        adjacent = np.concatenate((self.out_neighbors(i), self.sources[self.in_slots(i)]))
+        _, first = np.unique(adjacent, return_index=True)
+        return [self._nodes[j] for j in adjacent[np.sort(first)]]
+
+    def csr(self) -> "CsrGraph":
+        return self
@@ -1,35 +1,192 @@
-from typing import List, Optional
+import itertools
+import sys
+from typing import TYPE_CHECKING, Collection, Dict, Iterable, List, Optional
 from api.model.edge import Edge
 from api.model.node import Node
 
+if TYPE_CHECKING:
+    from api.model.csr import CsrGraph
+
+# distinguishes graphs in caches keyed by (graph, version)
+_uids = itertools.count()
+
 class Graph:
     def __init__(self, directed: bool):
         self.directed = directed
-        self.nodes: List[Node] = []
-        self.edges: List[Edge] = []
+        self.uid = next(_uids)
+        # id -> object maps (insertion ordered) plus per-node adjacency,
+        # node id -> {edge id -> edge} for outgoing and incoming edges
+        self._nodes: Dict[str, Node] = {}
+        self._edges: Dict[str, Edge] = {}
+        self._out: Dict[str, Dict[str, Edge]] = {}
+        self._in: Dict[str, Dict[str, Edge]] = {}
+        # bumped by every mutation; derived structures compare against it
+        self._version = 0
+        # bumped only when nodes or edges are added or removed; the CSR view compares against it
+        self._structure = 0
+        self._csr: Optional["CsrGraph"] = None
+        self._csr_structure = -1
+
+    @property
+    def nodes(self) -> Collection[Node]:
+        return self._nodes.values()
+
+    @property
+    def edges(self) -> Collection[Edge]:
+        return self._edges.values()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def structure_version(self) -> int:
+        """Like `version`, but unchanged by in-place node edits (`touch`)."""
+        return self._structure
+
+    def touch(self) -> None:
+        """Marks the graph as changed after a node was edited in place; its structure stays."""
+        self._version += 1
 
     def add_node(self, node: Node) -> None:
-        self.nodes.append(node)
+        self._nodes[node.id] = node
+        self._version += 1
+        self._structure += 1
 
     def add_edge(self, edge: Edge) -> None:
-        self.edges.append(edge)
+        if edge.id in self._edges:
+            self.remove_edge(self._edges[edge.id])
+        self._edges[edge.id] = edge
+        self._version += 1
+        self._structure += 1
+        # endpoints may be added after their edges (e.g. the XML loader)
+        self._out.setdefault(edge.from_node.id, {})[edge.id] = edge
+        self._in.setdefault(edge.to_node.id, {})[edge.id] = edge
+
+    def add_all(self, nodes: Iterable[Node], edges: Iterable[Edge]) -> None:
+        """Bulk `add_node`/`add_edge` for loaders; the version is bumped once."""
+        self._nodes.update((node.id, node) for node in nodes)
+        out, inc, by_id = self._out, self._in, self._edges
+        for edge in edges:
+            if edge.id in by_id:
+                self.add_edge(edge)
+                continue
+            by_id[edge.id] = edge
+            out.setdefault(edge.from_node.id, {})[edge.id] = edge
+            inc.setdefault(edge.to_node.id, {})[edge.id] = edge
+        self._version += 1
+        self._structure += 1
 
     def remove_node(self, node: Node) -> None:
-        self.nodes = [n for n in self.nodes if n.id != node.id]
-        
+        self._nodes.pop(node.id, None)
+        self._version += 1
+        self._structure += 1
+
         # remove all edges associated with that node
-        self.edges = [e for e in self.edges if e.from_node.id != node.id and e.to_node.id != node.id]
+        for edge in self._out.pop(node.id, {}).values():
+            self._edges.pop(edge.id, None)
+            self._in.get(edge.to_node.id, {}).pop(edge.id, None)
+        for edge in self._in.pop(node.id, {}).values():
+            self._edges.pop(edge.id, None)
+            self._out.get(edge.from_node.id, {}).pop(edge.id, None)
 
     def remove_edge(self, edge: Edge) -> None:
-        self.edges = [e for e in self.edges if e.id != edge.id]
+        edge = self._edges.pop(edge.id, None)
+        if edge is None:
+            return
+        self._version += 1
+        self._structure += 1
+        self._out.get(edge.from_node.id, {}).pop(edge.id, None)
+        self._in.get(edge.to_node.id, {}).pop(edge.id, None)
 
     def get_node_by_id(self, node_id: str) -> Optional[Node]:
-        return next((n for n in self.nodes if n.id == node_id), None)
+        return self._nodes.get(node_id)
 
     def get_edge_by_id(self, edge_id: str) -> Optional[Edge]:
-        return next((e for e in self.edges if e.id == edge_id), None)
+        return self._edges.get(edge_id)
+
+    def has_node(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def out_edges(self, node_id: str) -> Collection[Edge]:
+        return self._out.get(node_id, {}).values()
+
+    def in_edges(self, node_id: str) -> Collection[Edge]:
+        return self._in.get(node_id, {}).values()
+
+    def neighbors(self, node_id: str) -> List[Node]:
+        """Distinct nodes adjacent to `node_id`, regardless of edge direction."""
+        seen = {}
+        for e in self.out_edges(node_id):
+            seen.setdefault(e.to_node.id, e.to_node)
+        for e in self.in_edges(node_id):
+            seen.setdefault(e.from_node.id, e.from_node)
+        return list(seen.values())
+
+    def copy(self) -> "Graph":
+        """
+        Independent copy with the same ids, order and version: nodes and
+        edges are new objects, attribute values are shared (edits replace
+        values rather than change them in place).
+        """
+        out = Graph(self.directed)
+        clones = {}
+        for node_id, n in self._nodes.items():
+            clone = clones[node_id] = Node(n.name, node_id=node_id)
+            clone.attributes.update(n.attributes)
+        out.add_all(clones.values(), (Edge(e.directed, clones[e.from_node.id], clones[e.to_node.id], e.type,
+                                           edge_id=e.id) for e in self._edges.values()))
+        out._version, out._structure = self._version, self._structure
+        return out
+
+    def __getstate__(self):
+        # adjacency lists and the CSR cache are rebuilt on load
+        return {"directed": self.directed, "nodes": list(self._nodes.values()),
+                "edges": list(self._edges.values()), "version": self._version}
+
+    def __setstate__(self, state):
+        self.__init__(state["directed"])
+        self.add_all(state["nodes"], state["edges"])
+        self._version = self._structure = state["version"]
+
+    def csr(self) -> "CsrGraph":
+        """
+        Columnar (CSR) view of the current structure, backed by NumPy arrays.
+        Built on first use and rebuilt only after nodes or edges were added or
+        removed; it holds the node objects, so in-place edits show through.
+        """
+        if self._csr is None or self._csr_structure != self._structure:
+            from api.model.csr import CsrGraph
+            self._csr = CsrGraph.from_graph(self)
+            self._csr_structure = self._structure
+        self._csr.version = self._version
+        return self._csr
+
+    def set_csr(self, csr: "CsrGraph") -> None:
+        """Installs a CSR view built from other data (e.g. a snapshot) for the current structure."""
+        csr.version = self._version
+        self._csr = csr
+        self._csr_structure = self._structure
 
     def __str__(self):
         nodes_str = "\n".join(str(node) for node in self.nodes)
         edges_str = "\n".join(str(edge) for edge in self.edges)
-        return f"Nodes:\n{nodes_str}\n\nEdges:\n{edges_str}"
\ No newline at end of file
+        return f"Nodes:\n{nodes_str}\n\nEdges:\n{edges_str}"
+
+
+def approx_graph_bytes(g: "Graph", sample: int = 1000) -> int:
+    """Estimated memory held by the nodes and edges of `g`, extrapolated from a sample."""
+    def avg(items, size) -> float:
+        items = list(itertools.islice(items, sample))
+        return sum(size(x) for x in items) / len(items) if items else 0.0
+
+    def node_size(n: Node) -> int:
+        return (sys.getsizeof(n) + sys.getsizeof(n.id) + sys.getsizeof(n.name) + sys.getsizeof(n.attributes)
+                + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in n.attributes.items()))
+
+    def edge_size(e: Edge) -> int:
+        # the edge, its id, and its slots in the id map and both adjacency lists
+        return sys.getsizeof(e) + sys.getsizeof(e.id) + 3 * 8 + 2 * 24
+
+    n, m = len(g.nodes), len(g.edges)
+    return int(n * (avg(g.nodes, node_size) + 2 * 24) + m * avg(g.edges, edge_size))
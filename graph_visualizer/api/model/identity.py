@@ -0,0 +1,14 @@
+import itertools
+import uuid
+
+# Every Node/Edge gets a dense, process-wide integer index. Generated string
+# ids reuse it behind a per-process prefix, which keeps them unique across
+# processes (and across saved graphs) without calling uuid4() per object.
+_counter = itertools.count()
+_PREFIX = uuid.uuid4().hex[:8]
+
+def next_index() -> int:
+    return next(_counter)
+
+def generate_id(index: int) -> str:
+    return f"{_PREFIX}-{index}"
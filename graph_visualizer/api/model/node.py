@@ -1,19 +1,18 @@
-import uuid
 from typing import Any, Dict, Optional
+from api.model.identity import next_index, generate_id
 
 class Node:
-    _id_counter = 0
+    __slots__ = ("index", "id", "name", "attributes")
 
-    def __init__(self, name: str, node_id: Optional[str] = None, children=None):
+    def __init__(self, name: str, node_id: Optional[str] = None):
+        self.index = next_index()
         self.name = name
         self.attributes: Dict[str, Any] = {}
-        self.id = node_id if node_id else str(uuid.uuid4())
-        Node._id_counter += 1
-        self.children = children or []
+        self.id = node_id if node_id else generate_id(self.index)
 
     def add_attribute(self, name: str, value: Any) -> None:
         self.attributes[name] = value
 
     def __str__(self):
         attr_str = "\n".join(f"\t{k}: {v}" for k, v in self.attributes.items())
-        return f"{self.name} (ID: {self.id})\n{attr_str}"
\ No newline at end of file
+        return f"{self.name} (ID: {self.id})\n{attr_str}"
@@ -0,0 +1,125 @@
+from typing import TYPE_CHECKING, FrozenSet, Iterable, List, Optional, Union
+from api.model.edge import Edge
+from api.model.graph import Graph
+from api.model.node import Node
+
+if TYPE_CHECKING:
+    import numpy as np
+    from api.model.csr import CsrGraph
+
+
+class SubgraphView:
+    """
+    Read-only subgraph of `parent` induced by a set of node ids.
+
+    The view stores only the id set; nodes and edges are the parent's own
+    objects and are looked up through the parent's CSR form. It implements the
+    read side of the `Graph` API, so renderers and further queries accept it
+    like a `Graph`. `materialize()` returns an independent copy.
+    A view of a view is flattened onto the underlying graph.
+    """
+
+    def __init__(self, parent: Union[Graph, "SubgraphView"], node_ids: Iterable[str]):
+        if isinstance(parent, SubgraphView):
+            outer = parent._ids
+            node_ids = (i for i in node_ids if i in outer)
+            parent = parent.parent
+        self.parent: Graph = parent
+        self.directed = parent.directed
+        self._ids: FrozenSet[str] = frozenset(i for i in node_ids if parent.has_node(i))
+        self._cached_structure = -1
+        self._mask = None
+        self._nodes: List[Node] = []
+        self._edges: List[Edge] = []
+        self._csr: Optional["CsrGraph"] = None
+        self._csr_structure = -1
+
+    @property
+    def version(self) -> int:
+        return self.parent.version
+
+    @property
+    def structure_version(self) -> int:
+        return self.parent.structure_version
+
+    @property
+    def node_ids(self) -> FrozenSet[str]:
+        return self._ids
+
+    def _refresh(self) -> None:
+        if self._cached_structure == self.parent.structure_version:
+            return
+        import numpy as np
+        csr = self.parent.csr()
+        self._mask = csr.node_mask(self._ids)
+        self._mask.flags.writeable = False
+        self._nodes = [csr.node_at(i) for i in np.flatnonzero(self._mask)]
+        self._edges = [csr.edge_at(k) for k in csr.induced_slots(self._mask)]
+        self._cached_structure = self.parent.structure_version
+
+    def mask(self) -> "np.ndarray":
+        """Boolean mask over the parent's CSR node indices."""
+        self._refresh()
+        return self._mask
+
+    @property
+    def nodes(self) -> List[Node]:
+        self._refresh()
+        return self._nodes
+
+    @property
+    def edges(self) -> List[Edge]:
+        self._refresh()
+        return self._edges
+
+    def has_node(self, node_id: str) -> bool:
+        return node_id in self._ids and self.parent.has_node(node_id)
+
+    def get_node_by_id(self, node_id: str) -> Optional[Node]:
+        return self.parent.get_node_by_id(node_id) if node_id in self._ids else None
+
+    def get_edge_by_id(self, edge_id: str) -> Optional[Edge]:
+        e = self.parent.get_edge_by_id(edge_id)
+        if e and e.from_node.id in self._ids and e.to_node.id in self._ids:
+            return e
+        return None
+
+    def out_edges(self, node_id: str) -> List[Edge]:
+        if node_id not in self._ids:
+            return []
+        return [e for e in self.parent.out_edges(node_id) if e.to_node.id in self._ids]
+
+    def in_edges(self, node_id: str) -> List[Edge]:
+        if node_id not in self._ids:
+            return []
+        return [e for e in self.parent.in_edges(node_id) if e.from_node.id in self._ids]
+
+    def neighbors(self, node_id: str) -> List[Node]:
+        if node_id not in self._ids:
+            return []
+        return [n for n in self.parent.neighbors(node_id) if n.id in self._ids]
+
+    def csr(self) -> "CsrGraph":
+        if self._csr is None or self._csr_structure != self.structure_version:
+            from api.model.csr import CsrGraph
+            self._csr = CsrGraph.from_graph(self)
+            self._csr_structure = self.structure_version
+        self._csr.version = self.version
+        return self._csr
+
+    def materialize(self) -> Graph:
+        """Copies the view into a standalone `Graph` with its own nodes and edges."""
+        out = Graph(self.directed)
+        clones = {}
+        for n in self.nodes:
+            clone = Node(n.name, node_id=n.id)
+            for k, v in n.attributes.items(): clone.add_attribute(k, v)
+            out.add_node(clone); clones[n.id] = clone
+        for e in self.edges:
+            out.add_edge(Edge(e.directed, clones[e.from_node.id], clones[e.to_node.id], e.type, edge_id=e.id))
+        return out
+
+    def __str__(self):
+        nodes_str = "\n".join(str(node) for node in self.nodes)
+        edges_str = "\n".join(str(edge) for edge in self.edges)
+        return f"Nodes:\n{nodes_str}\n\nEdges:\n{edges_str}"
@@ -0,0 +1,90 @@
+import datetime as _dt
+from typing import Any, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+import numpy as np
+from api.model.graph import Graph
+
+# Typed groups a column is split into; everything else is evaluated per value.
+BOOL, INT, FLOAT, DATE, STR, OTHER = "bool", "int", "float", "date", "str", "other"
+
+
+class ColumnGroup:
+    """Values of one type: positions in the graph's CSR node order plus an array of values."""
+
+    def __init__(self, kind: str, positions: List[int], values: List[Any]):
+        self.kind = kind
+        self._sorted: Optional[np.ndarray] = None
+        self.positions = np.array(positions, dtype=np.int64)
+        if kind == BOOL:
+            self.values = np.array(values, dtype=bool)
+        elif kind == INT or kind == DATE:
+            self.values = np.array(values, dtype=np.int64)
+        elif kind == FLOAT:
+            self.values = np.array(values, dtype=np.float64)
+        else:
+            self.values = np.empty(len(values), dtype=object)
+            self.values[:] = values
+
+    def __len__(self):
+        return len(self.positions)
+
+    def sorted_values(self) -> np.ndarray:
+        """The values in ascending order (built on first use); the planner's statistics."""
+        if self._sorted is None:
+            self._sorted = np.sort(self.values)
+        return self._sorted
+
+
+class AttributeColumn:
+    """
+    One attribute of every node, pre-normalized the way filters read it
+    ("50" -> 50, "2024-01-01" -> date) and split into typed arrays.
+    Dates are stored as ordinals.
+    """
+
+    def __init__(self, g: Graph, attr: str):
+        from .search_filter import _normalize_left
+
+        self.attr = attr
+        collected: Dict[str, Tuple[List[int], List[Any]]] = {}
+        for pos, node in enumerate(g.csr().nodes):
+            if attr not in node.attributes:
+                continue
+            left = _normalize_left(node.attributes[attr])
+            kind = _kind_of(left)
+            if kind == DATE:
+                left = left.toordinal()
+            positions, values = collected.setdefault(kind, ([], []))
+            positions.append(pos); values.append(left)
+        self.groups: Dict[str, ColumnGroup] = {k: ColumnGroup(k, p, v) for k, (p, v) in collected.items()}
+        self.count = sum(len(grp) for grp in self.groups.values())
+
+
+def _kind_of(left: Any) -> str:
+    t = type(left)
+    if t is bool:
+        return BOOL
+    if t is int:
+        return INT if -2**63 <= left < 2**63 else OTHER
+    if t is float:
+        return FLOAT
+    if t is _dt.date:
+        return DATE
+    if t is str:
+        return STR
+    return OTHER
+
+
+_COLUMNS: "WeakKeyDictionary[Graph, Tuple[int, Dict[str, AttributeColumn]]]" = WeakKeyDictionary()
+
+
+def get_column(g: Graph, attr: str) -> AttributeColumn:
+    """Column of `attr` over `g`, built lazily and kept until `g` changes."""
+    version, columns = _COLUMNS.get(g, (None, None))
+    if version != g.version:
+        columns = {}
+        _COLUMNS[g] = (g.version, columns)
+    column: Optional[AttributeColumn] = columns.get(attr)
+    if column is None:
+        column = columns[attr] = AttributeColumn(g, attr)
+    return column
@@ -0,0 +1,192 @@
+import sys
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, AbstractSet, Any, Dict, Iterable, List, Optional, Set, Tuple
+from api.model.graph import Graph
+from api.model.node import Node
+from .attribute_columns import DATE, FLOAT, OTHER, _kind_of
+
+if TYPE_CHECKING:
+    from .search_filter import CompiledFilter
+
+
+class SortedAttributeIndex:
+    """
+    Index of one attribute: per value type, node ids sorted by value (queried
+    with bisect) and hash buckets value -> ids for equality.
+    Values no typed group can hold (None, lists, NaN, ...) are only tracked,
+    and their presence makes `evaluate` defer to the full filter scan.
+    """
+
+    def __init__(self, g: Graph, attr: str):
+        from .search_filter import _normalize_left
+
+        self.attr = attr
+        self._normalize = _normalize_left
+        self.version = g.version
+        self._keys: Dict[str, List[Any]] = {}
+        self._ids: Dict[str, List[str]] = {}
+        self._buckets: Dict[str, Dict[Any, List[str]]] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._entries: Dict[str, Tuple[str, Any]] = {}
+        self._unindexed: Set[str] = set()
+
+        typed = []
+        for entry in (self._entry(n) for n in g.nodes):
+            if entry is None:
+                continue
+            if entry[1] == OTHER:
+                self._register(*entry)
+            else:
+                typed.append(entry)
+        typed.sort(key=lambda e: (e[1], e[2], e[0]))
+        for node_id, kind, key in typed:
+            self._keys.setdefault(kind, []).append(key)
+            self._ids.setdefault(kind, []).append(node_id)
+            self._register(node_id, kind, key)
+
+    def _entry(self, node: Node) -> Optional[Tuple[str, str, Any]]:
+        if self.attr not in node.attributes:
+            return None
+        left = self._normalize(node.attributes[self.attr])
+        kind = _kind_of(left)
+        if kind == DATE:
+            left = left.toordinal()
+        if kind == FLOAT and left != left:  # NaN does not sort
+            kind = OTHER
+        return node.id, kind, left
+
+    def _register(self, node_id: str, kind: str, key: Any) -> None:
+        self._entries[node_id] = (kind, key)
+        if kind == OTHER:
+            self._unindexed.add(node_id)
+            return
+        self._members.setdefault(kind, set()).add(node_id)
+        self._buckets.setdefault(kind, {}).setdefault(key, []).append(node_id)
+
+    def _slot(self, kind: str, key: Any, node_id: str) -> int:
+        keys, ids = self._keys.setdefault(kind, []), self._ids.setdefault(kind, [])
+        lo, hi = bisect_left(keys, key), bisect_right(keys, key)
+        return bisect_left(ids, node_id, lo, hi)
+
+    def add(self, node: Node) -> None:
+        self.remove(node.id)
+        entry = self._entry(node)
+        if entry is None:
+            return
+        node_id, kind, key = entry
+        if kind != OTHER:
+            i = self._slot(kind, key, node_id)
+            self._keys[kind].insert(i, key)
+            self._ids[kind].insert(i, node_id)
+        self._register(node_id, kind, key)
+
+    def remove(self, node_id: str) -> None:
+        entry = self._entries.pop(node_id, None)
+        if entry is None:
+            return
+        kind, key = entry
+        if kind == OTHER:
+            self._unindexed.discard(node_id)
+            return
+        i = self._slot(kind, key, node_id)
+        del self._keys[kind][i]
+        del self._ids[kind][i]
+        self._members[kind].discard(node_id)
+        bucket = self._buckets[kind][key]
+        bucket.remove(node_id)
+        if not bucket:
+            del self._buckets[kind][key]
+
+    def _lookup(self, kind: str, op: str, right: Any) -> Iterable[str]:
+        if op == "==":
+            return self._buckets[kind].get(right, ())
+        if op == "!=":
+            return self._members[kind].difference(self._buckets[kind].get(right, ()))
+        keys, ids = self._keys[kind], self._ids[kind]
+        if op == ">":
+            return ids[bisect_right(keys, right):]
+        if op == ">=":
+            return ids[bisect_left(keys, right):]
+        if op == "<":
+            return ids[:bisect_left(keys, right)]
+        return ids[:bisect_right(keys, right)]
+
+    def evaluate(self, f: "CompiledFilter", scope: Optional[AbstractSet[str]] = None) -> Optional[Set[str]]:
+        """
+        Ids matching `f` within `scope` (all nodes when None), or None when
+        only the full scan can answer exactly: the attribute is missing, an
+        error would be raised, or unindexed values are involved.
+        """
+        if self._unindexed and (scope is None or not self._unindexed.isdisjoint(scope)):
+            return None
+        hits: Set[str] = set()
+        present = False
+        for kind, members in self._members.items():
+            if not members or (scope is not None and members.isdisjoint(scope)):
+                continue
+            present = True
+            right, message = f._right(kind)
+            if message:
+                return None
+            hits.update(self._lookup(kind, f.op, right))
+        if not present:
+            return None
+        return hits if scope is None else hits & scope
+
+    def __len__(self):
+        return len(self._entries)
+
+    def approx_bytes(self) -> int:
+        size = sys.getsizeof(self._entries) + sys.getsizeof(self._unindexed)
+        for kind in self._members:
+            size += sys.getsizeof(self._keys.get(kind, [])) + sys.getsizeof(self._ids.get(kind, []))
+            size += sys.getsizeof(self._members[kind]) + sys.getsizeof(self._buckets[kind])
+            size += sum(sys.getsizeof(b) for b in self._buckets[kind].values())
+        return size
+
+
+class AttributeIndexes:
+    """
+    The sorted attribute indexes of one workspace graph. Indexes are created
+    the first time an attribute is filtered (when `auto_create` is on) and kept
+    current by `sync`, which the workspace calls after every mutation.
+    """
+
+    def __init__(self, auto_create: bool = True):
+        self.auto_create = auto_create
+        self._indexes: Dict[str, SortedAttributeIndex] = {}
+
+    def get(self, g: Graph, attr: str) -> Optional[SortedAttributeIndex]:
+        index = self._indexes.get(attr)
+        if index is not None and index.version != g.version:
+            # the graph changed without a sync; start over
+            index = None
+        if index is None and (self.auto_create or attr in self._indexes):
+            index = self._indexes[attr] = SortedAttributeIndex(g, attr)
+        return index
+
+    def sync(self, g: Graph, since: int, node_ids: Iterable[str] = ()) -> None:
+        node_ids = list(node_ids)
+        for index in self._indexes.values():
+            if index.version != since:
+                continue
+            for node_id in node_ids:
+                node = g.get_node_by_id(node_id)
+                if node is None:
+                    index.remove(node_id)
+                else:
+                    index.add(node)
+            index.version = g.version
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"attr": attr, "entries": len(index), "bytes": index.approx_bytes()}
+            for attr, index in self._indexes.items()
+        ]
+
+    def drop(self, attr: Optional[str] = None) -> List[str]:
+        """Drops the index of `attr` (all indexes when None); returns the dropped names."""
+        dropped = list(self._indexes) if attr is None else [attr] if attr in self._indexes else []
+        for name in dropped:
+            del self._indexes[name]
+        return dropped
@@ -1,6 +1,7 @@
 from typing import Any, Dict
 from graph_visualizer.api.model.graph import Graph
 from api.model.node import Node
+from .search_index import sync_index
 
 def create_node(g: Graph, node_data: Dict[str, Any]) -> Graph:
     node_id = node_data.get('id')
@@ -17,5 +18,7 @@ def create_node(g: Graph, node_data: Dict[str, Any]) -> Graph:
         if key not in ['id', 'label']:
             new_node.add_attribute(key, value)
             
+    before = g.version
     g.add_node(new_node)
+    sync_index(g, before, [node_id])
     return g
\ No newline at end of file
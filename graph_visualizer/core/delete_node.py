@@ -1,6 +1,7 @@
 from typing import Any, Dict
 from graph_visualizer.api.model.graph import Graph
 from api.model.node import Node
+from .search_index import sync_index
 
 
 def delete_node(g: Graph, node_id: str) -> Graph:
@@ -9,6 +10,7 @@ def delete_node(g: Graph, node_id: str) -> Graph:
     if not node_to_delete:
         raise ValueError(f"Node with id '{node_id}' not found.")
     
+    before = g.version
     g.remove_node(node_to_delete)
-    
+    sync_index(g, before, [node_id])
     return g
\ No newline at end of file
@@ -0,0 +1,352 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from api.model.graph import Graph
+from api.model.node import Node
+from api.model.subgraph import SubgraphView
+from .attribute_columns import OTHER, get_column
+from .attribute_index import AttributeIndexes
+from .search_filter import CompiledFilter, FilterParseError, parse_filter
+
+# Boolean filter language:
+#   expr   := term (OR term)*
+#   term   := factor (AND factor)*
+#   factor := NOT factor | "(" expr ")" | <attr> <op> <value>
+# Keywords are case-insensitive. A value runs until the next keyword or
+# parenthesis; quote it to include those.
+
+_TOKEN = re.compile(r"""\s*(?:(?P<paren>[()])|(?P<op>==|!=|>=|<=|>|<)|(?P<quoted>"[^"]*"|'[^']*')|(?P<word>(?:[^\s()"'<>=!]|[!=](?!=))+))""")
+_ATTR = re.compile(r"^[A-Za-z_][\w\.\-]*$")
+_KEYWORDS = ("AND", "OR", "NOT")
+
+
+def _tokenize(expr: str) -> List[Tuple[str, str, int, int]]:
+    tokens, pos = [], 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if not m or m.end() == pos:
+            raise FilterParseError(f"Unexpected character at position {pos + 1}: {expr[pos:].strip()[:1]!r}")
+        kind = m.lastgroup
+        text, start = m.group(kind), m.start(kind)
+        if kind == "word" and text.upper() in _KEYWORDS:
+            kind, text = "keyword", text.upper()
+        tokens.append((kind, text, start, m.end()))
+        pos = m.end()
+    return tokens
+
+
+class Clause:
+    """Leaf of an expression: one compiled `<attr> <op> <value>` comparison."""
+
+    def __init__(self, f: CompiledFilter, text: str):
+        self.filter = f
+        self.text = text
+
+    def clauses(self) -> List["Clause"]:
+        return [self]
+
+    def matches(self, node: Node) -> bool:
+        return self.filter.matches(node)
+
+    def __str__(self):
+        return self.text
+
+
+class And:
+    def __init__(self, children: List[Any]):
+        self.children = children
+
+    def clauses(self) -> List[Clause]:
+        return [c for child in self.children for c in child.clauses()]
+
+    def matches(self, node: Node) -> bool:
+        return all(child.matches(node) for child in self.children)
+
+    def __str__(self):
+        return "(" + " AND ".join(str(c) for c in self.children) + ")"
+
+
+class Or(And):
+    def matches(self, node: Node) -> bool:
+        return any(child.matches(node) for child in self.children)
+
+    def __str__(self):
+        return "(" + " OR ".join(str(c) for c in self.children) + ")"
+
+
+class Not:
+    def __init__(self, child: Any):
+        self.child = child
+
+    def clauses(self) -> List[Clause]:
+        return self.child.clauses()
+
+    def matches(self, node: Node) -> bool:
+        return not self.child.matches(node)
+
+    def __str__(self):
+        return f"NOT {self.child}"
+
+
+class _Parser:
+    def __init__(self, expr: str):
+        self.expr = expr
+        self.tokens = _tokenize(expr)
+        self.i = 0
+
+    def peek(self, kind: str, text: Optional[str] = None) -> bool:
+        if self.i >= len(self.tokens):
+            return False
+        k, t, _, _ = self.tokens[self.i]
+        return k == kind and (text is None or t == text)
+
+    def parse(self):
+        if not self.tokens:
+            raise FilterParseError("Empty filter expression.")
+        node = self.expr_()
+        if self.i < len(self.tokens):
+            raise FilterParseError(f"Unexpected '{self.tokens[self.i][1]}' in filter expression.")
+        return node
+
+    def expr_(self):
+        children = [self.term()]
+        while self.peek("keyword", "OR"):
+            self.i += 1
+            children.append(self.term())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def term(self):
+        children = [self.factor()]
+        while self.peek("keyword", "AND"):
+            self.i += 1
+            children.append(self.factor())
+        return children[0] if len(children) == 1 else And(children)
+
+    def factor(self):
+        if self.peek("keyword", "NOT"):
+            self.i += 1
+            return Not(self.factor())
+        if self.peek("paren", "("):
+            self.i += 1
+            node = self.expr_()
+            if not self.peek("paren", ")"):
+                raise FilterParseError("Missing ')' in filter expression.")
+            self.i += 1
+            return node
+        return self.clause()
+
+    def clause(self):
+        start = self.i
+        if not self.peek("word") or not _ATTR.match(self.tokens[self.i][1]):
+            raise FilterParseError("Use: <attr> <op> <value> [AND|OR <attr> <op> <value> ...]")
+        attr = self.tokens[self.i][1]
+        self.i += 1
+        if not self.peek("op"):
+            raise FilterParseError(f"Expected an operator after '{attr}'.")
+        op = self.tokens[self.i][1]
+        self.i += 1
+        first = self.i
+        while self.peek("word") or self.peek("quoted"):
+            self.i += 1
+        if self.i == first:
+            raise FilterParseError(f"Expected a value after '{attr} {op}'.")
+        raw = self.expr[self.tokens[first][2]:self.tokens[self.i - 1][3]]
+        text = self.expr[self.tokens[start][2]:self.tokens[self.i - 1][3]]
+        return Clause(CompiledFilter(attr, op, raw), text)
+
+
+def is_compound(expr: str) -> bool:
+    """Whether `expr` uses boolean keywords or parentheses."""
+    try:
+        return any(kind in ("keyword", "paren") for kind, _, _, _ in _tokenize((expr or "").strip()))
+    except FilterParseError:
+        return False
+
+
+def is_spaced_value(expr: str) -> bool:
+    """
+    Whether `expr` reads as one `<attr> <op> <value>` clause whose value
+    holds a keyword ("title == Rock and Roll"): the value has keywords but
+    no operators or parentheses, which a malformed expression would have.
+    """
+    try:
+        kinds = {kind for kind, _, _, _ in _tokenize(parse_filter(expr)[2])}
+    except FilterParseError:
+        return False
+    return "keyword" in kinds and not kinds & {"op", "paren"}
+
+
+def parse_expression(expr: str):
+    """Parses a boolean filter expression into a tree of Clause/And/Or/Not."""
+    return _Parser((expr or "").strip()).parse()
+
+
+def _estimate(f: CompiledFilter, root: Graph) -> int:
+    """Estimated number of matching nodes of `root`, from the sorted column values."""
+    count = 0
+    for kind, group in get_column(root, f.attr).groups.items():
+        if kind == OTHER:
+            count += len(group)
+            continue
+        right, message = f._right(kind)
+        if message:
+            continue
+        values = group.sorted_values()
+        lo = int(np.searchsorted(values, right, side="left"))
+        hi = int(np.searchsorted(values, right, side="right"))
+        count += {
+            "==": hi - lo, "!=": len(values) - (hi - lo),
+            ">": len(values) - hi, ">=": len(values) - lo, "<": lo, "<=": hi,
+        }[f.op]
+    return count
+
+
+class FilterPlan:
+    """
+    Evaluation plan of a boolean filter over one graph.
+
+    Each clause's selectivity is estimated from attribute statistics; AND
+    children run most selective first and OR children least selective first,
+    and every child only sees the candidates that can still change the result.
+    Evaluation works on boolean masks over the CSR node order of the
+    underlying graph, so the whole expression yields one result view.
+    """
+
+    def __init__(self, tree, g: Graph, indexes: Optional[AttributeIndexes] = None):
+        self.tree = tree
+        self.g = g
+        self.root = g.parent if isinstance(g, SubgraphView) else g
+        self.indexes = indexes
+        self.total = max(self.root.csr().num_nodes, 1)
+        self.trace: List[Dict[str, Any]] = []
+        self._selectivity: Dict[int, float] = {}
+
+    def selectivity(self, node) -> float:
+        key = id(node)
+        if key not in self._selectivity:
+            if isinstance(node, Clause):
+                s = _estimate(node.filter, self.root) / self.total
+            elif isinstance(node, Not):
+                s = 1.0 - self.selectivity(node.child)
+            elif isinstance(node, Or):
+                miss = 1.0
+                for child in node.children:
+                    miss *= 1.0 - self.selectivity(child)
+                s = 1.0 - miss
+            else:
+                s = 1.0
+                for child in node.children:
+                    s *= self.selectivity(child)
+            self._selectivity[key] = s
+        return self._selectivity[key]
+
+    def validate(self, scope: Optional[np.ndarray]) -> None:
+        """
+        Checks every clause, in written order, against the whole input, so the
+        error raised does not depend on the chosen order or on short-circuiting.
+        """
+        for clause in self.tree.clauses():
+            _, present, error = clause.filter.scan(self.root, scope, compare=False)
+            clause.filter.check(present, error)
+
+    def _clause(self, f: CompiledFilter, candidates: np.ndarray) -> np.ndarray:
+        csr = self.root.csr()
+        index = self.indexes.get(self.root, f.attr) if self.indexes is not None else None
+        if index is not None:
+            scope = None if candidates.all() else set(csr.node_ids[candidates])
+            ids = index.evaluate(f, scope)
+            if ids is not None:
+                return csr.node_mask(ids) & candidates
+        mask = np.zeros(csr.num_nodes, dtype=bool)
+        mask[f.scan(self.root, candidates)[0]] = True
+        return mask
+
+    def evaluate(self, node, candidates: np.ndarray, depth: int = 0) -> np.ndarray:
+        step = {"node": str(node), "depth": depth, "estimate": round(self.selectivity(node) * self.total),
+                "candidates": int(candidates.sum())}
+        self.trace.append(step)
+        started = time.perf_counter()
+        if isinstance(node, Clause):
+            out = self._clause(node.filter, candidates)
+        elif isinstance(node, Not):
+            out = candidates & ~self.evaluate(node.child, candidates, depth + 1)
+        elif isinstance(node, Or):
+            out, remaining = np.zeros_like(candidates), candidates
+            for child in sorted(node.children, key=self.selectivity, reverse=True):
+                if not remaining.any():
+                    self._skip(child, depth + 1)
+                    continue
+                hit = self.evaluate(child, remaining, depth + 1)
+                out = out | hit
+                remaining = remaining & ~hit
+        else:
+            out = candidates
+            for child in sorted(node.children, key=self.selectivity):
+                if not out.any():
+                    self._skip(child, depth + 1)
+                    continue
+                out = self.evaluate(child, out, depth + 1)
+        step["rows"] = int(out.sum())
+        step["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return out
+
+    def _skip(self, node, depth: int) -> None:
+        self.trace.append({"node": str(node), "depth": depth, "skipped": True,
+                           "estimate": round(self.selectivity(node) * self.total)})
+
+    def run(self) -> SubgraphView:
+        scope = self.g.mask() if isinstance(self.g, SubgraphView) else None
+        self.validate(scope)
+        candidates = scope.copy() if scope is not None else np.ones(self.root.csr().num_nodes, dtype=bool)
+        mask = self.evaluate(self.tree, candidates)
+        return SubgraphView(self.g, self.root.csr().node_ids[mask])
+
+    def explain(self) -> List[str]:
+        """The executed plan, one line per step in evaluation order."""
+        lines = []
+        for step in self.trace:
+            pad = "  " * step["depth"]
+            if step.get("skipped"):
+                lines.append(f"{pad}{step['node']}  est={step['estimate']}  skipped")
+            else:
+                lines.append(f"{pad}{step['node']}  est={step['estimate']}  in={step['candidates']}"
+                             f"  out={step['rows']}  {step['ms']} ms")
+        return lines
+
+
+class CompoundFilter:
+    """A parsed boolean expression; `apply` plans and evaluates it in one pass."""
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def matches(self, node: Node) -> bool:
+        # every clause is checked first, so a node raises whatever the whole
+        # filter would raise for it regardless of short-circuiting
+        for clause in self.tree.clauses():
+            clause.filter.matches(node)
+        return self.tree.matches(node)
+
+    def attributes(self) -> Set[str]:
+        return {clause.filter.attr for clause in self.tree.clauses()}
+
+    def plan(self, g: Graph, indexes: Optional[AttributeIndexes] = None) -> FilterPlan:
+        return FilterPlan(self.tree, g, indexes)
+
+    def apply(self, g: Graph, indexes: Optional[AttributeIndexes] = None) -> SubgraphView:
+        return self.plan(g, indexes).run()
+
+
+def explain_filter(g: Graph, expr: str, indexes: Optional[AttributeIndexes] = None) -> Dict[str, Any]:
+    """Runs `expr` over `g` and reports the chosen clause order with per-step row counts and timings."""
+    plan = CompoundFilter(parse_expression(expr)).plan(g, indexes)
+    started = time.perf_counter()
+    result = plan.run()
+    return {
+        "expression": str(plan.tree),
+        "rows": len(result.node_ids),
+        "ms": round((time.perf_counter() - started) * 1000, 3),
+        "plan": plan.explain(),
+    }
@@ -0,0 +1,281 @@
+"""
+Process-wide cache of loaded graphs.
+
+A graph is keyed by (loader id, loader config, SHA-256 of the file), so the
+same bytes opened again, under any name, skip the loader. The file hash is
+memoized per (path, size, mtime), and only changed files are read again.
+Cached graphs are shared by every workspace opened on them and must not be
+mutated: workspaces get them with `shared=True` and copy before their first
+edit. A workspace holds its entry until then (or until it spills or
+closes), and held entries are never evicted, so every graph in use stays
+accounted for. With a `disk_dir` (or GRAPH_EXPLORER_GRAPH_CACHE_DIR) graphs
+are also written there as snapshots, which other processes and later runs
+load by memory-mapping instead of parsing the source.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from api.components.data_source import DataSourceService, Stream, open_stream
+from api.model.graph import Graph, approx_graph_bytes
+from .snapshot import SnapshotError, load_graph, save_graph
+
+# estimated bytes of graphs kept in memory; override with GRAPH_EXPLORER_GRAPH_CACHE_BYTES
+DEFAULT_CACHE_BYTES = 1024 ** 3
+# bytes of snapshots kept in the disk tier; override with GRAPH_EXPLORER_GRAPH_CACHE_DISK_BYTES
+DEFAULT_DISK_BYTES = 8 * 1024 ** 3
+# memoized file hashes; uploads land in a new temporary path each time
+_HASHES = 1024
+
+Key = Tuple[str, str, str]
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _HashingReader(io.RawIOBase):
+    """Passes a binary stream through, hashing what is read; `tell()` counts the bytes."""
+
+    def __init__(self, f):
+        self._f = f
+        self._digest = hashlib.sha256()
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._f.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self._digest.update(data)
+        self._position += n
+        return n
+
+    def tell(self) -> int:
+        return self._position
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class GraphCache:
+    """
+    LRU of loaded graphs bounded by `max_bytes` (approximate graph size).
+    Concurrent loads of one key wait for the first instead of parsing too.
+    Entries held by workspaces stay and may exceed the bound; the workspaces
+    count them in their memory estimate and release them when spilled.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, disk_dir: Optional[str] = None,
+                 max_disk_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("GRAPH_EXPLORER_GRAPH_CACHE_BYTES", DEFAULT_CACHE_BYTES))
+        if max_disk_bytes is None:
+            max_disk_bytes = int(os.environ.get("GRAPH_EXPLORER_GRAPH_CACHE_DISK_BYTES", DEFAULT_DISK_BYTES))
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = disk_dir or os.environ.get("GRAPH_EXPLORER_GRAPH_CACHE_DIR") or None
+        self._entries: "OrderedDict[Key, Tuple[Graph, int]]" = OrderedDict()
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._loading: Dict[Key, threading.Lock] = {}
+        self._holds: Dict[Key, int] = {}
+        # id(graph) -> key, for the graphs in _entries
+        self._keys: Dict[int, Key] = {}
+        self.bytes = 0
+        self.hits = self.disk_hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, loader: DataSourceService, file_path: str) -> Key:
+        st = os.stat(file_path)
+        stamp = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(stamp)
+        if digest is None:
+            digest = _file_hash(file_path)
+            with self._lock:
+                self._hashes[stamp] = digest
+                if len(self._hashes) > _HASHES:
+                    self._hashes.popitem(last=False)
+        return self._key(loader, digest)
+
+    def _key(self, loader: DataSourceService, digest: str) -> Key:
+        return loader.id(), json.dumps(loader.config(), sort_keys=True, default=str), digest
+
+    def load(self, loader: DataSourceService, file_path: str) -> Graph:
+        """The graph `loader` builds from `file_path`, from the cache when possible. Do not mutate it."""
+        key = self.key(loader, file_path)
+        with self._lock:
+            graph = self._get(key)
+            if graph is not None:
+                return graph
+            loading = self._loading.setdefault(key, threading.Lock())
+        try:
+            with loading:
+                with self._lock:
+                    graph = self._get(key)
+                if graph is not None:
+                    return graph
+                graph = self._load_disk(key)
+                if graph is None:
+                    graph = loader.load_data(file_path)
+                    with self._lock:
+                        self.misses += 1
+                    self._save_disk(key, graph)
+                self._put(key, graph)
+                return graph
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def load_stream(self, loader: DataSourceService, stream: Stream) -> Graph:
+        """
+        The graph `loader` builds from a byte stream. The hash is only known
+        once the stream is parsed; if an equal graph is cached by then, that
+        one is returned and the new one dropped, so workspaces still share
+        one copy. Do not mutate it.
+        """
+        reader = _HashingReader(open_stream(stream))
+        graph = loader.load_stream(io.BufferedReader(reader, 1 << 16))
+        # whatever the loader left unread (trailing whitespace) still counts
+        for _ in iter(lambda: reader.read(1 << 20), b""):
+            pass
+        key = self._key(loader, reader.hexdigest())
+        with self._lock:
+            cached = self._get(key)
+            if cached is not None:
+                return cached
+            self.misses += 1
+        if self.disk_dir and not os.path.exists(self._disk_path(key)):
+            self._save_disk(key, graph)
+        self._put(key, graph)
+        return graph
+
+    def _get(self, key: Key) -> Optional[Graph]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _put(self, key: Key, graph: Graph) -> None:
+        size = approx_graph_bytes(graph)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+                self._keys.pop(id(old[0]), None)
+            self._entries[key] = (graph, size)
+            self._keys[id(graph)] = key
+            self.bytes += size
+            self._shrink()
+
+    def _shrink(self) -> None:
+        """Evicts the least recently used entries no workspace holds until the cache fits."""
+        for key in list(self._entries):
+            if self.bytes <= self.max_bytes:
+                break
+            if key not in self._holds:
+                graph, size = self._entries.pop(key)
+                del self._keys[id(graph)]
+                self.bytes -= size
+
+    def get(self, key: Key) -> Optional[Graph]:
+        """The cached graph of `key`, or None; nothing is loaded."""
+        with self._lock:
+            return self._get(key)
+
+    def hold(self, graph: Graph) -> Optional[Key]:
+        """
+        Keeps the entry of `graph` from eviction until `release`; returns its
+        key, or None if `graph` is not (or no longer) cached.
+        """
+        with self._lock:
+            key = self._keys.get(id(graph))
+            if key is None or self._entries[key][0] is not graph:
+                return None
+            self._holds[key] = self._holds.get(key, 0) + 1
+            return key
+
+    def release(self, key: Key) -> None:
+        with self._lock:
+            count = self._holds.pop(key, 0) - 1
+            if count > 0:
+                self._holds[key] = count
+            else:
+                self._shrink()
+
+    def _disk_path(self, key: Key) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256("\0".join(key).encode()).hexdigest() + ".gvs")
+
+    def _load_disk(self, key: Key) -> Optional[Graph]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            graph = load_graph(path)
+        except (OSError, SnapshotError):
+            # missing or unreadable (e.g. written by an older version): load the source and replace it
+            return None
+        os.utime(path)
+        with self._lock:
+            self.disk_hits += 1
+        return graph
+
+    def _save_disk(self, key: Key, graph: Graph) -> None:
+        if not self.disk_dir:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            save_graph(graph, tmp)
+            os.replace(tmp, self._disk_path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Removes the least recently used snapshots beyond `max_disk_bytes`."""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".gvs"):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._hashes.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "held": len(self._holds), "bytes": self.bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+GRAPH_CACHE = GraphCache()
@@ -0,0 +1,270 @@
+"""
+Dataset loads run as background jobs.
+
+A job loads a file, or a byte stream such as an upload still arriving
+(see BytePipe), through the GraphCache and adds the graph to its
+WorkspaceManager as a new, active workspace when done. File loads share a
+small thread pool; a stream gets a thread of its own, since it advances
+only as fast as its bytes arrive and must not hold up the file loads (its
+writer, e.g. a request thread, bounds how many there are).
+Loaders report progress through DataSourceService.progress; cancelling a
+running job makes the next report raise LoadCancelled inside the loader.
+Threads rather than processes, since the graph has to end up in this
+process; a job is only known to the process that runs it.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+from api.components.data_source import ChunkReader, DataSourceService, Stream
+from .graph_cache import GRAPH_CACHE, GraphCache
+
+# concurrent loads per process; override with GRAPH_EXPLORER_LOAD_WORKERS
+LOAD_WORKERS = 2
+# seconds a finished job stays queryable
+KEEP_FINISHED = 600
+# seconds a stream may go without progress on either end, and a held job may wait for release()
+STREAM_TIMEOUT = 60.0
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class BytePipe(ChunkReader):
+    """
+    Byte stream written by one thread and read by another, e.g. an upload
+    handed to a loader while it arrives. `put` blocks while `max_chunks` are
+    unread, so only those are held in memory; once the pipe is closed, put
+    chunks are dropped and reads raise. A side left waiting `timeout`
+    seconds for the other closes the pipe with a TimeoutError.
+    """
+
+    def __init__(self, max_chunks: int = 16, timeout: float = STREAM_TIMEOUT):
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(max_chunks)
+        self._closed = threading.Event()
+        self._error: Optional[Exception] = None
+        self.timeout = timeout
+        super().__init__(iter(self._next, None))
+
+    def _next(self) -> Optional[bytes]:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                return self._queue.get(timeout=0.2)
+            except queue.Empty:
+                if not self._closed.is_set() and time.monotonic() > deadline:
+                    self.abort(TimeoutError(f"No data arrived for {self.timeout:g} seconds"))
+                if self._closed.is_set():
+                    raise self._error
+
+    def put(self, chunk: bytes) -> None:
+        deadline = time.monotonic() + self.timeout
+        while not self._closed.is_set():
+            try:
+                return self._queue.put(chunk, timeout=0.2)
+            except queue.Full:
+                if time.monotonic() > deadline:
+                    self.abort(TimeoutError(f"The data was not read for {self.timeout:g} seconds"))
+
+    def finish(self) -> None:
+        """Marks the end of the stream."""
+        self.put(None)
+
+    def abort(self, error: Optional[Exception] = None) -> None:
+        """Ends the stream early; the reader gets `error` once it has read what was put."""
+        if not self._closed.is_set():
+            self._error = error or ValueError("The stream was closed before it was complete")
+            self._closed.set()
+
+    def close(self) -> None:
+        self.abort()
+        super().close()
+
+
+class LoadJob:
+    """
+    Loads `source`, a file path or a Stream. A `held` job parses as usual but
+    adds its workspace only after `release()`, so the caller can still
+    decide against it (e.g. an upload whose request fails validation); one
+    not released within STREAM_TIMEOUT of being parsed is cancelled.
+    """
+
+    def __init__(self, manager, loader: DataSourceService, source: Union[str, Stream], name: str,
+                 total_bytes: Optional[int] = None, held: bool = False):
+        self.id = uuid.uuid4().hex
+        self.manager = manager
+        self.loader = loader
+        self.source = source
+        self.file_path = source if isinstance(source, str) else None
+        self.name = name
+        # 0 when a stream's length is unknown
+        self.total_bytes = os.path.getsize(source) if self.file_path else total_bytes or 0
+        self.bytes_read = 0
+        self.nodes = 0
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.wspace_id: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._released = threading.Event()
+        if not held:
+            self._released.set()
+        self._future = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def held(self) -> bool:
+        return not self._released.is_set()
+
+    def release(self) -> None:
+        """Lets a held job add its workspace."""
+        self._released.set()
+
+    def _progress(self, bytes_read: Optional[int], nodes: Optional[int]) -> None:
+        if self._cancel.is_set():
+            raise LoadCancelled()
+        if bytes_read is not None:
+            self.bytes_read = bytes_read
+        if nodes is not None:
+            self.nodes = nodes
+
+    def _run(self, cache: GraphCache) -> None:
+        if self._cancel.is_set():
+            return self._finish(CANCELLED)
+        self.status = RUNNING
+        self.loader.progress = self._progress
+        try:
+            if self.file_path:
+                graph = cache.load(self.loader, self.file_path)
+            else:
+                graph = cache.load_stream(self.loader, self.source)
+                if not self.total_bytes and hasattr(self.source, "tell"):
+                    self.total_bytes = self.source.tell()
+            if not self._released.wait(STREAM_TIMEOUT) or self._cancel.is_set():
+                return self._finish(CANCELLED)
+            self.bytes_read, self.nodes = self.total_bytes, len(graph.nodes)
+            self.wspace_id, _ = self.manager.create_workspace(graph=graph, shared=True, cache=cache)
+            self._finish(DONE)
+        except LoadCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            if self._cancel.is_set():
+                # e.g. a stream closed under the loader by cancel()
+                return self._finish(CANCELLED)
+            self._finish(FAILED, str(e) if isinstance(e, (ValueError, OSError)) else f"An unexpected error occurred: {e}")
+        finally:
+            self.loader.progress = None
+
+    def _finish(self, status: str, error: Optional[str] = None) -> None:
+        if not self.file_path and hasattr(self.source, "close"):
+            # lets a writer still feeding the stream move on
+            self.source.close()
+        self.error = error
+        self.finished_at = time.monotonic()
+        self.status = status
+
+    def cancel(self) -> bool:
+        """Asks the job to stop; False if it has finished already."""
+        if self.finished:
+            return False
+        self._cancel.set()
+        self._released.set()
+        if not self.file_path and hasattr(self.source, "close"):
+            self.source.close()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the job has finished or `timeout` passed; returns whether it finished."""
+        if self._future is not None:
+            try:
+                self._future.result(timeout)
+            except Exception:
+                pass
+        return self.finished
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "name": self.name, "status": self.status, "error": self.error,
+            "bytes_read": self.bytes_read, "total_bytes": self.total_bytes, "nodes": self.nodes,
+            "workspace": self.wspace_id,
+        }
+
+
+class LoadJobs:
+    """The load jobs of this process, with the pool running the file loads."""
+
+    def __init__(self, workers: Optional[int] = None, cache: Optional[GraphCache] = None):
+        if workers is None:
+            workers = int(os.environ.get("GRAPH_EXPLORER_LOAD_WORKERS", LOAD_WORKERS))
+        self.workers = workers
+        self.cache = cache or GRAPH_CACHE
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, LoadJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, manager, loader: DataSourceService, source: Union[str, Stream], name: Optional[str] = None,
+               total_bytes: Optional[int] = None, held: bool = False) -> LoadJob:
+        """Starts loading `source`, a file path or a Stream of `total_bytes` (if known); see LoadJob."""
+        if name is None:
+            name = os.path.basename(source) if isinstance(source, str) else "stream"
+        job = LoadJob(manager, loader, source, name, total_bytes, held)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            if isinstance(source, str):
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="graph-load")
+                job._future = self._pool.submit(job._run, self.cache)
+            else:
+                job._future = self._start_thread(job)
+        return job
+
+    def _start_thread(self, job: LoadJob) -> Future:
+        """Runs `job` on a thread of its own, with a future like the pool's."""
+        future = Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    job._run(self.cache)
+                finally:
+                    future.set_result(None)
+        threading.Thread(target=run, name="graph-load-stream", daemon=True).start()
+        return future
+
+    def get(self, job_id: str, manager=None) -> Optional[LoadJob]:
+        """The job `job_id`; with a `manager`, only if it loads into that manager."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (manager is not None and job.manager is not manager):
+            return None
+        return job
+
+    def of(self, manager) -> List[LoadJob]:
+        """Jobs loading into `manager`, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.manager is manager]
+
+    def discard(self, job_id: str) -> None:
+        """Forgets a job, e.g. once its outcome was shown; a running job keeps running."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - KEEP_FINISHED
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+LOAD_JOBS = LoadJobs()
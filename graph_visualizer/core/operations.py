@@ -0,0 +1,207 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from api.model.edge import Edge
+from api.model.graph import Graph
+from api.model.node import Node
+from .create_edge import create_edge
+from .create_node import create_node
+from .delete_node import delete_node
+from .search_index import sync_index
+from .update_node import update_node
+
+class _Missing:
+    """Marks an attribute that did not exist; pickles as the module singleton."""
+    def __reduce__(self):
+        return "_MISSING"
+    def __repr__(self):
+        return "<missing>"
+
+_MISSING = _Missing()
+
+
+class Operation(ABC):
+    """
+    One graph mutation. `apply` performs it and returns the operation that
+    undoes it, so a list of inverses replayed backwards restores the graph.
+    """
+
+    def node_ids(self) -> Tuple[str, ...]:
+        """Nodes whose presence or content the operation changes."""
+        return ()
+
+    @abstractmethod
+    def apply(self, g: Graph) -> "Operation": ...
+
+
+class CreateNode(Operation):
+    def __init__(self, node_data: Dict[str, Any]):
+        self.node_data = node_data
+
+    def node_ids(self):
+        return (self.node_data.get('id'),)
+
+    def apply(self, g: Graph) -> Operation:
+        create_node(g, self.node_data)
+        return DeleteNode(self.node_data['id'])
+
+
+class UpdateNode(Operation):
+    def __init__(self, node_id: str, updates: Dict[str, Any]):
+        self.node_id, self.updates = node_id, updates
+
+    def node_ids(self):
+        return (self.node_id,)
+
+    def apply(self, g: Graph) -> Operation:
+        node = g.get_node_by_id(self.node_id)
+        old = _snapshot(node, self.updates) if node else None
+        update_node(g, self.node_id, self.updates)
+        return SetAttributes(self.node_id, old)
+
+
+class SetAttributes(Operation):
+    """Puts back saved attribute values (and name); `_MISSING` removes the attribute."""
+
+    def __init__(self, node_id: str, values: Dict[str, Any]):
+        self.node_id, self.values = node_id, values
+
+    def node_ids(self):
+        return (self.node_id,)
+
+    def apply(self, g: Graph) -> Operation:
+        node = g.get_node_by_id(self.node_id)
+        old = _snapshot(node, self.values)
+        before = g.version
+        for key, value in self.values.items():
+            if key == 'name':
+                node.name = value
+            elif value is _MISSING:
+                node.attributes.pop(key, None)
+            else:
+                node.attributes[key] = value
+        g.touch()
+        sync_index(g, before, [self.node_id])
+        return SetAttributes(self.node_id, old)
+
+
+class DeleteNode(Operation):
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+
+    def node_ids(self):
+        return (self.node_id,)
+
+    def apply(self, g: Graph) -> Operation:
+        node = g.get_node_by_id(self.node_id)
+        # incident edges in graph order; a self-loop is listed on both sides
+        edges = list(dict.fromkeys([*g.out_edges(self.node_id), *g.in_edges(self.node_id)]))
+        delete_node(g, self.node_id)
+        return RestoreNode(node, edges)
+
+
+class RestoreNode(Operation):
+    """Re-inserts a deleted node object together with its incident edges."""
+
+    def __init__(self, node: Node, edges: List[Edge]):
+        self.node, self.edges = node, edges
+
+    def node_ids(self):
+        return (self.node.id,)
+
+    def apply(self, g: Graph) -> Operation:
+        before = g.version
+        g.add_node(self.node)
+        for e in self.edges:
+            g.add_edge(e)
+        sync_index(g, before, [self.node.id])
+        return DeleteNode(self.node.id)
+
+
+class CreateEdge(Operation):
+    def __init__(self, from_id: str, to_id: str, edge_type: str = 'related'):
+        self.from_id, self.to_id, self.edge_type = from_id, to_id, edge_type
+
+    def apply(self, g: Graph) -> Operation:
+        return RemoveEdge(create_edge(g, self.from_id, self.to_id, self.edge_type))
+
+
+class RemoveEdge(Operation):
+    def __init__(self, edge: Edge):
+        self.edge = edge
+
+    def apply(self, g: Graph) -> Operation:
+        before = g.version
+        g.remove_edge(self.edge)
+        sync_index(g, before)
+        return RestoreEdge(self.edge)
+
+
+class RestoreEdge(Operation):
+    def __init__(self, edge: Edge):
+        self.edge = edge
+
+    def apply(self, g: Graph) -> Operation:
+        before = g.version
+        g.add_edge(self.edge)
+        sync_index(g, before)
+        return RemoveEdge(self.edge)
+
+
+def _snapshot(node: Node, keys: Iterable[str]) -> Dict[str, Any]:
+    return {k: node.name if k == 'name' else node.attributes.get(k, _MISSING) for k in keys}
+
+
+def parse_operation(command: str, payload: Dict[str, Any]) -> Operation:
+    """Builds an operation from a CLI command and its payload (the graph-command API format)."""
+    payload = payload or {}
+    if command == 'create-node':
+        return CreateNode(payload)
+    if command == 'update-node':
+        node_id, updates = payload.get('id'), payload.get('updates')
+        if not node_id or not isinstance(updates, dict):
+            raise ValueError("Update-node requires 'id' and 'updates'.")
+        return UpdateNode(node_id, updates)
+    if command == 'delete-node':
+        if not payload.get('id'):
+            raise ValueError("Delete-node requires 'id'.")
+        return DeleteNode(payload['id'])
+    if command == 'create-edge':
+        if not payload.get('from') or not payload.get('to'):
+            raise ValueError("Create-edge requires 'from' and 'to' IDs.")
+        return CreateEdge(payload['from'], payload['to'], payload.get('type') or 'related')
+    raise ValueError(f"Unknown operation: {command}")
+
+
+def validate_operations(g: Graph, ops: List[Operation]) -> None:
+    """
+    Checks that every operation can be applied after the ones before it,
+    tracking created and deleted ids without touching `g`.
+    Raises ValueError naming the first bad operation.
+    """
+    exists: Dict[str, bool] = {}
+
+    def present(node_id: Optional[str]) -> bool:
+        return exists[node_id] if node_id in exists else g.has_node(node_id)
+
+    for i, op in enumerate(ops, 1):
+        error = None
+        if isinstance(op, CreateNode):
+            node_id = op.node_data.get('id')
+            if not node_id:
+                error = "Node data must contain an 'id'."
+            elif present(node_id):
+                error = f"Node with id '{node_id}' already exists."
+            else:
+                exists[node_id] = True
+        elif isinstance(op, (UpdateNode, DeleteNode)):
+            if not present(op.node_id):
+                error = f"Node with id '{op.node_id}' not found."
+            elif isinstance(op, DeleteNode):
+                exists[op.node_id] = False
+        elif isinstance(op, CreateEdge):
+            if not present(op.from_id):
+                error = f"Source node with ID '{op.from_id}' not found."
+            elif not present(op.to_id):
+                error = f"Target node with ID '{op.to_id}' not found."
+        if error:
+            raise ValueError(f"Operation {i}: {error}")
@@ -1,30 +1,69 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Final, Dict
+from typing import Final, Dict, Optional, Set
 from api.model.graph import Graph
-from .search_filter import search_graph, filter_graph
+from api.model.node import Node
+from .attribute_index import AttributeIndexes
+from .result_cache import ResultCache
+from .search_filter import compile_filter, search_graph, filter_graph
+from .search_index import node_text
+
+# results shared by every workspace; see `RESULT_CACHE.stats()` when sizing it
+RESULT_CACHE: Final = ResultCache()
 
 class QueryStrategy(ABC):
     kind: str  # "search" | "filter"
 
+    def apply(self, g: Graph, value: str, indexes: Optional[AttributeIndexes] = None) -> Graph:
+        """Runs the query, answering repeated (graph version, kind, value) from `RESULT_CACHE`."""
+        key = RESULT_CACHE.key_of(g)
+        if key is None:
+            return self.run(g, value, indexes)
+        key += (self.kind, self.normalize(value))
+        result = RESULT_CACHE.get(key)
+        if result is None:
+            result = self.run(g, value, indexes)
+            if result is not g:
+                RESULT_CACHE.put(key, result)
+        return result
+
     @abstractmethod
-    def apply(self, g: Graph, value: str) -> Graph: ...
+    def run(self, g: Graph, value: str, indexes: Optional[AttributeIndexes] = None) -> Graph: ...
+    @abstractmethod
+    def normalize(self, value: str) -> str: ...
     @abstractmethod
     def label(self, value: str) -> str: ...
+    @abstractmethod
+    def matches(self, node: Node, value: str) -> bool:
+        """Whether `run` would keep `node`; raises what `run` would raise for it."""
+    def attributes(self, value: str) -> Set[str]:
+        """Attributes that must exist on some node of the input for `run` to succeed."""
+        return set()
 
 class Search(QueryStrategy):
     kind = "search"
-    def apply(self, g: Graph, value: str) -> Graph:
+    def run(self, g: Graph, value: str, indexes: Optional[AttributeIndexes] = None) -> Graph:
         return search_graph(g, value)
+    def normalize(self, value: str) -> str:
+        return (value or "").strip().lower()
     def label(self, value: str) -> str:
         return f"search: {value}"
+    def matches(self, node: Node, value: str) -> bool:
+        q = self.normalize(value)
+        return not q or q in node_text(node)
 
 class Filter(QueryStrategy):
     kind = "filter"
-    def apply(self, g: Graph, value: str) -> Graph:
-        return filter_graph(g, value)
+    def run(self, g: Graph, value: str, indexes: Optional[AttributeIndexes] = None) -> Graph:
+        return filter_graph(g, value, indexes)
+    def normalize(self, value: str) -> str:
+        return (value or "").strip()
     def label(self, value: str) -> str:
         return f"filter: {value}"
+    def matches(self, node: Node, value: str) -> bool:
+        return compile_filter(value).matches(node)
+    def attributes(self, value: str) -> Set[str]:
+        return compile_filter(value).attributes()
 
 STRATEGIES: Final[dict[str, QueryStrategy]] = {
     "search": Search(),
@@ -0,0 +1,108 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from weakref import WeakKeyDictionary
+from api.model.graph import Graph
+
+Key = Tuple[Hashable, ...]
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of query results.
+
+    A result is keyed by the key of its input graph extended with (strategy
+    kind, normalized value). A plain graph's key is (uid, version), so every
+    mutation makes its old entries unreachable; a cached result view is keyed
+    by the derivation that produced it, so pipelines of queries hit the cache
+    stage by stage. Entries are evicted least recently used first once either
+    `max_entries` or `max_bytes` (approximate result size) is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Key, Tuple[Any, int]]" = OrderedDict()
+        self._derived: "WeakKeyDictionary[Any, Key]" = WeakKeyDictionary()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        # shared by the request threads of every session
+        self._lock = threading.RLock()
+
+    def key_of(self, g: Any) -> Optional[Key]:
+        with self._lock:
+            if isinstance(g, Graph):
+                return (g.uid, g.version)
+            key = self._derived.get(g) if hasattr(g, "parent") else None
+            # a derived key is only valid while the underlying graph is unchanged
+            if key is not None and key[:2] == (g.parent.uid, g.parent.version):
+                return key
+            return None
+
+    def get(self, key: Key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Key, result: Any) -> None:
+        with self._lock:
+            size = _approx_bytes(result)
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (result, size)
+            self.bytes += size
+            if hasattr(result, "parent"):
+                self._derived[result] = key
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def resize(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def discard_graph(self, g: Graph) -> None:
+        """Drops every entry computed from `g`, e.g. when its workspace is closed."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == g.uid]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries), "bytes": self.bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            }
+
+
+def _approx_bytes(result: Any) -> int:
+    node_ids = getattr(result, "node_ids", None)
+    if node_ids is None:
+        return sys.getsizeof(result)
+    # the id set plus the node mask the view builds over its parent
+    parent = getattr(result, "parent", None)
+    mask = len(parent.nodes) if parent is not None else 0
+    return sys.getsizeof(node_ids) + mask + 256
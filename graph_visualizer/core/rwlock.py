@@ -0,0 +1,67 @@
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """
+    Any number of readers or one writer. A waiting writer keeps new readers
+    out, so a stream of renders cannot starve a mutation. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self, blocking: bool = True) -> bool:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                if not blocking:
+                    return False
+                self._cond.wait()
+            self._readers += 1
+            return True
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self, blocking: bool = True) -> bool:
+        with self._cond:
+            if not blocking:
+                if self._writer or self._readers:
+                    return False
+                self._writer = True
+                return True
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+            return True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
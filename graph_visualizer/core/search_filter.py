@@ -1,9 +1,14 @@
 import datetime as _dt
 import re
-from typing import Any, Iterable, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import numpy as np
 from api.model.graph import Graph
 from api.model.node import Node
-from api.model.edge import Edge
+from api.model.subgraph import SubgraphView
+from .attribute_columns import BOOL, INT, FLOAT, DATE, STR, OTHER, get_column
+from .attribute_index import AttributeIndexes
+from .search_index import get_index
 
 class FilterParseError(ValueError): ...
 class FilterTypeError(ValueError): ...
@@ -61,40 +66,21 @@ def _coerce(sample: Any, raw: str):
 def _cmp(a, op, b):
     return {"==": a == b, "!=": a != b, ">": a > b, ">=": a >= b, "<": a < b, "<=": a <= b}[op]
 
-def _subgraph(g: Graph, keep_ids: Iterable[str]) -> Graph:
-    keep = set(keep_ids)
-    out = Graph(g.directed)
-    id2 = {}
-    for n in g.nodes:
-        if n.id in keep:
-            clone = Node(n.name, node_id=n.id)
-            for k,v in n.attributes.items(): clone.add_attribute(k,v)
-            out.add_node(clone); id2[n.id] = clone
-    for e in g.edges:
-        if e.from_node.id in keep and e.to_node.id in keep:
-            out.add_edge(Edge(e.directed, id2[e.from_node.id], id2[e.to_node.id], e.type, edge_id=e.id))
-    return out
+def _subgraph(g: Graph, keep_ids: Iterable[str]) -> SubgraphView:
+    # results share the input's node/edge objects instead of cloning them
+    return SubgraphView(g, keep_ids)
 
 def search_graph(g: Graph, query: str) -> Graph:
     q = (query or "").strip().lower()
     if not q:
         return g
 
-    def _pairs(attrs: dict) -> Iterable[Tuple[str, str]]:
-        for k, v in attrs.items():
-            if isinstance(v, (dict, list, tuple)):
-                import json
-                yield k, json.dumps(v, ensure_ascii=False)
-            else:
-                yield k, str(v)
-
-    ids = []
-    for n in g.nodes:
-        if q in (n.name or "").lower() or q in (n.id or "").lower():
-            ids.append(n.id); continue
-        hit = any(q in str(k).lower() or q in str(v).lower() for k, v in _pairs(n.attributes))
-        if hit:
-            ids.append(n.id)
+    # candidates come from the trigram index of the underlying graph
+    if isinstance(g, SubgraphView):
+        keep = g.node_ids
+        ids = [i for i in get_index(g.parent).search(q) if i in keep]
+    else:
+        ids = get_index(g).search(q)
     return _subgraph(g, ids)
 
 _FILTER = re.compile(r"^(?P<attr>[A-Za-z_][\w\.\-]*)\s*(?P<op>==|!=|>=|<=|>|<)\s*(?P<val>.+)$")
@@ -104,40 +90,143 @@ def parse_filter(expr: str) -> Tuple[str,str,str]:
     if not m: raise FilterParseError("Use: <attr> <op> <value>")
     return m["attr"], m["op"], m["val"]
 
-def filter_graph(g: Graph, expr: str) -> Graph:
+_BOOL_OPS_ERROR = "For boolean attributes, only the '==' and '!=' operators are supported."
+_NP_OPS = {"==": np.equal, "!=": np.not_equal, ">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+# a representative left value per column group; _coerce only looks at its type
+_SAMPLES = {BOOL: True, INT: 0, FLOAT: 0.0, DATE: _dt.date.min, STR: ""}
+
+class CompiledFilter:
     """
-    Returns a subgraph containing nodes that match the filter expression.
-    The filter expression format is "<attribute> <operator> <value>", e.g., "age > 30".
+    A parsed "<attr> <op> <value>" clause. The right-hand side is coerced once
+    per value type and the comparison runs over the typed attribute columns of
+    the graph; `matches` is the equivalent per-node predicate.
     """
-    attr, op, raw = parse_filter(expr)
-
-    # error if the attribute doesn't exist on any node
-    if all(attr not in n.attributes for n in g.nodes):
-        raise FilterParseError(f"Attribute '{attr}' does not exist on any node.")
-
-    ids = []
-   
-    for n in g.nodes:
-        if attr not in n.attributes:
-            continue
 
-        # normalize left side: "50" -> 50, "2024-01-01" -> date
-        left = _normalize_left(n.attributes[attr])
-
-        if isinstance(left, bool) and op not in ("==", "!="):
-            raise FilterTypeError("For boolean attributes, only the '==' and '!=' operators are supported.")
+    def __init__(self, attr: str, op: str, raw: str):
+        self.attr, self.op, self.raw = attr, op, raw
+        self._rights: Dict[str, Any] = {}
 
+    def _compare(self, left, right) -> bool:
         try:
-            right = _coerce(left, raw)  # coerces "50" -> 50 if left is numeric
-            if _cmp(left, op, right):
-                ids.append(n.id)
-
-        except FilterTypeError:
-            # propagate the error so the UI can display the message
-            raise
+            return _cmp(left, self.op, right)
         except TypeError as e:
             # e.g. comparing a string with a number using >/<
-            raise FilterTypeError(f"Incompatible comparison for '{attr}': {e}")
-
-    return _subgraph(g, ids)
+            raise FilterTypeError(f"Incompatible comparison for '{self.attr}': {e}")
 
+    def matches(self, node: Node) -> bool:
+        if self.attr not in node.attributes:
+            return False
+        # normalize left side: "50" -> 50, "2024-01-01" -> date
+        left = _normalize_left(node.attributes[self.attr])
+        if isinstance(left, bool) and self.op not in ("==", "!="):
+            raise FilterTypeError(_BOOL_OPS_ERROR)
+        return self._compare(left, _coerce(left, self.raw))  # coerces "50" -> 50 if left is numeric
+
+    def attributes(self) -> Set[str]:
+        return {self.attr}
+
+    def _right(self, kind: str) -> Tuple[Any, Optional[str]]:
+        """(right-hand side, None) for a column group, or (None, error message)."""
+        if kind not in self._rights:
+            try:
+                if kind == BOOL and self.op not in ("==", "!="):
+                    raise FilterTypeError(_BOOL_OPS_ERROR)
+                right = _coerce(_SAMPLES[kind], self.raw)
+                self._rights[kind] = (right.toordinal() if kind == DATE else right, None)
+            except FilterTypeError as e:
+                self._rights[kind] = (None, str(e))
+        return self._rights[kind]
+
+    def scan(self, root: Graph, scope: Optional[np.ndarray] = None, compare: bool = True) -> Tuple[np.ndarray, int, Optional[str]]:
+        """
+        Evaluates the clause over the nodes of `root` selected by the boolean
+        `scope` mask (all nodes when None) without raising. Returns the matching
+        CSR positions (empty unless `compare`), how many scoped nodes carry the
+        attribute, and the error message of the first offending node, if any.
+        """
+        column = get_column(root, self.attr)
+
+        hits, present, error = [], 0, None   # error: (position, message)
+        for kind, group in column.groups.items():
+            pos, values = group.positions, group.values
+            if scope is not None:
+                inside = scope[pos]
+                pos, values = pos[inside], values[inside]
+            if not len(pos):
+                continue
+            present += len(pos)
+            if kind == OTHER:
+                for p, left in zip(pos.tolist(), values):
+                    if error and p > error[0]:
+                        break
+                    try:
+                        if self._compare(left, _coerce(left, self.raw)) and compare:
+                            hits.append(np.array([p]))
+                    except FilterTypeError as e:
+                        error = (p, str(e))
+                        break
+                continue
+            right, message = self._right(kind)
+            if message:
+                if error is None or pos[0] < error[0]:
+                    error = (int(pos[0]), message)
+                continue
+            if compare:
+                hits.append(pos[_NP_OPS[self.op](values, right)])
+
+        hits = np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+        return hits, present, error[1] if error else None
+
+    def check(self, present: int, error: Optional[str]) -> None:
+        """Raises what evaluating the clause over a scope with this `scan` outcome raises."""
+        # error if the attribute doesn't exist on any node
+        if not present:
+            raise FilterParseError(f"Attribute '{self.attr}' does not exist on any node.")
+        if error:
+            # propagate the error so the UI can display the message
+            raise FilterTypeError(error)
+
+    def positions(self, g: Graph) -> np.ndarray:
+        """
+        Matching nodes as positions in the CSR node order of the underlying graph.
+        Raises the same error the first offending node (in graph order) would.
+        """
+        root, scope = (g.parent, g.mask()) if isinstance(g, SubgraphView) else (g, None)
+        hits, present, error = self.scan(root, scope)
+        self.check(present, error)
+        return hits
+
+    def apply(self, g: Graph, indexes: Optional[AttributeIndexes] = None) -> SubgraphView:
+        root = g.parent if isinstance(g, SubgraphView) else g
+        index = indexes.get(root, self.attr) if indexes is not None else None
+        if index is not None:
+            ids = index.evaluate(self, g.node_ids if isinstance(g, SubgraphView) else None)
+            if ids is not None:
+                return _subgraph(g, ids)
+        return _subgraph(g, root.csr().node_ids[self.positions(g)])
+
+@lru_cache(maxsize=256)
+def compile_filter(expr: str):
+    """A CompiledFilter for a single clause, a planned CompoundFilter for boolean expressions."""
+    from .filter_planner import Clause, CompoundFilter, is_compound, is_spaced_value, parse_expression
+    try:
+        tree = parse_expression(expr)
+    except FilterParseError:
+        # e.g. "title == Rock and Roll" is still one clause with a spaced value;
+        # any other malformed boolean expression reports the planner's error
+        if is_spaced_value(expr) or not is_compound(expr):
+            return CompiledFilter(*parse_filter(expr))
+        raise
+    if isinstance(tree, Clause):
+        return CompiledFilter(*parse_filter(expr)) if _FILTER.match(expr.strip()) else tree.filter
+    return CompoundFilter(tree)
+
+def filter_graph(g: Graph, expr: str, indexes: Optional[AttributeIndexes] = None) -> Graph:
+    """
+    Returns a subgraph containing nodes that match the filter expression.
+    The filter expression format is "<attribute> <operator> <value>", e.g., "age > 30",
+    or such clauses combined with AND, OR, NOT and parentheses, e.g.
+    "age > 30 AND (city == Paris OR NOT active == true)".
+    With `indexes`, selective comparisons are answered from sorted attribute indexes.
+    """
+    return compile_filter(expr).apply(g, indexes)
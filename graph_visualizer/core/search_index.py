@@ -0,0 +1,136 @@
+import json
+from typing import Dict, Iterable, List, Optional
+from weakref import WeakKeyDictionary
+import numpy as np
+from api.model.graph import Graph
+from api.model.node import Node
+
+_SEP = "\x00"  # joins a node's fields; a query never spans two fields
+
+
+def node_text(node: Node) -> str:
+    """
+    Lowercased searchable fields of a node (name, id, attribute keys and
+    values, dict/list values as JSON), joined by a separator.
+    """
+    fields = [(node.name or "").lower(), (node.id or "").lower()]
+    for k, v in node.attributes.items():
+        fields.append(str(k).lower())
+        if isinstance(v, (dict, list, tuple)):
+            fields.append(json.dumps(v, ensure_ascii=False).lower())
+        else:
+            fields.append(str(v).lower())
+    return _SEP.join(fields)
+
+
+def _trigrams(text: str) -> set:
+    grams = set()
+    for field in text.split(_SEP):
+        grams.update(field[i:i + 3] for i in range(len(field) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Trigram index over the searchable text of every node of one graph.
+
+    Every indexed node version gets an ordinal. Posting lists are sorted
+    int32 arrays of ordinals built once, plus small append-only tails for
+    nodes indexed later; removed or re-indexed ordinals are tombstoned and
+    the arrays are compacted when the garbage grows.
+    """
+
+    def __init__(self, graph: Graph):
+        self.version = graph.version
+        self._texts: List[Optional[str]] = []
+        self._ids: List[Optional[str]] = []
+        self._ordinal: Dict[str, int] = {}
+        self._postings: Dict[str, np.ndarray] = {}
+        self._tails: Dict[str, List[int]] = {}
+        self._dead = 0
+        self._build((n.id, node_text(n)) for n in graph.nodes)
+
+    def _build(self, entries: Iterable) -> None:
+        grams: Dict[str, List[int]] = {}
+        self._texts, self._ids, self._ordinal = [], [], {}
+        for node_id, text in entries:
+            o = len(self._texts)
+            self._texts.append(text); self._ids.append(node_id); self._ordinal[node_id] = o
+            for g in _trigrams(text):
+                grams.setdefault(g, []).append(o)
+        self._postings = {g: np.array(os, dtype=np.int32) for g, os in grams.items()}
+        self._tails = {}
+        self._dead = 0
+
+    def _compact(self) -> None:
+        live = [(i, t) for i, t in zip(self._ids, self._texts) if t is not None]
+        self._build(live)
+
+    def remove(self, node_id: str) -> None:
+        o = self._ordinal.pop(node_id, None)
+        if o is not None:
+            self._texts[o] = None; self._ids[o] = None
+            self._dead += 1
+
+    def add(self, node: Node) -> None:
+        self.remove(node.id)
+        o = len(self._texts)
+        text = node_text(node)
+        self._texts.append(text); self._ids.append(node.id); self._ordinal[node.id] = o
+        for g in _trigrams(text):
+            self._tails.setdefault(g, []).append(o)
+        if self._dead > 1024 and self._dead * 4 > len(self._texts):
+            self._compact()
+
+    def _posting(self, gram: str) -> np.ndarray:
+        base = self._postings.get(gram)
+        tail = self._tails.get(gram)
+        if tail:
+            extra = np.array(tail, dtype=np.int32)
+            return extra if base is None else np.concatenate((base, extra))
+        return base if base is not None else np.empty(0, dtype=np.int32)
+
+    def search(self, q: str) -> List[str]:
+        """Ids of nodes with a field containing `q` (already stripped and lowercased)."""
+        texts = self._texts
+        if len(q) < 3 or _SEP in q:
+            ordinals = range(len(texts))
+        else:
+            postings = sorted((self._posting(q[i:i + 3]) for i in range(len(q) - 2)), key=len)
+            ordinals = postings[0]
+            for other in postings[1:]:
+                if not len(ordinals):
+                    break
+                at = np.minimum(np.searchsorted(other, ordinals), len(other) - 1)
+                ordinals = ordinals[other[at] == ordinals] if len(other) else other
+            ordinals = ordinals.tolist()
+        # verification: trigram hits may come from different fields or positions
+        return [self._ids[o] for o in ordinals if texts[o] is not None and q in texts[o]]
+
+
+_INDEXES: "WeakKeyDictionary[Graph, TrigramIndex]" = WeakKeyDictionary()
+
+
+def get_index(g: Graph) -> TrigramIndex:
+    """Index for `g`, built on first use and rebuilt if `g` changed behind its back."""
+    index = _INDEXES.get(g)
+    if index is None or index.version != g.version:
+        index = _INDEXES[g] = TrigramIndex(g)
+    return index
+
+
+def sync_index(g: Graph, since: int, node_ids: Iterable[str] = ()) -> None:
+    """
+    Carries an up-to-date index over a mutation that moved `g` from version
+    `since` to its current version and touched only `node_ids`.
+    """
+    index = _INDEXES.get(g)
+    if index is None or index.version != since:
+        return
+    for node_id in node_ids:
+        node = g.get_node_by_id(node_id)
+        if node is None:
+            index.remove(node_id)
+        else:
+            index.add(node)
+    index.version = g.version
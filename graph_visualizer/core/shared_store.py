@@ -0,0 +1,190 @@
+"""
+Workspaces shared by the worker processes of one machine.
+
+Each session gets a directory. Every workspace in it is a binary snapshot
+plus a journal: the workspace calls made since the snapshot was taken. One
+process at a time writes, holding an flock on the session's lock file. It
+appends its calls to the journal, and the other workers replay the new
+entries before they next use the workspace. Once a journal grows past
+`COMPACT_BYTES`, the writer saves a fresh snapshot as the next generation
+and starts an empty journal.
+
+    manifest.json         {"counter", "active", "workspaces": {id: [generation, previous journal bytes]}}
+    <id>-<gen>.gvs        snapshot the generation starts from
+    <id>-<gen>.journal    4-byte length + JSON list of [method, args] per entry
+    lock                  flock'ed by the writer
+"""
+import json
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+from .operations import Operation
+from .snapshot import _decode, _encode, _op_from_record, _op_record, save_workspace
+from .workspace import GraphWorkspace
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): the shared store is unavailable
+    fcntl = None
+
+# workspace methods that change shared state; indexes and positions stay per process
+JOURNALED = frozenset({"create_node", "update_node", "delete_node", "create_edge", "batch", "undo", "redo",
+                       "apply_search", "apply_filter", "reset", "remove_query"})
+# journal size at which the writer folds it into a new snapshot
+COMPACT_BYTES = 8 * 1024 * 1024
+
+_LENGTH = struct.Struct("<I")
+Call = Tuple[str, tuple]
+
+
+# call arguments are request data, plus the operations of a batch; journals are
+# JSON like snapshots, so replaying one cannot run code
+def _encode_arg(v: Any) -> Any:
+    if isinstance(v, Operation):
+        return ["op", _op_record(v)]
+    if isinstance(v, list):
+        return ["list", *map(_encode_arg, v)]
+    return _encode(v)
+
+
+def _decode_arg(v: Any) -> Any:
+    if isinstance(v, list) and v[:1] == ["op"]:
+        return _op_from_record(v[1])
+    if isinstance(v, list) and v[:1] == ["list"]:
+        return [_decode_arg(x) for x in v[1:]]
+    return _decode(v)
+
+
+class SessionStore:
+    def __init__(self, root: str, compact_bytes: int = COMPACT_BYTES):
+        if fcntl is None:
+            raise RuntimeError("A shared workspace store needs flock (POSIX).")
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.compact_bytes = compact_bytes
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._manifest = {"counter": 1, "active": None, "workspaces": {}}
+
+    @contextmanager
+    def writing(self):
+        """Holds the session's writer lock: one thread of one process at a time, reentrant."""
+        with self._thread_lock:
+            if not self._depth:
+                self._fd = os.open(os.path.join(self.root, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    os.close(self._fd)
+                    self._fd = None
+
+    def manifest(self) -> Dict[str, Any]:
+        """The current manifest; the same object for as long as its content is unchanged."""
+        # read every time: a replaced file can come back with the same inode, size and mtime
+        try:
+            with open(os.path.join(self.root, "manifest.json")) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self._manifest
+        if manifest != self._manifest:
+            self._manifest = manifest
+        return self._manifest
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> None:
+        path = os.path.join(self.root, "manifest.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def snapshot_path(self, wspace_id: str, generation: int) -> str:
+        return os.path.join(self.root, f"{wspace_id}-{generation}.gvs")
+
+    def _journal_path(self, wspace_id: str, generation: int) -> str:
+        return os.path.join(self.root, f"{wspace_id}-{generation}.journal")
+
+    def save(self, wspace_id: str, generation: int, wspace: GraphWorkspace) -> None:
+        """Starts generation `generation` of a workspace from its current state."""
+        path = self.snapshot_path(wspace_id, generation)
+        save_workspace(wspace, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        open(self._journal_path(wspace_id, generation), "wb").close()
+
+    def remove(self, wspace_id: str, generation: int) -> None:
+        for path in (self.snapshot_path(wspace_id, generation), self._journal_path(wspace_id, generation)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def journal_size(self, wspace_id: str, generation: int) -> int:
+        try:
+            return os.path.getsize(self._journal_path(wspace_id, generation))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, wspace_id: str, generation: int, calls: List[Call]) -> int:
+        """Adds one journal entry; returns the journal's new size. Call while `writing()`."""
+        data = json.dumps([[name, [_encode_arg(a) for a in args]] for name, args in calls],
+                          separators=(",", ":")).encode("utf-8")
+        fd = os.open(self._journal_path(wspace_id, generation), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, _LENGTH.pack(len(data)) + data)
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+    def read(self, wspace_id: str, generation: int, offset: int) -> Tuple[List[Call], int]:
+        """The calls journaled from byte `offset` on, and the offset after the last complete entry."""
+        try:
+            with open(self._journal_path(wspace_id, generation), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        calls, pos = [], 0
+        while pos + _LENGTH.size <= len(data):
+            (n,) = _LENGTH.unpack_from(data, pos)
+            if pos + _LENGTH.size + n > len(data):
+                break   # still being written
+            entry = json.loads(data[pos + _LENGTH.size:pos + _LENGTH.size + n])
+            calls.extend((name, tuple(map(_decode_arg, args))) for name, args in entry)
+            pos += _LENGTH.size + n
+        return calls, offset + pos
+
+    def touch(self) -> None:
+        os.utime(self.root)
+
+
+def replay(wspace: GraphWorkspace, calls: List[Call]) -> None:
+    for name, args in calls:
+        getattr(wspace, name)(*args)
+
+
+class Recorder:
+    """Stands in for a workspace during a write, noting the journaled calls that succeed."""
+
+    def __init__(self, wspace: GraphWorkspace):
+        self.__dict__["_wspace"] = wspace
+        self.__dict__["calls"] = []
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._wspace, name)
+        if name not in JOURNALED:
+            return attr
+
+        def call(*args):
+            result = attr(*args)
+            self.calls.append((name, args))
+            return result
+        return call
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._wspace, name, value)
@@ -0,0 +1,483 @@
+"""
+Binary snapshots of graphs and workspaces.
+
+A snapshot is one file: an 8 byte magic, the length of a JSON header, the
+header, then 8-byte aligned data sections the header points at. Strings are
+stored as tables (one NUL-separated UTF-8 blob, with an offsets array when a
+string contains NUL; repetitive columns are interned into codes), edges as
+integer endpoint arrays, and node attributes as one typed column per key
+(columns of mixed or container values as tagged JSON). The undo journal is
+a JSON list of operation records. Nothing is unpickled, so a snapshot from
+elsewhere cannot run code when it is opened.
+
+Loading memory-maps the file and builds the objects straight from the
+arrays, including the graph's CSR view, so no source file is parsed again.
+"""
+import gc
+import json
+import mmap
+import os
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, List, Tuple, Union
+import numpy as np
+from api.model.csr import CsrGraph
+from api.model.edge import Edge
+from api.model.graph import Graph
+from api.model.node import Node
+from .operations import (_MISSING, CreateEdge, CreateNode, DeleteNode, Operation, RemoveEdge, RestoreEdge,
+                         RestoreNode, SetAttributes, UpdateNode)
+from .workspace import GraphWorkspace, _Stage
+
+MAGIC = b"GVSNAP\x00\x02"
+_ALIGN = 8
+_INT64 = (-2**63, 2**63)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+@contextmanager
+def _no_gc():
+    # building millions of small objects triggers collections that find nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _encode(v: Any) -> Any:
+    """`v` as JSON; lists, tuples and dicts become lists tagged with their type."""
+    if v is None or isinstance(v, (str, bool, int, float)):
+        return v
+    if isinstance(v, (list, tuple)):
+        return ["tuple" if isinstance(v, tuple) else "list", *map(_encode, v)]
+    if isinstance(v, dict):
+        return ["dict", *([_encode(k), _encode(x)] for k, x in v.items())]
+    if isinstance(v, np.generic):
+        return _encode(v.item())
+    raise SnapshotError(f"Cannot store a value of type {type(v).__name__} in a snapshot")
+
+
+def _decode(v: Any) -> Any:
+    if not isinstance(v, list):
+        return v
+    tag, items = v[0], v[1:]
+    if tag == "list":
+        return [_decode(x) for x in items]
+    if tag == "tuple":
+        return tuple(_decode(x) for x in items)
+    if tag == "dict":
+        return {_decode(k): _decode(x) for k, x in items}
+    raise SnapshotError(f"Unknown value tag in snapshot: {tag!r}")
+
+
+def _json_bytes(obj: Any) -> np.ndarray:
+    return np.frombuffer(json.dumps(obj, separators=(",", ":")).encode("utf-8"), dtype=np.uint8)
+
+
+class _Writer:
+    def __init__(self):
+        self.header: Dict[str, Any] = {"sections": {}}
+        self._sections: List[Tuple[str, np.ndarray]] = []
+
+    def array(self, name: str, arr: np.ndarray) -> None:
+        arr = np.ascontiguousarray(arr)
+        self._sections.append((name, arr))
+        self.header["sections"][name] = [0, arr.dtype.str, list(arr.shape)]
+
+    def strings(self, name: str, strings: List[str]) -> None:
+        if any("\0" in s for s in strings):
+            encoded = [s.encode("utf-8") for s in strings]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            self.array(name + ".offsets", offsets)
+            blob = b"".join(encoded)
+        else:
+            blob = "\0".join(strings).encode("utf-8")
+        self.array(name, np.frombuffer(blob, dtype=np.uint8))
+        self.header.setdefault("strings", {})[name] = len(strings)
+
+    def values(self, name: str, values: List[Any]) -> None:
+        """Stores a column with the narrowest representation that keeps every value's type."""
+        types = set(map(type, values))
+        if types == {str}:
+            distinct: Dict[str, int] = {}
+            codes = [distinct.setdefault(v, len(distinct)) for v in values]
+            if len(distinct) * 2 <= len(values):
+                self.strings(name + ".table", list(distinct))
+                self.array(name, np.array(codes, dtype=np.int32))
+                kind = "codes"
+            else:
+                self.strings(name, values)
+                kind = "str"
+        elif types == {bool}:
+            self.array(name, np.array(values, dtype=bool))
+            kind = "bool"
+        elif types == {int} and _INT64[0] <= min(values) and max(values) < _INT64[1]:
+            self.array(name, np.array(values, dtype=np.int64))
+            kind = "int"
+        elif types == {float}:
+            self.array(name, np.array(values, dtype=np.float64))
+            kind = "float"
+        elif not values:
+            kind = "empty"
+        else:
+            self.array(name, _json_bytes([_encode(v) for v in values]))
+            kind = "json"
+        self.header.setdefault("values", {})[name] = kind
+
+    def write(self, path: Union[str, BinaryIO]) -> None:
+        """Writes the snapshot to `path` (replaced atomically) or to an open binary file."""
+        if not isinstance(path, str):
+            self._write_to(path)
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            self._write_to(f)
+        os.replace(tmp, path)
+
+    def _write_to(self, f: BinaryIO) -> None:
+        offset = 0
+        for name, arr in self._sections:
+            self.header["sections"][name][0] = offset
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps(self.header).encode("utf-8")
+        header += b" " * (-(len(MAGIC) + 8 + len(header)) % _ALIGN)
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, arr in self._sections:
+            f.write(arr.tobytes())
+            f.write(b"\0" * (-arr.nbytes % _ALIGN))
+
+
+class _Reader:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                if magic[:6] == MAGIC[:6]:
+                    raise SnapshotError(f"Snapshot written by another version of the explorer: {path}")
+                raise SnapshotError(f"Not a graph snapshot: {path}")
+            size = int.from_bytes(f.read(8), "little")
+            self.header = json.loads(f.read(size))
+            self._start = len(MAGIC) + 8 + size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else None
+
+    def has(self, name: str) -> bool:
+        return name in self.header["sections"] or self.header.get("values", {}).get(name) == "empty"
+
+    def array(self, name: str) -> np.ndarray:
+        offset, dtype, shape = self.header["sections"][name]
+        if np.dtype(dtype).hasobject:
+            raise SnapshotError(f"Snapshot section {name} has no plain data type")
+        count = int(np.prod(shape))
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=self._start + offset).reshape(shape)
+
+    def strings(self, name: str) -> List[str]:
+        blob = self.array(name).tobytes()
+        count = self.header["strings"][name]
+        if name + ".offsets" in self.header["sections"]:
+            offsets = self.array(name + ".offsets").tolist()
+            return [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        return blob.decode("utf-8").split("\0") if count else []
+
+    def values(self, name: str) -> np.ndarray:
+        """A stored column as an array; `.tolist()` gives back the original values."""
+        kind = self.header["values"][name]
+        if kind == "codes":
+            table = np.empty(self.header["strings"][name + ".table"], dtype=object)
+            table[:] = self.strings(name + ".table")
+            return table[self.array(name)]
+        if kind in ("str", "json", "empty"):
+            values = [] if kind == "empty" else (
+                self.strings(name) if kind == "str" else list(map(_decode, json.loads(self.array(name).tobytes()))))
+            out = np.empty(len(values), dtype=object)
+            out[:] = values
+            return out
+        return self.array(name)
+
+    def close(self) -> None:
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # an array still points into the map; it is closed once collected
+                pass
+
+
+# --- graph ---
+
+def _put_graph(w: _Writer, g: Graph) -> Dict[str, int]:
+    nodes = list(g.nodes)
+    edges = list(g.edges)
+    # endpoints are matched by identity; ones that are not nodes of the graph
+    # (any more) are stored after its nodes
+    index = {id(node): i for i, node in enumerate(nodes)}
+    extra = []
+    for e in edges:
+        for node in (e.from_node, e.to_node):
+            if id(node) not in index:
+                index[id(node)] = len(nodes) + len(extra)
+                extra.append(node)
+    table = nodes + extra
+    w.header["graph"] = {"directed": g.directed, "nodes": len(nodes), "extra": len(extra), "edges": len(edges)}
+    w.values("node.id", [n.id for n in table])
+    w.values("node.name", [n.name for n in table])
+
+    # attributes: one column per key over the nodes having it, in node order,
+    # plus each node's key order ("shape") so attribute dicts come back identical
+    keys: Dict[str, int] = {}
+    shapes: Dict[tuple, int] = {}
+    shape_codes = np.empty(len(table), dtype=np.int32)
+    columns: List[List[Any]] = []
+    for i, node in enumerate(table):
+        attrs = node.attributes
+        shape = tuple(keys.setdefault(k, len(keys)) for k in attrs)
+        shape_codes[i] = shapes.setdefault(shape, len(shapes))
+        if len(columns) < len(keys):
+            columns.extend([] for _ in range(len(keys) - len(columns)))
+        for k, v in zip(shape, attrs.values()):
+            columns[k].append(v)
+    w.header["shapes"] = [list(s) for s in shapes]
+    w.values("attr.keys", list(keys))
+    w.array("node.shape", shape_codes)
+    for k, column in enumerate(columns):
+        w.values(f"attr.{k}", column)
+
+    w.array("edge.source", np.fromiter((index[id(e.from_node)] for e in edges), dtype=np.int64, count=len(edges)))
+    w.array("edge.target", np.fromiter((index[id(e.to_node)] for e in edges), dtype=np.int64, count=len(edges)))
+    w.values("edge.id", [e.id for e in edges])
+    w.values("edge.type", [e.type for e in edges])
+    directed = {e.directed for e in edges}
+    if len(directed) > 1:
+        w.array("edge.directed", np.fromiter((e.directed for e in edges), dtype=bool, count=len(edges)))
+    else:
+        w.header["graph"]["edge_directed"] = directed.pop() if directed else g.directed
+    return {node.id: i for i, node in enumerate(nodes)}
+
+
+def _get_graph(r: _Reader) -> Tuple[Graph, List[Node]]:
+    meta = r.header["graph"]
+    ids = r.values("node.id").tolist()
+    names = r.values("node.name").tolist()
+    table = [Node(name, node_id) for name, node_id in zip(names, ids)]
+
+    keys = r.values("attr.keys").tolist()
+    shapes = r.header["shapes"]
+    shape_codes = r.array("node.shape")
+    if keys:
+        columns = [r.values(f"attr.{k}") for k in range(len(keys))]
+        # rank[k][i]: index into column k of node i (valid where the node has key k)
+        has = np.zeros((len(keys), len(shapes)), dtype=bool)
+        for s, shape in enumerate(shapes):
+            has[shape, s] = True
+        ranks = [np.cumsum(has[k][shape_codes]) - 1 for k in range(len(keys))]
+        for s, shape in enumerate(shapes):
+            if not shape:
+                continue
+            members = np.flatnonzero(shape_codes == s)
+            names_ = [keys[k] for k in shape]
+            cols = [columns[k][ranks[k][members]].tolist() for k in shape]
+            for i, row in zip(members.tolist(), zip(*cols)):
+                table[i].attributes = dict(zip(names_, row))
+
+    src, dst = r.array("edge.source"), r.array("edge.target")
+    edge_ids = r.values("edge.id").tolist()
+    edge_types = r.values("edge.type").tolist()
+    if r.has("edge.directed"):
+        directed = r.array("edge.directed").tolist()
+    else:
+        directed = [meta["edge_directed"]] * meta["edges"]
+    edges = [Edge(d, table[i], table[j], t, e) for d, i, j, t, e
+             in zip(directed, src.tolist(), dst.tolist(), edge_types, edge_ids)]
+
+    nodes = table[:meta["nodes"]]
+    g = Graph(meta["directed"])
+    g.add_all(nodes, edges)
+    if not meta["extra"]:
+        # the stored arrays already are the CSR input; spares the first query a rebuild
+        if r.header["values"]["edge.type"] == "codes":
+            codes, types = r.array("edge.type"), r.strings("edge.type.table")
+        else:
+            type_codes: Dict[Any, int] = {}
+            codes = np.array([type_codes.setdefault(t, len(type_codes)) for t in edge_types], dtype=np.int32)
+            types = list(type_codes)
+        g.set_csr(CsrGraph(g.directed, nodes, edges, src.astype(np.int64), dst.astype(np.int64),
+                           codes.astype(np.int32), types, np.arange(len(edges), dtype=np.int64)))
+    return g, table
+
+
+def save_graph(g: Graph, path: str) -> None:
+    w = _Writer()
+    _put_graph(w, g)
+    w.write(path)
+
+
+def load_graph(path: str) -> Graph:
+    r = _Reader(path)
+    try:
+        with _no_gc():
+            return _get_graph(r)[0]
+    finally:
+        r.close()
+
+
+# --- workspace ---
+
+class _JournalWriter:
+    """
+    Turns undo/redo operations into JSON records. Nodes and edges of the
+    graph are referred to by position, others (deleted ones) by their index
+    in the journal's own node and edge lists, so shared objects stay shared.
+    """
+
+    def __init__(self, g: Graph, pos: Dict[str, int]):
+        self.g, self.pos = g, pos
+        self.edge_pos = {e.id: i for i, e in enumerate(g.edges)}
+        self.nodes: List[dict] = []
+        self.edges: List[dict] = []
+        self._seen: Dict[int, int] = {}
+
+    def node(self, n: Node) -> list:
+        if self.g.get_node_by_id(n.id) is n:
+            return ["n", self.pos[n.id]]
+        if id(n) not in self._seen:
+            self._seen[id(n)] = len(self.nodes)
+            self.nodes.append({"id": n.id, "name": n.name, "attributes": _encode(n.attributes)})
+        return ["dn", self._seen[id(n)]]
+
+    def edge(self, e: Edge) -> list:
+        if self.g.get_edge_by_id(e.id) is e:
+            return ["e", self.edge_pos[e.id]]
+        if id(e) not in self._seen:
+            record = {"id": e.id, "directed": e.directed, "type": _encode(e.type),
+                      "from": self.node(e.from_node), "to": self.node(e.to_node)}
+            self._seen[id(e)] = len(self.edges)
+            self.edges.append(record)
+        return ["de", self._seen[id(e)]]
+
+    def op(self, op: Operation) -> dict:
+        if isinstance(op, RestoreNode):
+            return {"op": "restore-node", "node": self.node(op.node), "edges": [self.edge(e) for e in op.edges]}
+        if isinstance(op, (RemoveEdge, RestoreEdge)):
+            return {"op": "remove-edge" if isinstance(op, RemoveEdge) else "restore-edge", "edge": self.edge(op.edge)}
+        return _op_record(op)
+
+    def dump(self, undo: List[List[Operation]], redo: List[List[Operation]]) -> dict:
+        undo_ = [[self.op(op) for op in ops] for ops in undo]
+        redo_ = [[self.op(op) for op in ops] for ops in redo]
+        return {"nodes": self.nodes, "edges": self.edges, "undo": undo_, "redo": redo_}
+
+
+def _op_record(op: Operation) -> dict:
+    """JSON record of an operation that refers to nodes by id only."""
+    if isinstance(op, CreateNode):
+        return {"op": "create-node", "data": _encode(op.node_data)}
+    if isinstance(op, UpdateNode):
+        return {"op": "update-node", "id": op.node_id, "updates": _encode(op.updates)}
+    if isinstance(op, SetAttributes):
+        return {"op": "set-attributes", "id": op.node_id,
+                "values": _encode({k: v for k, v in op.values.items() if v is not _MISSING}),
+                "missing": [k for k, v in op.values.items() if v is _MISSING]}
+    if isinstance(op, DeleteNode):
+        return {"op": "delete-node", "id": op.node_id}
+    if isinstance(op, CreateEdge):
+        return {"op": "create-edge", "from": op.from_id, "to": op.to_id, "type": op.edge_type}
+    raise SnapshotError(f"Cannot store a {type(op).__name__} operation in a snapshot")
+
+
+def _op_from_record(d: dict) -> Operation:
+    """The operation of an `_op_record` record."""
+    kind = d["op"]
+    if kind == "create-node":
+        return CreateNode(_decode(d["data"]))
+    if kind == "update-node":
+        return UpdateNode(d["id"], _decode(d["updates"]))
+    if kind == "set-attributes":
+        values = _decode(d["values"])
+        values.update(dict.fromkeys(d["missing"], _MISSING))
+        return SetAttributes(d["id"], values)
+    if kind == "delete-node":
+        return DeleteNode(d["id"])
+    if kind == "create-edge":
+        return CreateEdge(d["from"], d["to"], d["type"])
+    raise SnapshotError(f"Unknown operation in snapshot journal: {kind!r}")
+
+
+def _load_journal(journal: dict, table: List[Node], g_edges: List[Edge]) -> Tuple[list, list]:
+    """The undo and redo lists of a `_JournalWriter.dump` record."""
+    nodes: List[Node] = []
+    for d in journal["nodes"]:
+        n = Node(d["name"], d["id"])
+        n.attributes = _decode(d["attributes"])
+        nodes.append(n)
+
+    def node(ref) -> Node:
+        return table[ref[1]] if ref[0] == "n" else nodes[ref[1]]
+
+    edges = [Edge(d["directed"], node(d["from"]), node(d["to"]), _decode(d["type"]), d["id"])
+             for d in journal["edges"]]
+
+    def edge(ref) -> Edge:
+        return g_edges[ref[1]] if ref[0] == "e" else edges[ref[1]]
+
+    def op(d: dict) -> Operation:
+        kind = d["op"]
+        if kind == "restore-node":
+            return RestoreNode(node(d["node"]), [edge(e) for e in d["edges"]])
+        if kind in ("remove-edge", "restore-edge"):
+            return (RemoveEdge if kind == "remove-edge" else RestoreEdge)(edge(d["edge"]))
+        return _op_from_record(d)
+
+    return ([[op(d) for d in ops] for ops in journal["undo"]],
+            [[op(d) for d in ops] for ops in journal["redo"]])
+
+
+def save_workspace(ws: GraphWorkspace, path: Union[str, BinaryIO]) -> None:
+    """Writes the original graph, the query history, node positions and the undo journal."""
+    w = _Writer()
+    g = ws.original
+    pos = _put_graph(w, g)
+    stages = []
+    for i, stage in enumerate(ws._stages):
+        stages.append({"query": stage.query, "evicted": stage.evicted})
+        if not stage.evicted:
+            w.array(f"stage.{i}", np.sort(np.fromiter((pos[n] for n in stage), dtype=np.int64)))
+    w.header["workspace"] = {
+        "stages": stages, "history_budget": ws.history_budget, "undo_limit": ws._undo.maxlen,
+        "auto_index": ws._indexes.auto_create,
+    }
+    positions = ws.positions
+    w.strings("positions.id", list(positions))
+    w.array("positions.xy", np.array(list(positions.values()), dtype=np.float64).reshape(-1, 2))
+    w.array("journal", _json_bytes(_JournalWriter(g, pos).dump(list(ws._undo), ws._redo)))
+    w.write(path)
+
+
+def load_workspace(path: str) -> GraphWorkspace:
+    r = _Reader(path)
+    try:
+        with _no_gc():
+            if "workspace" not in r.header:
+                raise SnapshotError(f"{path} holds a graph, not a workspace")
+            g, table = _get_graph(r)
+            meta = r.header["workspace"]
+            ws = GraphWorkspace(g, auto_index=meta["auto_index"], history_budget=meta["history_budget"],
+                                undo_limit=meta["undo_limit"])
+            ids = [n.id for n in table]
+            for i, s in enumerate(meta["stages"]):
+                members = None if s["evicted"] else frozenset(map(ids.__getitem__, r.array(f"stage.{i}").tolist()))
+                ws._stages.append(_Stage.from_ids(s["query"], members))
+            ws.positions = dict(zip(r.strings("positions.id"), r.array("positions.xy").tolist()))
+            undo, redo = _load_journal(json.loads(r.array("journal").tobytes()), table, list(g.edges))
+            ws._undo = deque(undo, maxlen=meta["undo_limit"])
+            ws._redo = redo
+            return ws
+    finally:
+        r.close()
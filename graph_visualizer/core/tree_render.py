@@ -16,13 +16,7 @@ def render_tree_details(graph: Graph) -> str:
         '''
 
     def get_neighbors(node: Node):
-        neighbors = set()
-        for edge in graph.edges:
-            if edge.from_node.id == node.id:
-                neighbors.add(edge.to_node)
-            elif edge.to_node.id == node.id:
-                neighbors.add(edge.from_node)
-        return list(neighbors) 
+        return graph.neighbors(node.id)
     
     if not getattr(graph, "nodes", None):
         return '<div class="component-tree empty">No nodes</div>'
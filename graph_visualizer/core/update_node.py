@@ -1,6 +1,7 @@
 from typing import Any, Dict
 from graph_visualizer.api.model.graph import Graph
 from api.model.node import Node
+from .search_index import sync_index
 
 
 def update_node(g: Graph, node_id: str, updates: Dict[str, Any]) -> Graph:
@@ -8,11 +9,14 @@ def update_node(g: Graph, node_id: str, updates: Dict[str, Any]) -> Graph:
     
     if not node_to_update:
         raise ValueError(f"Node with id '{node_id}' not found.")
-        
+
+    before = g.version
     for key, value in updates.items():
         if key == 'name':
             node_to_update.name = value
         else:
             node_to_update.add_attribute(key, value)
-            
+
+    g.touch()
+    sync_index(g, before, [node_id])
     return g
\ No newline at end of file
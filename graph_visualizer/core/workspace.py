@@ -1,82 +1,442 @@
-from typing import Any, List, Dict
-from api.model.graph import Graph
-from core.create_node import create_node
-from core.update_node import update_node
-from core.delete_node import delete_node
-from core.create_edge import create_edge
-from .query_strategies import STRATEGIES  
+import sys
+import threading
+import weakref
+from collections import deque
+from typing import Any, Deque, FrozenSet, List, Dict, Optional, Set, Union
+from api.model.graph import Graph, approx_graph_bytes
+from api.model.subgraph import SubgraphView
+from .attribute_index import AttributeIndexes
+from .filter_planner import explain_filter
+from .operations import (CreateEdge, CreateNode, DeleteNode, Operation, UpdateNode,
+                         parse_operation, validate_operations)
+from .query_strategies import STRATEGIES
+from .rwlock import RWLock
+from .search_filter import FilterParseError, FilterTypeError
 
-Query = Dict[str, str] 
+Query = Dict[str, str]
+
+class _Stage:
+    """
+    Result of one applied query, kept as a descriptor: the ids it kept plus
+    membership changes made by later mutations. The result view is built
+    from them on demand. An evicted stage keeps only its query and is
+    recomputed from the stage before it when needed again.
+    """
+
+    __slots__ = ("query", "_base", "_added", "_removed", "_view", "_released")
+
+    def __init__(self, query: Query, result: Graph):
+        self.query = query
+        self.restore(result)
+
+    @classmethod
+    def from_ids(cls, query: Query, ids: Optional[FrozenSet[str]]) -> "_Stage":
+        """A stage holding the result ids `ids` (None for an evicted stage)."""
+        stage = cls.__new__(cls)
+        stage.__setstate__((query, ids))
+        return stage
+
+    def restore(self, result: Graph) -> None:
+        self._base: Optional[FrozenSet[str]] = result.node_ids
+        self._added: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._view: Optional[Graph] = result
+        self._released: Optional[weakref.ref] = None
+
+    @property
+    def evicted(self) -> bool:
+        return self._base is None
+
+    def evict(self) -> None:
+        self._base, self._view, self._released = None, None, None
+        self._added, self._removed = set(), set()
+
+    def drop_view(self) -> None:
+        """Forgets the view, e.g. after the graph it was built on was replaced."""
+        self._view = self._released = None
+
+    def release_view(self) -> None:
+        # the view stays reachable while something else (the result cache) holds it
+        if self._view is not None:
+            self._released = weakref.ref(self._view)
+        self._view = None
+
+    def nbytes(self) -> int:
+        if self._base is None:
+            return 0
+        return sys.getsizeof(self._base) + sys.getsizeof(self._added) + sys.getsizeof(self._removed)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._added or (node_id in self._base and node_id not in self._removed)
+
+    def __iter__(self):
+        yield from self._added
+        for node_id in self._base:
+            if node_id not in self._removed:
+                yield node_id
+
+    def add(self, node_id: str) -> None:
+        if node_id not in self:
+            self._removed.discard(node_id)
+            if node_id not in self._base:
+                self._added.add(node_id)
+            self._view = self._released = None
+
+    def discard(self, node_id: str) -> None:
+        if node_id in self:
+            self._added.discard(node_id)
+            if node_id in self._base:
+                self._removed.add(node_id)
+            self._view = self._released = None
+
+    def __getstate__(self):
+        if self.evicted:
+            return self.query, None
+        return self.query, frozenset(self._base - self._removed | self._added)
+
+    def __setstate__(self, state):
+        self.query, self._base = state
+        self._added, self._removed = set(), set()
+        self._view = self._released = None
+
+    def result(self, original: Graph) -> Graph:
+        if self._view is None and self._released is not None:
+            self._view = self._released()
+        if self._view is None:
+            ids = self._base if not self._added and not self._removed else (self._base - self._removed) | self._added
+            self._view = SubgraphView(original, ids)
+            self._base, self._added, self._removed = self._view.node_ids, set(), set()
+        return self._view
+
+
+# default memory budget for the id sets of a workspace's query history
+HISTORY_BUDGET = 64 * 1024 * 1024
+# default number of edits that can be undone
+UNDO_LIMIT = 1000
 
 class GraphWorkspace:
-    def __init__(self, graph: Graph):
+    def __init__(self, graph: Graph, auto_index: bool = True, history_budget: int = HISTORY_BUDGET,
+                 undo_limit: int = UNDO_LIMIT, shared: bool = False, cache=None):
         self._original = graph
-        self._history: List[Graph] = [graph]
-        self._cursor = 0
-        self._queries: List[Query] = []
+        # a shared graph (e.g. from the GraphCache) is read by other workspaces
+        # too; it is swapped for a private copy before the first edit
+        self._shared = shared
+        # the GraphCache entry of a shared graph, held until the copy, a spill or close
+        self._cache = self._cache_key = None
+        if shared and cache is not None:
+            self._hold(cache)
+        self._stages: List[_Stage] = []
+        self.history_budget = history_budget
+        # journal of edits: each entry holds the inverse operations of one
+        # mutation call, to be applied in reverse order
+        self._undo: Deque[List[Operation]] = deque(maxlen=undo_limit)
+        self._redo: List[List[Operation]] = []
+        # sorted attribute indexes over the original graph, created on first filter
+        self._indexes = AttributeIndexes(auto_create=auto_index)
+        # node id -> [x, y] of the last layout the client reported
+        self.positions: Dict[str, List[float]] = {}
+        # callers hold `lock` for reading to render/query and for writing to
+        # mutate; `_guard` serializes the lazy stage rebuilds and index builds readers trigger
+        self.lock = RWLock()
+        self._guard = threading.RLock()
+
+    def __getstate__(self):
+        # derived state (attribute indexes, stage views) is rebuilt on demand after loading
+        state = self.__dict__.copy()
+        state["_indexes"] = AttributeIndexes(auto_create=self._indexes.auto_create)
+        del state["lock"], state["_guard"]
+        state["_shared"] = False
+        state["_cache"] = state["_cache_key"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shared = False
+        self._cache = self._cache_key = None
+        self.lock = RWLock()
+        self._guard = threading.RLock()
+
+    def estimated_bytes(self) -> int:
+        """
+        Rough resident size: the original graph, the history id sets and the
+        attribute indexes. A shared graph counts in full, as the workspace
+        keeps it resident (and its cache entry from eviction) until it spills.
+        """
+        return approx_graph_bytes(self._original) + sum(s.nbytes() for s in self._stages) + sum(ix["bytes"] for ix in self.list_indexes())
 
     @property
-    def current(self) -> Graph: return self._history[self._cursor]
+    def shared(self) -> bool:
+        return self._shared
+
     @property
-    def queries(self) -> List[Query]: return list(self._queries)
+    def cache_entry(self):
+        """(GraphCache, key) of the held entry of a shared graph, or None."""
+        return None if self._cache_key is None else (self._cache, self._cache_key)
+
+    def _hold(self, cache) -> None:
+        self._cache_key = cache.hold(self._original)
+        self._cache = cache if self._cache_key is not None else None
+        if self._cache is None:
+            # not (or no longer) cached: no one else reads it
+            self._shared = False
+
+    def release_graph(self) -> None:
+        """Releases the cache entry of a shared graph, e.g. when the workspace spills or closes."""
+        if self._cache_key is not None:
+            self._cache.release(self._cache_key)
+            self._cache = self._cache_key = None
+
+    def use_cached(self, cache, key) -> bool:
+        """
+        Swaps the original for the graph cached under `key`, shared again, if
+        it is still there; for a workspace loaded back after a spill, whose
+        original is a copy of it. Returns whether it was.
+        """
+        graph = cache.get(key)
+        if graph is None or cache.hold(graph) is None:
+            return False
+        with self._guard:
+            self._original, self._shared = graph, True
+            self._cache, self._cache_key = cache, key
+            for stage in self._stages:
+                stage.drop_view()
+        return True
+
+    def _own(self) -> None:
+        """Replaces a shared original graph by a private copy; ids and version stay, so the indexes still hold."""
+        from .snapshot import _no_gc
+        with self._guard, _no_gc():
+            self._original = self._original.copy()
+            self._shared = False
+            for stage in self._stages:
+                stage.drop_view()
+        self.release_graph()
+
+    @property
+    def current(self) -> Graph:
+        return self._result(len(self._stages) - 1)
+    @property
+    def original(self) -> Graph: return self._original
+    @property
+    def queries(self) -> List[Query]: return [s.query for s in self._stages]
+
+    def _result(self, i: int) -> Graph:
+        """Result of stage `i` (the original graph for -1), recomputing an evicted stage."""
+        if i < 0:
+            return self._original
+        with self._guard:
+            stage = self._stages[i]
+            if stage.evicted:
+                strat = STRATEGIES[stage.query["type"]]
+                stage.restore(strat.apply(self._result(i - 1), stage.query["value"], self._indexes))
+                if i < len(self._stages) - 1:
+                    stage.release_view()
+                self._enforce_budget(keep=i)
+            return stage.result(self._original)
+
+    def _push(self, query: Query, g: Graph) -> None:
+        if self._stages:
+            self._stages[-1].release_view()
+        self._stages.append(_Stage(query, g))
+        self._enforce_budget()
+
+    def _enforce_budget(self, keep: int = -1) -> None:
+        """Evicts the largest middle stages until the history fits its budget; the last stage stays."""
+        total = sum(s.nbytes() for s in self._stages)
+        while total > self.history_budget:
+            middle = [s for i, s in enumerate(self._stages[:-1]) if not s.evicted and i != keep]
+            if not middle:
+                break
+            victim = max(middle, key=_Stage.nbytes)
+            total -= victim.nbytes()
+            victim.evict()
+
+    def history_report(self) -> List[Dict[str, Any]]:
+        return [{"label": s.query["label"], "evicted": s.evicted, "bytes": s.nbytes()} for s in self._stages]
 
     def _reapply_all_queries(self):
-        kept_queries = list(self._queries)
-        self._history = [self._original]
-        self._cursor = 0
-        self._queries.clear()
+        kept_queries = self.queries
+        self._stages = []
         for q in kept_queries:
             if q["type"] == "search": self.apply_search(q["value"])
             else: self.apply_filter(q["value"])
 
+    def _propagate(self, node_id: str, existed: bool) -> bool:
+        """
+        Carries a change of one node through the query stages: the node is
+        re-tested against each stage whose input it is (now) part of, and
+        added to or dropped from that stage's result. Anything the stage
+        predicates cannot decide alone (an error, an attribute disappearing
+        from a stage's input) falls back to re-running every query.
+        Evicted stages are only tested; they pick the change up when recomputed.
+        Returns False if it fell back.
+        """
+        node = self._original.get_node_by_id(node_id)
+        was_in, is_in = existed, node is not None
+        try:
+            for i, stage in enumerate(self._stages):
+                strat = STRATEGIES[stage.query["type"]]
+                kept = is_in and strat.matches(node, stage.query["value"])
+                if was_in and not is_in and not self._still_present(i, node_id):
+                    raise FilterParseError("attribute left the stage input")
+                if stage.evicted:
+                    # whether the node was kept before is unknown; assume it was
+                    was_in, is_in = was_in, kept
+                    continue
+                was_kept = node_id in stage
+                if kept: stage.add(node_id)
+                else: stage.discard(node_id)
+                was_in, is_in = was_kept, kept
+        except (FilterParseError, FilterTypeError):
+            self._reapply_all_queries()
+            return False
+        return True
+
+    def _still_present(self, i: int, node_id: str) -> bool:
+        """Whether the attributes stage `i` filters on still occur in its input once `node_id` left it."""
+        stage = self._stages[i]
+        missing = set(STRATEGIES[stage.query["type"]].attributes(stage.query["value"]))
+        if not missing:
+            return True
+        g = self._original
+        if i > 0:
+            self._result(i - 1)
+        # the stage's own result is part of its input and usually settles it at once
+        sources = [] if stage.evicted else [stage]
+        sources.append((n.id for n in g.nodes) if i == 0 else self._stages[i - 1])
+        for ids in sources:
+            for other in ids:
+                n = g.get_node_by_id(other) if other != node_id else None
+                if n is not None:
+                    missing.difference_update(n.attributes.keys())
+                    if not missing:
+                        return True
+        return False
+
+    def _run(self, ops: List[Operation]) -> List[Operation]:
+        """
+        Applies `ops` in order and returns their inverses. If one fails, the
+        applied ones are undone before the error propagates. Indexes and the
+        query stages are brought up to date once, for all touched nodes.
+        """
+        if self._shared:
+            self._own()
+        g = self._original
+        before = g.version
+        existed: Dict[str, bool] = {}
+        inverses: List[Operation] = []
+        try:
+            for op in ops:
+                for node_id in op.node_ids():
+                    existed.setdefault(node_id, g.has_node(node_id))
+                inverses.append(op.apply(g))
+        except Exception:
+            for inverse in reversed(inverses):
+                inverse.apply(g)
+            raise
+        finally:
+            self._indexes.sync(g, before, existed)
+        self._propagate_all(existed)
+        return inverses
+
+    def _record(self, ops: List[Operation]) -> None:
+        self._undo.append(self._run(ops))
+        self._redo.clear()
+
+    def undo(self) -> Graph:
+        """Reverts the last mutation call (a whole batch counts as one)."""
+        if not self._undo:
+            raise ValueError("Nothing to undo.")
+        self._redo.append(self._run(self._undo[-1][::-1]))
+        self._undo.pop()
+        return self._original
+
+    def redo(self) -> Graph:
+        if not self._redo:
+            raise ValueError("Nothing to redo.")
+        self._undo.append(self._run(self._redo[-1][::-1]))
+        self._redo.pop()
+        return self._original
+
+    def _propagate_all(self, existed: Dict[str, bool]) -> None:
+        if not self._stages or not existed:
+            return
+        if len(existed) * 4 > len(self._original.nodes):
+            # a bulk change is cheaper to answer with one pass per query
+            self._reapply_all_queries()
+            return
+        for node_id, was in existed.items():
+            if not self._propagate(node_id, was):
+                return
+
     def create_node(self, node_data: Dict[str, Any]) -> Graph:
-        g = create_node(self.current, node_data)
-        self._original = g 
-        self._reapply_all_queries()
-        return g
+        self._record([CreateNode(node_data)])
+        return self._original
 
     def update_node(self, node_id: str, updates: Dict[str, Any]) -> Graph:
-        g = update_node(self.current, node_id, updates)
-        self._original = g 
-        self._reapply_all_queries()
-        return g
+        self._record([UpdateNode(node_id, updates)])
+        return self._original
 
     def delete_node(self, node_id: str) -> Graph:
-        g = delete_node(self.current, node_id)
-        self._original = g 
-        self._reapply_all_queries()
-        return g
-    
+        self._record([DeleteNode(node_id)])
+        return self._original
+
     def create_edge(self, from_id: str, to_id: str, edge_type: str) -> Graph:
-        g = create_edge(self.current, from_id, to_id, edge_type)
-        self._original = g 
-        self._reapply_all_queries()
-        return g
+        # queries select nodes only; the stage views pick the edge up from the graph
+        self._record([CreateEdge(from_id, to_id, edge_type)])
+        return self._original
+
+    def batch(self, operations: List[Union[Operation, Dict[str, Any]]]) -> Graph:
+        """
+        Applies many mutations as one transaction. Operations are `Operation`
+        objects or {"command": ..., "payload": ...} dicts in the graph-command
+        API format. All of them are validated before the graph is touched;
+        if applying one still fails, the earlier ones are rolled back.
+        """
+        ops = [op if isinstance(op, Operation) else parse_operation(op.get('command'), op.get('payload'))
+               for op in operations]
+        validate_operations(self._original, ops)
+        self._record(ops)
+        return self._original
 
     def reset(self):
-        self._history = [self._original]; self._cursor = 0; self._queries.clear()
+        self._stages = []
 
     def apply_search(self, q: str) -> Graph:
         if not q.strip():
-            return self.current  
+            return self.current
 
         strat = STRATEGIES["search"]
         g = strat.apply(self.current, q)
-        self._history.append(g); self._cursor += 1
-        self._queries.append({"type": strat.kind, "value": q, "label": strat.label(q)})
+        self._push({"type": strat.kind, "value": q, "label": strat.label(q)}, g)
         return g
-       
+
     def apply_filter(self, expr: str) -> Graph:
         if not expr.strip(): return self.current
         strat = STRATEGIES["filter"]
-        g = strat.apply(self.current, expr)
-        self._history.append(g); self._cursor += 1
-        self._queries.append({"type": strat.kind, "value": expr, "label": strat.label(expr)})
+        g = strat.apply(self.current, expr, self._indexes)
+        self._push({"type": strat.kind, "value": expr, "label": strat.label(expr)}, g)
         return g
 
+    def explain_filter(self, expr: str) -> Dict[str, Any]:
+        """Plans and runs `expr` on the current graph without recording it as a query."""
+        # runs under the read lock; building a missing index is serialized like a stage rebuild
+        with self._guard:
+            return explain_filter(self.current, expr, self._indexes)
+
+    def list_indexes(self) -> List[Dict[str, Any]]:
+        with self._guard:
+            return self._indexes.list()
+
+    def drop_index(self, attr: Optional[str] = None) -> List[str]:
+        return self._indexes.drop(attr)
+
     def remove_query(self, index: int) -> None:
-        kept = [q for i,q in enumerate(self._queries) if i != index]
-        self._history = [self._original]; self._cursor = 0; self._queries = []
-        for q in kept:
+        """Drops query `index`; the stages before it are kept and only the later ones re-run."""
+        if not 0 <= index < len(self._stages):
+            return
+        suffix = [s.query for s in self._stages[index + 1:]]
+        del self._stages[index:]
+        for q in suffix:
             if q["type"] == "search": self.apply_search(q["value"])
             else: self.apply_filter(q["value"])
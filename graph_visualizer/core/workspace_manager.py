@@ -1,32 +1,478 @@
+import hashlib
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Any, BinaryIO, Dict, List, Optional, Union
 from core.workspace import GraphWorkspace
+from core.snapshot import load_workspace, save_workspace
+from core.query_strategies import RESULT_CACHE
+from core.shared_store import Recorder, SessionStore, replay
+
+# bytes of workspaces kept in memory per process; override with GRAPH_EXPLORER_MEMORY_BUDGET
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+# seconds after which an unused session's workspaces are dropped; override with GRAPH_EXPLORER_SESSION_IDLE
+SESSION_IDLE_TIMEOUT = 14 * 24 * 3600
+
+# process-wide use counter, so LRU order can be compared across managers
+_ticks = itertools.count()
+
+class SpilledWorkspace:
+    """
+    Placeholder of a workspace evicted to disk. `cache_entry`: the
+    (GraphCache, key) its shared graph came from, read again from there on
+    load if still cached, instead of a private copy of the snapshot.
+    """
+
+    def __init__(self, path: str, estimated_bytes: int, cache_entry=None):
+        self.path = path
+        self.estimated_bytes = estimated_bytes
+        self.cache_entry = cache_entry
+
+    def load(self) -> GraphWorkspace:
+        wspace = load_workspace(self.path)
+        if self.cache_entry:
+            wspace.use_cached(*self.cache_entry)
+        return wspace
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class SharedWorkspace(SpilledWorkspace):
+    """Placeholder of a workspace that lives in the session's SessionStore; loading leaves it there."""
+
+    def __init__(self, store: SessionStore, wspace_id: str, generation: int, estimated_bytes: int = 0,
+                 cache_entry=None):
+        super().__init__(store.snapshot_path(wspace_id, generation), estimated_bytes, cache_entry)
+
+    def discard(self) -> None:
+        pass
+
+class MemoryBudget:
+    """
+    Byte limit on the resident workspaces of all managers registered with
+    it. Over the limit, the least recently used inactive workspaces, across
+    managers, are spilled to disk; workspaces in use are skipped.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        if limit is None:
+            limit = int(os.environ.get("GRAPH_EXPLORER_MEMORY_BUDGET", DEFAULT_MEMORY_BUDGET))
+        self.limit = limit
+        self._managers: "weakref.WeakSet[WorkspaceManager]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def register(self, manager: "WorkspaceManager") -> None:
+        self._managers.add(manager)
+
+    def enforce(self) -> List[str]:
+        """Spills until the resident workspaces fit; returns the spilled ids."""
+        with self._lock:
+            resident = sorted(entry for manager in list(self._managers) for entry in manager._resident())
+            total = sum(entry[1] for entry in resident)
+            spilled = []
+            for _, size, manager, wspace_id, active in resident:
+                if total <= self.limit:
+                    break
+                if not active and manager._spill(wspace_id):
+                    total -= size
+                    spilled.append(wspace_id)
+            return spilled
 
 class WorkspaceManager:
-    def __init__(self):
-        self.workspaces: dict[str, GraphWorkspace] = {}
+    """
+    The workspaces of one session. Methods are thread-safe; use `use()` to
+    work on the active workspace under its read or write lock.
+
+    With a `store`, the workspaces are shared with other processes: each
+    process keeps its own copy, changes go through the store's journal under
+    its writer lock, and the copies replay what other processes journaled
+    before they are used.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None, spill_dir: Optional[str] = None,
+                 budget: Optional[MemoryBudget] = None, store: Optional[SessionStore] = None):
+        self.workspaces: dict[str, Union[GraphWorkspace, SpilledWorkspace]] = {}
         self.active_id: str | None = None
         self.counter = 1
-    
-    def create_workspace(self, graph=None):
-        wspace_id = f"workspace{self.counter}"
-        self.counter += 1
-        wspace = GraphWorkspace(graph = graph)
-        self.workspaces[wspace_id] = wspace
-        self.active_id = wspace_id
+        self.budget = budget or MemoryBudget(memory_budget)
+        self.budget.register(self)
+        self._spill_dir = spill_dir
+        self._own_spill_dir = False
+        # resident workspace id -> last use tick, least recently used first
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._sizes: Dict[str, tuple] = {}   # id -> (graph version, history length, bytes)
+        self._lock = threading.RLock()
+        self.store = store
+        self._manifest = None
+        self._shared: Dict[str, List[int]] = {}   # id -> [generation, bytes of the previous journal]
+        self._offsets: Dict[str, int] = {}        # id -> journal bytes the local copy has replayed
+
+    @property
+    def memory_budget(self) -> int:
+        return self.budget.limit
+
+    def create_workspace(self, graph=None, shared: bool = False, cache=None):
+        """
+        `shared`: the graph is also used elsewhere and is copied before the
+        first edit; `cache`: the GraphCache it came from, whose entry the
+        workspace holds until then.
+        """
+        return self._add(GraphWorkspace(graph = graph, shared = shared, cache = cache))
+
+    def _add(self, wspace: GraphWorkspace):
+        with self._writing(), self._lock:
+            self._sync()
+            wspace_id = f"workspace{self.counter}"
+            self.counter += 1
+            self.workspaces[wspace_id] = wspace
+            self.active_id = wspace_id
+            self._touch(wspace_id)
+            if self.store:
+                self.store.save(wspace_id, 0, wspace)
+                self._shared[wspace_id], self._offsets[wspace_id] = [0, 0], 0
+                self._publish()
+        self.enforce_budget()
         return wspace_id, wspace
-    
+
+    def open_snapshot(self, path: str):
+        """Opens a workspace saved with `save_snapshot` as a new, active workspace."""
+        return self._add(load_workspace(path))
+
+    def save_snapshot(self, path: Union[str, BinaryIO], wspace_id: Optional[str] = None) -> None:
+        """Saves a workspace (the active one by default) to a file path or an open binary file."""
+        with self._lock:
+            wspace = self.get(wspace_id or self.active_id)
+        with wspace.lock.read():
+            save_workspace(wspace, path)
+
     def close_workspace(self, wspace_id: str):
-        if wspace_id in self.workspaces and len(self.workspaces) > 1:
-            del self.workspaces[wspace_id]
-            if self.active_id == wspace_id:
-                self.active_id = next(iter(self.workspaces.keys()))
-            
+        with self._writing(), self._lock:
+            self._sync()
+            if wspace_id in self.workspaces and len(self.workspaces) > 1:
+                shared = self._shared.get(wspace_id)
+                self._discard(wspace_id)
+                if self.active_id == wspace_id:
+                    self.active_id = next(iter(self.workspaces.keys()))
+                if shared:
+                    self._publish()
+                    self.store.remove(wspace_id, shared[0])
+                    self.store.remove(wspace_id, shared[0] - 1)
+
+    def _discard(self, wspace_id: str) -> None:
+        wspace = self.workspaces.pop(wspace_id)
+        self._lru.pop(wspace_id, None)
+        self._sizes.pop(wspace_id, None)
+        self._shared.pop(wspace_id, None)
+        self._offsets.pop(wspace_id, None)
+        if isinstance(wspace, SpilledWorkspace):
+            wspace.discard()
+        elif wspace.shared:
+            # results on a shared graph stay useful to the other workspaces on it
+            wspace.release_graph()
+        else:
+            RESULT_CACHE.discard_graph(wspace.original)
+
+    def close(self) -> None:
+        """Drops every workspace, e.g. when the session ends. A shared store keeps its copy."""
+        with self._lock:
+            for wspace_id in list(self.workspaces):
+                self._discard(wspace_id)
+            self.active_id = None
+            self._manifest = None
+            if self._own_spill_dir and self._spill_dir:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir, self._own_spill_dir = None, False
+
     def switch_workspace(self, wspace_id: str):
-        if wspace_id in self.workspaces:
+        with self._writing(), self._lock:
+            self._sync()
+            if wspace_id not in self.workspaces:
+                return
             self.active_id = wspace_id
-    
+            self._publish()
+            self.get(wspace_id)
+        self.enforce_budget()
+
+    def get(self, wspace_id: str) -> Optional[GraphWorkspace]:
+        """The workspace `wspace_id`, loaded back from disk if it was spilled."""
+        with self._lock:
+            wspace = self.workspaces.get(wspace_id)
+            if isinstance(wspace, SpilledWorkspace):
+                spilled = wspace
+                wspace = self.workspaces[wspace_id] = spilled.load()
+                spilled.discard()
+                if isinstance(spilled, SharedWorkspace):
+                    calls, self._offsets[wspace_id] = self.store.read(wspace_id, self._shared[wspace_id][0], 0)
+                    replay(wspace, calls)
+            if wspace is not None:
+                self._touch(wspace_id)
+            return wspace
+
     def get_active(self) -> GraphWorkspace:
-        return self.workspaces.get(self.active_id)
-    
+        return self.get(self.active_id)
+
+    @contextmanager
+    def use(self, write: bool = False):
+        """
+        Yields the active workspace (None if there is none) holding its lock:
+        shared for renders and read-only commands, exclusive for mutations.
+        With a store, a write also holds the store's writer lock and yields a
+        Recorder, whose journaled calls are appended when the block ends.
+        """
+        with self._writing() if write else nullcontext():
+            while True:
+                with self._lock:
+                    self._sync()
+                    wspace_id = self.active_id
+                    wspace = self.get(wspace_id)
+                if wspace is None:
+                    yield None
+                    return
+                if self.store and not write:
+                    self._catch_up(wspace_id, wspace)
+                if write:
+                    wspace.lock.acquire_write()
+                else:
+                    wspace.lock.acquire_read()
+                if self.workspaces.get(wspace_id) is wspace:
+                    break
+                # spilled between the lookup and the lock; load it again
+                wspace.lock.release_write() if write else wspace.lock.release_read()
+            if not (self.store and write):
+                try:
+                    yield wspace
+                finally:
+                    wspace.lock.release_write() if write else wspace.lock.release_read()
+                return
+            recorder = Recorder(wspace)
+            try:
+                self._replay(wspace_id, wspace)
+                yield recorder
+            finally:
+                try:
+                    if recorder.calls:
+                        self._journal(wspace_id, wspace, recorder.calls)
+                finally:
+                    wspace.lock.release_write()
+
+    def _writing(self):
+        return self.store.writing() if self.store else nullcontext()
+
+    def _sync(self) -> None:
+        """Brings the workspace list, active id and counter in line with the store's manifest."""
+        if not self.store:
+            return
+        manifest = self.store.manifest()
+        if manifest is self._manifest:
+            return
+        self._manifest = manifest
+        shared = manifest["workspaces"]
+        for wspace_id in list(self.workspaces):
+            if wspace_id not in shared:
+                self._discard(wspace_id)
+        for wspace_id, (generation, previous) in shared.items():
+            mine = self._shared.get(wspace_id)
+            if mine and mine[0] == generation:
+                continue
+            if mine and mine[0] + 1 == generation and self._offsets.get(wspace_id) == previous:
+                # compacted after everything this copy has replayed: the copy is still current
+                self._offsets[wspace_id] = 0
+            else:
+                size = self._sizes.pop(wspace_id, (0, 0, 0))[2]
+                self.workspaces[wspace_id] = SharedWorkspace(self.store, wspace_id, generation, size)
+                self._lru.pop(wspace_id, None)
+            self._shared[wspace_id] = [generation, previous]
+        self.active_id = manifest["active"]
+        self.counter = manifest["counter"]
+
+    def _publish(self) -> None:
+        """Writes the local workspace list to the store; call under its writer lock, after `_sync`."""
+        if self.store:
+            self.store.write_manifest({"counter": self.counter, "active": self.active_id, "workspaces": self._shared})
+            self._manifest = self.store.manifest()
+
+    def _replay(self, wspace_id: str, wspace: GraphWorkspace) -> None:
+        """Applies calls journaled by other processes; needs the workspace's write lock."""
+        shared = self._shared.get(wspace_id)
+        if shared:
+            calls, self._offsets[wspace_id] = self.store.read(wspace_id, shared[0], self._offsets[wspace_id])
+            replay(wspace, calls)
+
+    def _catch_up(self, wspace_id: str, wspace: GraphWorkspace) -> None:
+        shared = self._shared.get(wspace_id)
+        if shared and self.store.journal_size(wspace_id, shared[0]) > self._offsets.get(wspace_id, 0):
+            with wspace.lock.write():
+                self._replay(wspace_id, wspace)
+
+    def _journal(self, wspace_id: str, wspace: GraphWorkspace, calls) -> None:
+        generation = self._shared[wspace_id][0]
+        end = self._offsets[wspace_id] = self.store.append(wspace_id, generation, calls)
+        if end < self.store.compact_bytes:
+            return
+        # fold the journal into a new snapshot; readers a generation behind can still finish
+        self.store.save(wspace_id, generation + 1, wspace)
+        with self._lock:
+            self._sync()
+            self._shared[wspace_id], self._offsets[wspace_id] = [generation + 1, end], 0
+            self._publish()
+        self.store.remove(wspace_id, generation - 1)
+
     def get_all(self):
         return self.workspaces
 
+    def _touch(self, wspace_id: str) -> None:
+        self._lru[wspace_id] = next(_ticks)
+        self._lru.move_to_end(wspace_id)
+
+    def _estimate(self, wspace_id: str) -> int:
+        wspace = self.workspaces[wspace_id]
+        if isinstance(wspace, SpilledWorkspace):
+            return wspace.estimated_bytes
+        key = (wspace.original.version, len(wspace.queries))
+        cached = self._sizes.get(wspace_id)
+        if cached is None or cached[:2] != key:
+            # a workspace being mutated keeps its last estimate
+            if not wspace.lock.acquire_read(blocking=False):
+                return cached[2] if cached else 0
+            try:
+                cached = self._sizes[wspace_id] = key + (wspace.estimated_bytes(),)
+            finally:
+                wspace.lock.release_read()
+        return cached[2]
+
+    def _resident(self) -> List[tuple]:
+        with self._lock:
+            return [(tick, self._estimate(w), self, w, w == self.active_id) for w, tick in self._lru.items()]
+
+    def enforce_budget(self) -> List[str]:
+        """Spills least recently used inactive workspaces until the resident ones fit the budget."""
+        return self.budget.enforce()
+
+    def _spill(self, wspace_id: str) -> bool:
+        with self._lock:
+            wspace = self.workspaces.get(wspace_id)
+            if not isinstance(wspace, GraphWorkspace) or wspace_id == self.active_id:
+                return False
+            size = self._estimate(wspace_id)
+            if not wspace.lock.acquire_write(blocking=False):
+                return False
+            try:
+                # a shared graph is reloaded through its cache entry, if that is still there
+                cache_entry = wspace.cache_entry
+                if wspace_id in self._shared:
+                    # the store holds it already: dropping the copy is enough
+                    spilled = SharedWorkspace(self.store, wspace_id, self._shared[wspace_id][0], size, cache_entry)
+                else:
+                    if self._spill_dir is None:
+                        self._spill_dir = tempfile.mkdtemp(prefix="graph-explorer-spill-")
+                        self._own_spill_dir = True
+                    path = os.path.join(self._spill_dir, f"{wspace_id}.gvs")
+                    save_workspace(wspace, path)
+                    spilled = SpilledWorkspace(path, size, cache_entry)
+                if wspace.shared:
+                    wspace.release_graph()
+                else:
+                    RESULT_CACHE.discard_graph(wspace.original)
+                self.workspaces[wspace_id] = spilled
+                self._lru.pop(wspace_id, None)
+            finally:
+                wspace.lock.release_write()
+            return True
+
+    def memory_report(self) -> List[Dict[str, Any]]:
+        report = []
+        with self._lock:
+            for wspace_id, wspace in self.workspaces.items():
+                spilled = isinstance(wspace, SpilledWorkspace)
+                report.append({
+                    "id": wspace_id,
+                    "active": wspace_id == self.active_id,
+                    "resident": not spilled,
+                    "estimated_bytes": self._estimate(wspace_id),
+                    "disk_bytes": os.path.getsize(wspace.path) if spilled else 0,
+                })
+        return report
+
+    def __del__(self):
+        if self._own_spill_dir and self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+class SessionWorkspaces:
+    """
+    One WorkspaceManager per session key, all sharing one process-wide
+    MemoryBudget. With a `shared_dir` (or GRAPH_EXPLORER_SHARED_DIR), every
+    session's workspaces are kept in a SessionStore under it, so all worker
+    processes serving the session see the same workspaces.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None, budget: Optional[MemoryBudget] = None,
+                 shared_dir: Optional[str] = None):
+        if idle_timeout is None:
+            idle_timeout = float(os.environ.get("GRAPH_EXPLORER_SESSION_IDLE", SESSION_IDLE_TIMEOUT))
+        self.idle_timeout = idle_timeout
+        self.budget = budget or MemoryBudget()
+        self.shared_dir = shared_dir or os.environ.get("GRAPH_EXPLORER_SHARED_DIR") or None
+        self._touched: Dict[str, float] = {}
+        self._managers: Dict[str, WorkspaceManager] = {}
+        self._last_used: Dict[str, float] = {}
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, session_key: str) -> WorkspaceManager:
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            manager = self._managers.get(session_key)
+            if manager is None:
+                store = SessionStore(self._store_dir(session_key)) if self.shared_dir else None
+                manager = self._managers[session_key] = WorkspaceManager(budget=self.budget, store=store)
+            self._last_used[session_key] = now
+            if manager.store and now - self._touched.get(session_key, -60.0) >= 60.0:
+                # other processes judge the session's idleness by the directory's mtime
+                self._touched[session_key] = now
+                manager.store.touch()
+            sweep = now >= self._next_sweep
+            if sweep:
+                self._next_sweep = now + min(self.idle_timeout, 60.0)
+                for key, used in list(self._last_used.items()):
+                    if now - used > self.idle_timeout:
+                        del self._last_used[key]
+                        self._touched.pop(key, None)
+                        expired.append(self._managers.pop(key))
+        for stale in expired:
+            stale.close()
+        if sweep and self.shared_dir:
+            self._sweep_shared()
+        return manager
+
+    def _store_dir(self, session_key: str) -> str:
+        return os.path.join(self.shared_dir, hashlib.sha1(session_key.encode()).hexdigest())
+
+    def _sweep_shared(self) -> None:
+        """Removes the stores of sessions no process has used within the idle timeout."""
+        cutoff = time.time() - self.idle_timeout
+        for entry in os.scandir(self.shared_dir) if os.path.isdir(self.shared_dir) else ():
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def drop(self, session_key: str) -> None:
+        with self._lock:
+            manager = self._managers.pop(session_key, None)
+            self._last_used.pop(session_key, None)
+            self._touched.pop(session_key, None)
+        if manager is not None:
+            manager.close()
+        if self.shared_dir:
+            shutil.rmtree(self._store_dir(session_key), ignore_errors=True)
+
+    def __len__(self):
+        return len(self._managers)
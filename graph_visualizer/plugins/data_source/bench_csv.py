@@ -0,0 +1,78 @@
+"""
+Throughput of the CSV edge-list loader against the JSON loader.
+
+Run from the graph_visualizer directory:
+
+    python -m plugins.data_source.bench_csv [--nodes 100000 1000000]
+
+At each size the synthetic social dataset of bench_loader_scaling (three
+follows/likes references per user) is written as JSON and as the same
+graph in CSV: a node list (id, name, email) and an edge list (source,
+target, type). Loaded are the JSON file, the CSV edge list with its node
+list, and the bare edge list as exports usually come. Reported are the load
+time and edge rows per second; --nodes 3333334 gives a 10M-row edge list.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from plugins.data_source.bench_loader_scaling import write_social
+from plugins.data_source.csv_data_source.csv_data_source import CsvDataSourceLoader
+from plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
+from plugins.data_source.json_data_source.dataset.dataset_config import SOCIAL_JSON_CONFIG
+
+
+def write_social_csv(n: int, nodes_path: str, edges_path: str) -> None:
+    """The graph of `write_social(n)` as a node list and an edge list."""
+    with open(nodes_path, "w") as f:
+        f.write("id,name,email\n")
+        for i in range(n):
+            f.write(f"u{i},User {i},user{i}@example.com\n")
+    with open(edges_path, "w") as f:
+        f.write("source,target,type\n")
+        for i in range(n):
+            f.write(f"u{i},u{(i * 7 + 1) % n},follows\nu{i},u{(i * 13 + 5) % n},follows\n"
+                    f"u{i},u{(i * 31 + 3) % n},likes\n")
+
+
+def timed(load):
+    started = time.perf_counter()
+    graph = load()
+    return graph, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    header = f"{'loader':<16}{'nodes':>10}{'edges':>10}{'MiB':>8}{'seconds':>10}{'rows/s':>12}{'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in args.nodes:
+            json_path = os.path.join(tmp_dir, "social.json")
+            nodes_path, edges_path = os.path.join(tmp_dir, "nodes.csv"), os.path.join(tmp_dir, "edges.csv")
+            write_social(n, json_path)
+            write_social_csv(n, nodes_path, edges_path)
+            cases = [
+                ("json", json_path, lambda: JsonDataSourceLoader(SOCIAL_JSON_CONFIG).load_data(json_path)),
+                ("csv + nodes", edges_path,
+                 lambda: CsvDataSourceLoader({"nodes_file": nodes_path}).load_data(edges_path)),
+                ("csv edges only", edges_path, lambda: CsvDataSourceLoader().load_data(edges_path)),
+            ]
+            baseline = None
+            for label, path, load in cases:
+                graph, elapsed = timed(load)
+                baseline = baseline or elapsed
+                size = os.path.getsize(path) + (os.path.getsize(nodes_path) if label == "csv + nodes" else 0)
+                print(f"{label:<16}{len(graph.nodes):>10}{len(graph.edges):>10}{size / 2**20:>8.1f}"
+                      f"{elapsed:>10.2f}{len(graph.edges) / elapsed:>12,.0f}{baseline / elapsed:>8.1f}x")
+                del graph
+            for path in (json_path, nodes_path, edges_path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Scaling of the JSON loader with the number of nodes.
+
+Run from the graph_visualizer directory:
+
+    python -m plugins.data_source.bench_loader_scaling [--nodes 10000 100000 1000000]
+
+Synthetic versions of social_dataset.json (a node list with id references),
+project_dataset.json (projects and contributors referencing each other as
+nested objects) and people_dataset.json (a dict keyed by node id, the shape
+that used to be quadratic) are generated at each size and loaded. Reported
+are the load time and the time per node. The growth column is the time
+ratio to the previous size, divided by the size ratio; about 1 means linear.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
+from plugins.data_source.json_data_source.dataset.dataset_config import (
+    PEOPLE_JSON_CONFIG, PROJECT_JSON_CONFIG, SOCIAL_JSON_CONFIG
+)
+
+
+def _write_entries(path: str, head: str, entries, tail: str) -> None:
+    # entries are written one at a time, so 1M-node files need no 1M-node dict in memory
+    with open(path, "w") as f:
+        f.write(head)
+        for i, entry in enumerate(entries):
+            if i:
+                f.write(",\n")
+            f.write(entry)
+        f.write(tail)
+
+
+def write_social(n: int, path: str) -> None:
+    _write_entries(path, '{"directed": true, "nodes": [\n', (json.dumps({
+        "id": f"u{i}", "name": f"User {i}", "email": f"user{i}@example.com",
+        "follows": [f"u{(i * 7 + 1) % n}", f"u{(i * 13 + 5) % n}"], "likes": [f"u{(i * 31 + 3) % n}"],
+    }) for i in range(n)), "\n]}\n")
+
+
+def write_project(n: int, path: str) -> None:
+    projects = max(1, n // 10)
+
+    def ref(i: int) -> dict:
+        if i < projects:
+            return {"@id": f"p{i}", "type": "Project", "name": f"Project {i}", "status": "Active"}
+        return {"@id": f"c{i}", "type": "Contributor", "name": f"Contributor {i}"}
+
+    def entry(i: int) -> str:
+        node = ref(i)
+        if i < projects:
+            node["contributors"] = [ref(projects + (i * 9 + k) % (n - projects)) for k in range(4)] if n > projects else []
+        else:
+            node["department"] = "R&D"
+            node["projects"] = [ref((i * 3 + k) % projects) for k in range(2)]
+        return json.dumps(node)
+
+    _write_entries(path, '{"directed": true, "nodes": [\n', (entry(i) for i in range(n)), "\n]}\n")
+
+
+def write_people(n: int, path: str) -> None:
+    _write_entries(path, '{"directed": true,\n', (f'"person{i}": ' + json.dumps({
+        "name": f"Person {i}", "type": "Person", "age": str(18 + i % 60),
+        "knows": [f"person{(i * 7 + 1) % n}", f"person{(i * 11 + 2) % n}"],
+    }) for i in range(n)), "\n}\n")
+
+
+CASES = [("social", write_social, SOCIAL_JSON_CONFIG),
+         ("project", write_project, PROJECT_JSON_CONFIG),
+         ("people", write_people, PEOPLE_JSON_CONFIG)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    header = f"{'dataset':<10}{'nodes':>10}{'edges':>10}{'MiB':>8}{'seconds':>10}{'us/node':>10}{'growth':>8}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, write, config in CASES:
+            previous = None
+            for n in args.nodes:
+                path = os.path.join(tmp_dir, f"{label}_{n}.json")
+                write(n, path)
+                started = time.perf_counter()
+                graph = JsonDataSourceLoader(config).load_data(path)
+                elapsed = time.perf_counter() - started
+                growth = f"{(elapsed / previous[1]) / (n / previous[0]):>8.2f}" if previous else f"{'':>8}"
+                print(f"{label:<10}{len(graph.nodes):>10}{len(graph.edges):>10}{os.path.getsize(path) / 2**20:>8.1f}"
+                      f"{elapsed:>10.2f}{elapsed / n * 1e6:>10.1f}{growth}")
+                previous = (n, elapsed)
+                del graph
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Memory footprint of the data source loaders, legacy vs. slotted model.
+
+Run from the graph_visualizer directory:
+
+    python -m plugins.data_source.bench_memory [--nodes 100000]
+
+For every bundled dataset the graph is loaded twice: once with dict-backed
+Node/Edge classes equivalent to the previous model (uuid4 ids, unused
+`children` list) and once with the current slotted classes. The retained
+size of the resulting graph is measured with tracemalloc. `--nodes` adds a
+synthetic social-style dataset of the given size and extrapolates to 1M nodes.
+"""
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+from plugins.data_source.json_data_source import json_data_source as json_module
+from plugins.data_source.json_data_source.dataset.dataset_config import (
+    NETWORK_JSON_CONFIG, PEOPLE_JSON_CONFIG, PROJECT_JSON_CONFIG, SOCIAL_JSON_CONFIG
+)
+from plugins.data_source.xml_data_source import xml_data_source as xml_module
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JSON_DIR = os.path.join(HERE, "json_data_source", "dataset")
+XML_DIR = os.path.join(HERE, "xml_data_source", "data")
+
+
+class LegacyNode:
+    _id_counter = 0
+
+    def __init__(self, name, node_id=None, children=None):
+        self.name = name
+        self.attributes = {}
+        self.id = node_id if node_id else str(uuid.uuid4())
+        LegacyNode._id_counter += 1
+        self.children = children or []
+
+    def add_attribute(self, name, value):
+        self.attributes[name] = value
+
+
+class LegacyEdge:
+    _id_counter = 0
+
+    def __init__(self, directed, from_node, to_node, edge_type, edge_id=None):
+        self.directed = directed
+        self.from_node = from_node
+        self.to_node = to_node
+        self.type = edge_type
+        self.id = edge_id if edge_id else str(uuid.uuid4())
+        LegacyEdge._id_counter += 1
+
+
+@contextmanager
+def legacy_model():
+    """Temporarily makes both loaders construct the legacy classes."""
+    saved = [(m, m.Node, m.Edge) for m in (json_module, xml_module)]
+    for m, _, _ in saved:
+        m.Node, m.Edge = LegacyNode, LegacyEdge
+    try:
+        yield
+    finally:
+        for m, node_cls, edge_cls in saved:
+            m.Node, m.Edge = node_cls, edge_cls
+
+
+def measure(load):
+    """Returns (graph, retained bytes) for a loader call."""
+    tracemalloc.start()
+    try:
+        graph = load()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return graph, retained
+
+
+def write_synthetic_social(n: int, path: str) -> None:
+    nodes = [
+        {
+            "id": f"u{i}",
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "follows": [f"u{(i * 7 + 1) % n}", f"u{(i * 13 + 5) % n}"],
+            "likes": [],
+        }
+        for i in range(n)
+    ]
+    with open(path, "w") as f:
+        json.dump({"directed": True, "nodes": nodes}, f)
+
+
+def cases(synthetic_nodes: int, tmp_dir: str):
+    for config in (PEOPLE_JSON_CONFIG, NETWORK_JSON_CONFIG, SOCIAL_JSON_CONFIG, PROJECT_JSON_CONFIG):
+        loader = json_module.JsonDataSourceLoader(config)
+        yield loader.name(), config["file_name"], loader, os.path.join(JSON_DIR, config["file_name"])
+
+    xml_loader = xml_module.XmlDataSourceLoader(cache=False)
+    for file_name in sorted(os.listdir(XML_DIR)):
+        yield xml_loader.name(), file_name, xml_loader, os.path.join(XML_DIR, file_name)
+
+    if synthetic_nodes:
+        path = os.path.join(tmp_dir, f"social_{synthetic_nodes}.json")
+        write_synthetic_social(synthetic_nodes, path)
+        loader = json_module.JsonDataSourceLoader(SOCIAL_JSON_CONFIG)
+        yield loader.name(), os.path.basename(path), loader, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=0, help="size of an extra synthetic dataset")
+    args = parser.parse_args()
+
+    header = f"{'loader':<24}{'file':<26}{'nodes':>8}{'edges':>8}{'legacy KiB':>12}{'slotted KiB':>13}{'saved':>8}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for loader_name, file_name, loader, path in cases(args.nodes, tmp_dir):
+            with legacy_model():
+                _, before = measure(lambda: loader.load_data(path))
+            graph, after = measure(lambda: loader.load_data(path))
+            n_nodes, n_edges = len(graph.nodes), len(graph.edges)
+            saved = 1 - after / before if before else 0.0
+            print(f"{loader_name:<24}{file_name:<26}{n_nodes:>8}{n_edges:>8}"
+                  f"{before / 1024:>12.1f}{after / 1024:>13.1f}{saved:>8.0%}")
+            if path.startswith(tmp_dir) and n_nodes:
+                per_node = after / n_nodes
+                print(f"  ~{per_node:.0f} B per node (incl. edges) -> ~{per_node * 1_000_000 / 2**20:.0f} MiB per 1M nodes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Reopening a workspace from a binary snapshot vs. re-running the loaders.
+
+Run from the graph_visualizer directory:
+
+    python -m plugins.data_source.bench_snapshot [--nodes 500000] [--xml-nodes 20000]
+
+A synthetic social dataset (two follow edges per user, so `--nodes 500000`
+gives 1M edges) is loaded with the JSON loader, a synthetic street map with
+the XML loader. Each graph is put in a workspace with a search applied and
+saved as a snapshot; the table compares the loader against loading the
+snapshot, and the time until the first filter answer after either.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from core.snapshot import load_workspace, save_workspace
+from core.workspace import GraphWorkspace
+from plugins.data_source.bench_memory import write_synthetic_social
+from plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
+from plugins.data_source.json_data_source.dataset.dataset_config import SOCIAL_JSON_CONFIG
+from plugins.data_source.xml_data_source.xml_data_source import XmlDataSourceLoader
+
+
+def write_synthetic_streets(n: int, path: str) -> None:
+    with open(path, "w") as f:
+        f.write('<CityMap type="directed">\n')
+        for i in range(1, n + 1):
+            refs = "".join(f"<reference>/CityMap/Street[{(i * k) % n + 1}]</reference>" for k in (3, 7))
+            f.write(f'<Street id="S{i}"><name>Street {i}</name><speed_limit>{30 + i % 5 * 10}</speed_limit>{refs}</Street>\n')
+        f.write("</CityMap>\n")
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run_case(label: str, load, tmp_dir: str, query: str, expr: str) -> None:
+    graph, t_loader = timed(load)
+    ws = GraphWorkspace(graph)
+    ws.apply_search(query)
+    _, t_first = timed(lambda: ws.apply_filter(expr))
+
+    path = os.path.join(tmp_dir, "workspace.gvs")
+    _, t_save = timed(lambda: save_workspace(ws, path))
+    reopened, t_snapshot = timed(lambda: load_workspace(path))
+    reopened.remove_query(1)
+    _, t_first_snapshot = timed(lambda: reopened.apply_filter(expr))
+
+    print(f"{label:<10}{len(graph.nodes):>9}{len(graph.edges):>9}{t_loader:>10.2f}{t_snapshot:>10.2f}"
+          f"{t_loader / t_snapshot:>8.1f}x{t_first:>11.3f}{t_first_snapshot:>11.3f}"
+          f"{os.path.getsize(path) / 2**20:>9.1f}{t_save:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=500_000, help="users in the synthetic JSON dataset")
+    parser.add_argument("--xml-nodes", type=int, default=20_000, help="streets in the synthetic XML dataset")
+    args = parser.parse_args()
+
+    header = (f"{'loader':<10}{'nodes':>9}{'edges':>9}{'loader s':>10}{'snap s':>10}{'speedup':>9}"
+              f"{'filter s':>11}{'filter* s':>11}{'MiB':>9}{'save s':>8}")
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "social.json")
+        write_synthetic_social(args.nodes, json_path)
+        run_case("json", lambda: JsonDataSourceLoader(SOCIAL_JSON_CONFIG).load_data(json_path),
+                 tmp_dir, "user", "email != x")
+        if args.xml_nodes:
+            xml_path = os.path.join(tmp_dir, "streets.xml")
+            write_synthetic_streets(args.xml_nodes, xml_path)
+            run_case("xml", lambda: XmlDataSourceLoader(cache=False).load_data(xml_path), tmp_dir, "street", "speed_limit > 40")
+    print("filter s: first filter after loading; filter*: the same after reopening the snapshot")
+
+
+if __name__ == "__main__":
+    main()
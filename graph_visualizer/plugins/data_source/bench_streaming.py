@@ -0,0 +1,64 @@
+"""
+Peak memory of the JSON loader, whole-document vs. streaming mode.
+
+Run from the graph_visualizer directory:
+
+    python -m plugins.data_source.bench_streaming [--nodes 20000 100000 500000]
+
+For synthetic social datasets of the given sizes, the graph is loaded with
+`json.load` and with "streaming": True. Reported are the peak traced
+memory during the load, the memory the finished graph retains, and their
+difference: the parser's own overhead, which streaming keeps flat.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from plugins.data_source.bench_memory import write_synthetic_social
+from plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
+from plugins.data_source.json_data_source.dataset.dataset_config import SOCIAL_JSON_CONFIG
+
+
+def measure(load):
+    """Returns (peak bytes, retained bytes, seconds) for a loader call."""
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        graph = load()
+        elapsed = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del graph
+    return peak, retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[20_000, 100_000, 500_000])
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="characters per read in streaming mode")
+    args = parser.parse_args()
+
+    header = (f"{'nodes':>8}{'file MiB':>10}{'mode':>11}{'peak MiB':>10}{'graph MiB':>11}"
+              f"{'overhead':>10}{'seconds':>9}")
+    print(header)
+    print("-" * len(header))
+    modes = [("json.load", SOCIAL_JSON_CONFIG),
+             ("streaming", dict(SOCIAL_JSON_CONFIG, streaming=True, chunk_size=args.chunk_size))]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in args.nodes:
+            path = os.path.join(tmp_dir, f"social_{n}.json")
+            write_synthetic_social(n, path)
+            size = os.path.getsize(path) / 2**20
+            for mode, config in modes:
+                peak, retained, elapsed = measure(lambda: JsonDataSourceLoader(config).load_data(path))
+                print(f"{n:>8}{size:>10.1f}{mode:>11}{peak / 2**20:>10.1f}{retained / 2**20:>11.1f}"
+                      f"{(peak - retained) / 2**20:>10.1f}{elapsed:>9.2f}")
+            os.remove(path)
+    print("overhead: peak minus the finished graph, i.e. memory the parsing itself needed")
+
+
+if __name__ == "__main__":
+    main()
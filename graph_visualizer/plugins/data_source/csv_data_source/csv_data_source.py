@@ -0,0 +1,273 @@
+import csv
+import gc
+import io
+import itertools
+import os
+import re
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from api.model.csr import CsrGraph
+from api.model.edge import Edge
+from api.model.graph import Graph
+from api.model.node import Node
+from api.components.data_source import DataSourceService, Stream, open_stream
+
+# rows parsed and interned per step
+CHUNK_ROWS = 1 << 18
+# edge type for rows without a type column
+DEFAULT_EDGE_TYPE = "edge"
+# a number written with a leading zero (e.g. a zip code) or with "_"; such columns stay strings
+_KEEP_STR = re.compile(r"\s*[+-]?0\d|[^_]*_")
+_TYPES = {"int": int, "float": float}
+
+
+@contextmanager
+def _no_gc():
+    # the loader only allocates; collections over millions of fresh objects find nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class _Interner:
+    """Gives strings dense integer codes in the order they are first seen."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def add(self, values: Iterable[str]) -> None:
+        """Interns the ones of `values` not seen before."""
+        codes = self._codes
+        # dict.fromkeys drops repeats in C, so the membership test runs once per distinct value
+        new = [v for v in dict.fromkeys(values) if v not in codes]
+        start = len(self.values)
+        self.values.extend(new)
+        codes.update(zip(new, range(start, start + len(new))))
+
+    def codes(self, values: List[str]) -> np.ndarray:
+        """The codes of interned `values` as an integer array."""
+        return np.fromiter(map(self._codes.__getitem__, values), dtype=np.int64, count=len(values))
+
+
+def _typed(key: str, column: List[str], kind: Optional[str] = None) -> list:
+    """
+    A whole str column as ints or floats: as `kind` ("int", "float" or
+    "str") when given, else when all of its values parse and none has a
+    leading zero; otherwise as it is.
+    """
+    if kind == "str" or not column:
+        return column
+    if kind is not None:
+        if kind not in _TYPES:
+            raise ValueError(f"Unknown type '{kind}' for column '{key}'; use int, float or str")
+        try:
+            return list(map(_TYPES[kind], column))
+        except ValueError:
+            raise ValueError(f"Column '{key}' has values that are not {kind}s") from None
+    # on the list itself: a text column stops at its first value instead of becoming a wide NumPy array
+    if any(map(_KEEP_STR.match, column)):
+        return column
+    for parse in _TYPES.values():
+        try:
+            return list(map(parse, column))
+        except ValueError:
+            pass
+    return column
+
+
+class CsvDataSourceLoader(DataSourceService):
+    """
+    Builds a graph from a CSV or TSV edge list: a header row, then one row
+    per edge with its source and target node ids and optionally its type
+    (see `__init__` for the column names). Every id becomes a node. A node
+    list - "nodes_file" in the config, or the file itself when it has an id
+    column but no source/target ones - adds nodes with a name and their
+    other columns as attributes, numeric columns as ints or floats. A
+    column's type is decided over the whole node list ("column_types" in the
+    config sets it per column), and numbers with leading zeros stay strings.
+
+    Rows are read "chunk_rows" at a time and each chunk's ids are interned
+    into NumPy integer code arrays. Nodes and edges are created once all
+    rows are read and added with a single `add_all`; the CSR view is built
+    from the code arrays instead of from the graph.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self._config = config or {}
+        c = self._config
+        self._is_directed = c.get("is_directed", True)
+        # None: tab if the first line has one, else comma
+        self._delimiter: Optional[str] = c.get("delimiter")
+        # column names of a file without a header row
+        self._columns: Optional[List[str]] = c.get("columns")
+        self._source_column = c.get("source_column", "source")
+        self._target_column = c.get("target_column", "target")
+        self._type_column = c.get("type_column", "type")
+        self._id_column = c.get("id_column", "id")
+        self._name_column = c.get("name_column", "name")
+        self._nodes_file: Optional[str] = c.get("nodes_file")
+        self._chunk_rows = c.get("chunk_rows", CHUNK_ROWS)
+        # column -> "int", "float" or "str"; other node list columns are inferred
+        self._column_types: Dict[str, str] = c.get("column_types", {})
+        # utf-8-sig also reads files starting with a byte order mark
+        self._encoding = c.get("encoding", "utf-8-sig")
+
+    def id(self):
+        return self._config.get("loader_id", "csv-edge-list")
+
+    def name(self):
+        return self._config.get("loader_name", "CSV Edge List Loader")
+
+    def file_name(self):
+        return self._config.get("file_name", "edges.csv")
+
+    def config(self) -> Dict[str, Any]:
+        if not self._nodes_file:
+            return self._config
+        # the node list is read too; its stamp keeps cached graphs from outliving edits to it
+        st = os.stat(self._nodes_file)
+        return {**self._config, "nodes_file_stamp": [st.st_size, st.st_mtime_ns]}
+
+    def load_data(self, file_path: str) -> Graph:
+        with open(file_path, "rb") as f:
+            return self.load_stream(f)
+
+    def load_stream(self, stream: Stream) -> Graph:
+        f = open_stream(stream)
+        ids = _Interner()
+        nodes: Dict[int, Tuple[Optional[str], Dict[str, Any]]] = {}
+        with _no_gc():
+            if self._nodes_file:
+                with open(self._nodes_file, "rb") as nodes_f:
+                    self._read(nodes_f, ids, nodes, None)
+            edges = self._read(f, ids, nodes, getattr(f, "tell", None))
+            return self._build(ids.values, nodes, edges)
+
+    def _rows(self, f) -> Tuple[List[str], Iterator[List[List[str]]]]:
+        """The column names of a binary CSV stream and its rows, `chunk_rows` at a time."""
+        text = io.TextIOWrapper(f, encoding=self._encoding, newline="")
+        first = text.readline()
+        delimiter = self._delimiter or ("\t" if "\t" in first else ",")
+        if self._columns:
+            columns, lines = list(self._columns), itertools.chain([first], text)
+        else:
+            columns, lines = [c.strip() for c in next(csv.reader([first], delimiter=delimiter), [])], text
+        reader = csv.reader(lines, delimiter=delimiter, skipinitialspace=True)
+
+        def chunks():
+            try:
+                while True:
+                    rows = [row for row in itertools.islice(reader, self._chunk_rows) if row]
+                    if not rows:
+                        return
+                    yield rows
+            finally:
+                # leaves `f` open for the caller
+                text.detach()
+        return columns, chunks()
+
+    def _read(self, f, ids: _Interner, nodes, tell) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]]:
+        """
+        Interns the ids of a node or edge list into `ids`; node rows go to
+        `nodes` (code -> (name, attributes)). Returns the edges as (source
+        codes, target codes, type codes, type names), or None for a node list.
+        """
+        columns, chunks = self._rows(f)
+
+        def progress():
+            self.report_progress(tell() if tell else None, len(ids.values))
+
+        if self._source_column in columns and self._target_column in columns:
+            return self._read_edges(columns, chunks, ids, progress)
+        if self._id_column in columns:
+            self._read_nodes(columns, chunks, ids, nodes, progress)
+            return None
+        raise ValueError(f"CSV needs '{self._source_column}' and '{self._target_column}' columns, "
+                         f"or '{self._id_column}' for a node list; found {columns}")
+
+    def _columns_of(self, rows: List[List[str]], positions: List[int]) -> List[List[str]]:
+        try:
+            return [list(map(itemgetter(p), rows)) for p in positions]
+        except IndexError:
+            short = next(row for row in rows if len(row) <= max(positions))
+            raise ValueError(f"CSV row has {len(short)} of {max(positions) + 1} columns: {short}") from None
+
+    def _read_edges(self, columns, chunks, ids: _Interner, progress):
+        positions = [columns.index(self._source_column), columns.index(self._target_column)]
+        typed = self._type_column in columns
+        if typed:
+            positions.append(columns.index(self._type_column))
+        types = _Interner()
+        sources, targets, type_codes = [], [], []
+        for rows in chunks:
+            cols = self._columns_of(rows, positions)
+            # interleaved, so ids get codes in the order rows mention them
+            ids.add(itertools.chain.from_iterable(zip(cols[0], cols[1])))
+            sources.append(ids.codes(cols[0]))
+            targets.append(ids.codes(cols[1]))
+            if typed:
+                types.add(cols[2])
+                type_codes.append(types.codes(cols[2]))
+            progress()
+        n = sum(len(s) for s in sources)
+        if not typed:
+            types.values.append(self._config.get("default_edge_type", DEFAULT_EDGE_TYPE))
+            type_codes = [np.zeros(n, dtype=np.int64)]
+
+        def joined(parts):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return joined(sources), joined(targets), joined(type_codes), types.values
+
+    def _read_nodes(self, columns, chunks, ids: _Interner, nodes, progress) -> None:
+        keys = [c for c in columns if c not in (self._id_column, self._name_column)]
+        positions = [columns.index(self._id_column)] + [columns.index(k) for k in keys]
+        named = self._name_column in columns
+        if named:
+            positions.append(columns.index(self._name_column))
+        codes: List[int] = []
+        names: List[str] = []
+        raw: List[List[str]] = [[] for _ in keys]
+        for rows in chunks:
+            cols = self._columns_of(rows, positions)
+            ids.add(cols[0])
+            codes.extend(ids.codes(cols[0]).tolist())
+            for column, col in zip(raw, cols[1:len(keys) + 1]):
+                column.extend(col)
+            if named:
+                names.extend(cols[-1])
+            progress()
+        # typed once all rows are in, so every chunk agrees
+        values = [_typed(k, column, self._column_types.get(k)) for k, column in zip(keys, raw)]
+        del raw
+        # a repeated id keeps the last row
+        for code, name, *row in zip(codes, names if named else itertools.repeat(None), *values):
+            nodes[code] = (name, dict(zip(keys, row)))
+
+    def _build(self, ids: List[str], nodes, edges) -> Graph:
+        table = []
+        for i, node_id in enumerate(ids):
+            name, attributes = nodes.get(i, (None, None))
+            node = Node(name if name else node_id, node_id=node_id)
+            if attributes:
+                node.attributes = attributes
+            table.append(node)
+        graph = Graph(directed=self._is_directed)
+        if edges is None:
+            graph.add_all(table, ())
+            return graph
+        sources, targets, type_codes, types = edges
+        directed = self._is_directed
+        edge_list = [Edge(directed, table[i], table[j], types[t]) for i, j, t
+                     in zip(sources.tolist(), targets.tolist(), type_codes.tolist())]
+        graph.add_all(table, edge_list)
+        # the code arrays already are the CSR input; spares the first query a rebuild
+        graph.set_csr(CsrGraph(directed, table, edge_list, sources, targets, type_codes.astype(np.int32), types,
+                               np.arange(len(edge_list), dtype=np.int64)))
+        return graph
@@ -0,0 +1,10 @@
+from plugins.data_source.csv_data_source.csv_data_source import CsvDataSourceLoader
+
+def test_loader():
+    data_dir = "plugins/data_source/csv_data_source/data"
+    loader = CsvDataSourceLoader({"nodes_file": f"{data_dir}/airports.csv"})
+    graph = loader.load_data(f"{data_dir}/flights.csv")
+    print(graph)
+
+if __name__ == "__main__":
+    test_loader()
\ No newline at end of file
@@ -1,15 +1,50 @@
+import gc
+import io
 import json
-from typing import Any, Dict, List, Optional
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 from api.model.edge import Edge
 from api.model.graph import Graph
 from api.model.node import Node
-from api.components.data_source import DataSourceService
+from api.components.data_source import DataSourceService, Stream, open_stream
+from .json_stream import iter_items
+
+# characters read per step in streaming mode
+CHUNK_SIZE = 1 << 20
+# node entries between progress reports
+PROGRESS_EVERY = 10_000
+
+
+@contextmanager
+def _no_gc():
+    # the loader only allocates; collections over millions of fresh objects find nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 class JsonDataSourceLoader(DataSourceService):
+    """
+    Builds a graph from a JSON file as described by a dataset config (see
+    dataset/dataset_config.py). With "streaming": True in the config, the
+    node collection is parsed entry by entry in chunks of "chunk_size"
+    characters instead of loading the whole document first.
+    """
+
     def __init__(self, config: Dict[str, Any]):
         self._config = config
         self._is_directed = config.get("is_directed", False)
+        self._node_id_key = config.get("node_id_key")
+        self._node_name_key = config.get("node_name_key", "name")
+        self._edge_keys: Dict[str, str] = config.get("edge_keys", {})
+        # entry keys not copied onto nodes: list items also carry their id and name
+        self._list_skip = frozenset([self._node_id_key, self._node_name_key, *self._edge_keys])
+        self._dict_skip = frozenset(self._edge_keys)
         
     def id(self):
         return self._config.get("loader_id", "generic-json")
@@ -20,6 +55,9 @@ class JsonDataSourceLoader(DataSourceService):
     def file_name(self):
         return self._config.get("file_name", "data.json")
 
+    def config(self) -> Dict[str, Any]:
+        return self._config
+
     def _get_data_from_path(self, data: Dict[str, Any], path: Optional[List[str]]) -> Any:
         """Helper function to navigate through JSON using a path."""
         if not path:
@@ -33,80 +71,127 @@ class JsonDataSourceLoader(DataSourceService):
             current_data = current_data.get(key, {})
         return current_data
 
-    def _create_nodes_from_simple_list_or_dict(self, data: Any, graph: Graph) -> Dict[str, Node]:
-        """Creates nodes from a simple list or dictionary."""
-        id_to_node = {}
-        node_id_key = self._config.get("node_id_key")
-        node_name_key = self._config.get("node_name_key", "name")
-        edge_keys = list(self._config.get("edge_keys", {}).keys())
-
+    def _entries(self, data: Any) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+        """(key, attributes) per node entry: key is None for list items, the node id for dict members."""
         if isinstance(data, list):
-            for attributes in data:
-                node_id = attributes.get(node_id_key)
-                if not node_id: continue
-                node_name = attributes.get(node_name_key, node_id)
-                node = Node(node_name, node_id=node_id)
-                for key, value in attributes.items():
-                    if key not in [node_id_key, node_name_key] + edge_keys:
-                        node.add_attribute(key, value)
-                graph.add_node(node)
-                id_to_node[node_id] = node
-        elif isinstance(data, dict):
-            for node_id, attributes in data.items():
-                node_name = attributes.get(node_name_key, node_id)
-                node = Node(node_name, node_id=node_id)
-                for key, value in attributes.items():
-                    if key not in edge_keys:
-                        node.add_attribute(key, value)
-                graph.add_node(node)
-                id_to_node[node_id] = node
-        return id_to_node
-
-    def _create_edges_from_simple_list_or_dict(self, data: Any, graph: Graph, id_to_node: Dict[str, Node]) -> None:
-        """Creates links from a simple list or dictionary."""
-        node_id_key = self._config.get("node_id_key")
-        edge_keys_map = self._config.get("edge_keys", {})
-
-        node_iterator = data.values() if isinstance(data, dict) else data
-        
-        for attributes in node_iterator:
-            from_node_id = attributes.get(node_id_key) if node_id_key else None
-            if not from_node_id:
-                if isinstance(data, dict):
-                    from_node_id = next((k for k, v in data.items() if v == attributes), None)
-            
-            from_node = id_to_node.get(from_node_id)
-            if not from_node: continue
-            
-            for json_key, edge_label in edge_keys_map.items():
-                target_ids = attributes.get(json_key)
-                
-                if isinstance(target_ids, list):
-                    for target in target_ids:
-                        # Is the target a nested dictionary?
-                        if isinstance(target, dict):
-                            # Extract the id from it
-                            target_id = target.get(node_id_key)
-                        else:
-                            # Assume it's an ID directly
-                            target_id = target
-
-                        to_node = id_to_node.get(target_id)
-                        if to_node:
-                            graph.add_edge(Edge(self._is_directed, from_node, to_node, edge_label))
+            return [(None, attributes) for attributes in data]
+        if isinstance(data, dict):
+            return list(data.items())
+        return []
+
+    def _node_for(self, key: Optional[str], attributes: Dict[str, Any]) -> Optional[Node]:
+        if key is None:
+            node_id = attributes.get(self._node_id_key)
+            return self._make_node(node_id, attributes, self._list_skip) if node_id else None
+        return self._make_node(key, attributes, self._dict_skip)
+
+    def _make_node(self, node_id: str, attributes: Dict[str, Any], skip: FrozenSet[str]) -> Node:
+        node = Node(attributes.get(self._node_name_key, node_id), node_id=node_id)
+        for key, value in attributes.items():
+            if key not in skip:
+                # json.load shares key strings across a document; entries decoded one by one do not
+                node.add_attribute(sys.intern(key), value)
+        return node
+
+    def _source_id(self, key: Optional[str], attributes: Dict[str, Any]) -> Optional[str]:
+        # a dict member may still name its id under node_id_key
+        return (attributes.get(self._node_id_key) if self._node_id_key else None) or key
+
+    def _targets(self, attributes: Dict[str, Any], json_key: str):
+        """Ids referenced under `json_key`: plain ids or nested node objects."""
+        target_ids = attributes.get(json_key)
+        if isinstance(target_ids, list):
+            for target in target_ids:
+                yield target.get(self._node_id_key) if isinstance(target, dict) else target
 
     def load_graph(self, data: Dict[str, Any]) -> Graph:
+        """
+        Two linear passes over the node entries: the first creates the nodes
+        and indexes them by id, the second resolves edge targets in that
+        index. The graph is filled with one bulk insert.
+        """
+        graph = Graph(self._is_directed)
+        entries = self._entries(self._get_data_from_path(data, self._config.get("nodes_path")))
+
+        id_to_node: Dict[str, Node] = {}
+        for i, (key, attributes) in enumerate(entries, 1):
+            node = self._node_for(key, attributes)
+            if node is not None:
+                id_to_node[node.id] = node
+            if not i % PROGRESS_EVERY:
+                self.report_progress(nodes=len(id_to_node))
+
+        edges = []
+        for i, (key, attributes) in enumerate(entries, 1):
+            if not i % PROGRESS_EVERY:
+                self.report_progress()
+            from_node = id_to_node.get(self._source_id(key, attributes))
+            if from_node is None: continue
+            for json_key, edge_label in self._edge_keys.items():
+                for target_id in self._targets(attributes, json_key):
+                    to_node = id_to_node.get(target_id)
+                    if to_node is not None:
+                        edges.append(Edge(self._is_directed, from_node, to_node, edge_label))
+
+        graph.add_all(id_to_node.values(), edges)
+        return graph
+
+    def load_streaming(self, file_path: str) -> Graph:
+        with open(file_path, 'r') as file:
+            return self._load_items(file)
+
+    def _load_items(self, file) -> Graph:
+        """
+        Adds nodes as their entries are parsed, and edges to nodes already
+        seen at once. References to nodes further down the file are kept as
+        (source, label, target id) and resolved after the last entry.
+        """
         graph = Graph(self._is_directed)
-        
         nodes_path = self._config.get("nodes_path")
-        graph_data = self._get_data_from_path(data, nodes_path)
-        
-        id_to_node = self._create_nodes_from_simple_list_or_dict(graph_data, graph)
-        self._create_edges_from_simple_list_or_dict(graph_data, graph, id_to_node)
-        
+        id_to_node: Dict[str, Node] = {}
+        pending = []
+
+        items = iter_items(file, nodes_path, self._config.get("chunk_size", CHUNK_SIZE))
+        for i, (key, attributes) in enumerate(items, 1):
+            if not i % PROGRESS_EVERY:
+                self.report_progress(file.buffer.tell(), len(id_to_node))
+            if key == "directed" and not nodes_path: continue
+            node = self._node_for(key, attributes)
+            if node is None: continue
+            graph.add_node(node)
+            id_to_node[node.id] = node
+            for json_key, edge_label in self._edge_keys.items():
+                for target_id in self._targets(attributes, json_key):
+                    to_node = id_to_node.get(target_id)
+                    if to_node is not None:
+                        graph.add_edge(Edge(self._is_directed, node, to_node, edge_label))
+                    else:
+                        pending.append((node, edge_label, target_id))
+
+        for from_node, edge_label, target_id in pending:
+            to_node = id_to_node.get(target_id)
+            if to_node is not None:
+                graph.add_edge(Edge(self._is_directed, from_node, to_node, edge_label))
         return graph
 
     def load_data(self, file_path: str) -> Graph:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            return self.load_graph(data)
\ No newline at end of file
+        with _no_gc():
+            if self._config.get("streaming"):
+                return self.load_streaming(file_path)
+            with open(file_path, 'r') as file:
+                data = json.loads(self._read(file))
+                return self.load_graph(data)
+
+    def load_stream(self, stream: Stream) -> Graph:
+        """A stream (UTF-8) is always parsed entry by entry, as with "streaming": True."""
+        with _no_gc():
+            return self._load_items(io.TextIOWrapper(open_stream(stream), encoding="utf-8"))
+
+    def _read(self, file) -> str:
+        if self.progress is None:
+            return file.read()
+        chunks = []
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), ""):
+            chunks.append(chunk)
+            self.report_progress(file.buffer.tell(), 0)
+        return "".join(chunks)
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Incremental reading of one array or object inside a JSON document.
+
+The file is read `chunk_size` characters at a time, and each entry of the
+collection is decoded on its own with `json.JSONDecoder.raw_decode`. Only
+the current chunk and the entry being decoded are held in memory. Values
+beside the path are skipped token by token, never decoded as a whole.
+"""
+import json
+import re
+from typing import IO, Any, Iterator, List, Optional, Tuple
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"[-+.0-9eE]*")
+
+
+class _Buffer:
+    def __init__(self, f: IO[str], chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.consumed = 0   # characters dropped from the front of `text`
+        self.eof = False
+
+    def more(self, size: int) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos:
+            self.consumed += self.pos
+            self.text, self.pos = self.text[self.pos:], 0
+        self.text += chunk
+        return True
+
+    def error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(f"{msg} (at character {self.consumed + self.pos})", self.text, self.pos)
+
+    def peek(self) -> str:
+        """The next character after whitespace, '' at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more(self.chunk_size):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise self.error(f"Expecting one of {chars!r}")
+        self.pos += 1
+        return c
+
+    def value(self) -> Any:
+        if not self.peek():
+            raise self.error("Expecting value")
+        # a number running to the end of the buffer may go on in the next chunk
+        while _NUMBER.match(self.text, self.pos).end() == len(self.text) and self.more(self.chunk_size):
+            pass
+        size = self.chunk_size
+        while True:
+            try:
+                value, self.pos = _DECODER.raw_decode(self.text, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if not self.more(size):
+                    raise
+                size *= 2   # a large value: grow the reads rather than re-decode once per chunk
+
+    def skip(self) -> None:
+        c = self.peek()
+        if c not in ("[", "{"):
+            self.value()
+            return
+        self.pos += 1
+        close = "]" if c == "[" else "}"
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            if c == "{":
+                self.value()
+                self.expect(":")
+            self.skip()
+            if self.expect("," + close) == close:
+                return
+
+
+def iter_items(f: IO[str], path: Optional[List[str]], chunk_size: int = 1 << 20) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Yields the entries of the collection found by following the object keys
+    in `path` (the document itself for an empty path): (None, item) for an
+    array, (key, value) for an object. A missing key yields nothing.
+    """
+    buf = _Buffer(f, chunk_size)
+    for key in path or ():
+        if buf.peek() != "{":
+            return
+        buf.pos += 1
+        if buf.peek() == "}":
+            return
+        while True:
+            name = buf.value()
+            buf.expect(":")
+            if name == key:
+                break
+            buf.skip()
+            if buf.expect(",}") == "}":
+                return
+    kind = buf.expect("[{")
+    close = "]" if kind == "[" else "}"
+    if buf.peek() == close:
+        return
+    while True:
+        if kind == "[":
+            yield None, buf.value()
+        else:
+            name = buf.value()
+            buf.expect(":")
+            yield name, buf.value()
+        if buf.expect("," + close) == close:
+            return
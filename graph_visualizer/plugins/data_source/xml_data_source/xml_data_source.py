@@ -1,10 +1,119 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 from lxml import etree
 from api.model.edge import Edge
-from api.model.graph import Graph
+from api.model.graph import Graph, approx_graph_bytes
 from api.model.node import Node
-from api.components.data_source import DataSourceService
+from api.components.data_source import DataSourceService, Stream, open_stream
+
+# one step of a plain absolute path such as /CityMap/Street[2]
+_STEP = re.compile(r"([^\s/\[\]()@*:=<>|,'\"{}]+)(?:\[(\d+)\])?$")
+
+# estimated memory of the parse results kept (approx_graph_bytes of their graphs)
+CACHE_BYTES = 256 * 1024 * 1024
+# nodes between progress reports
+PROGRESS_EVERY = 10_000
+
+
+class _Parsed(NamedTuple):
+    """A loaded graph as plain data, to rebuild it without parsing again."""
+    directed: bool
+    nodes: List[Tuple[str, str, Dict[str, Any]]]    # (id, name, attributes) in graph order
+    edges: List[Tuple[int, int, str]]               # (source, target position in nodes, type)
+
+    @classmethod
+    def of(cls, graph: Graph) -> "_Parsed":
+        position = {}
+        nodes = []
+        for i, n in enumerate(graph.nodes):
+            position[n.id] = i
+            nodes.append((n.id, n.name, dict(n.attributes)))
+        edges = [(position[e.from_node.id], position[e.to_node.id], e.type) for e in graph.edges]
+        return cls(graph.directed, nodes, edges)
+
+    def build(self) -> Graph:
+        graph = Graph(directed=self.directed)
+        nodes = []
+        for node_id, name, attributes in self.nodes:
+            node = Node(name=name, node_id=node_id)
+            node.attributes.update(attributes)
+            nodes.append(node)
+        graph.add_all(nodes, [Edge(self.directed, nodes[a], nodes[b], edge_type) for a, b, edge_type in self.edges])
+        return graph
+
+
+# content hash -> (estimated bytes, parse result), least recently used first
+_cache: "OrderedDict[str, Tuple[int, _Parsed]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _content_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _canonical_path(path: str) -> Optional[str]:
+    """
+    `path` with every step indexed ('/a/b[2]' -> '/a[1]/b[2]'), the form the
+    loader indexes nodes by. None for anything else XPath can express.
+    """
+    path = path.strip()
+    if not path.startswith("/"):
+        return None
+    steps = []
+    for step in path[1:].split("/"):
+        m = _STEP.match(step)
+        if not m:
+            return None
+        steps.append(f"/{m.group(1)}[{int(m.group(2) or 1)}]")
+    return "".join(steps)
+
+
+def _path_of(element: etree._Element) -> str:
+    steps = []
+    while element is not None:
+        position = 1 + sum(1 for _ in element.itersiblings(element.tag, preceding=True))
+        steps.append(f"/{element.tag}[{position}]")
+        element = element.getparent()
+    return "".join(reversed(steps))
+
+
+class _Open:
+    """An element whose end has not been reached yet."""
+    __slots__ = ("tag", "path", "ordinal", "node", "counts", "in_reference", "id_attr")
+
+    def __init__(self, tag: str, path: str, ordinal: int, in_reference: bool, id_attr: Optional[str]):
+        self.tag, self.path, self.ordinal, self.in_reference = tag, path, ordinal, in_reference
+        self.id_attr = id_attr
+        self.node: Optional[Node] = None
+        self.counts: Dict[str, int] = {}
+
 
 class XmlDataSourceLoader(DataSourceService):
+    """
+    Every element with child elements (and the root) becomes a node; its
+    leaf children become attributes, `child` edges follow nesting and each
+    <reference> holds an XPath to the node it points at.
+
+    A node's id is its element's `id` attribute, or its indexed path
+    (/CityMap[1]/Street[2]) when there is none or the id is taken, so ids
+    are the same on every load of a document.
+
+    The document is walked once with start/end events. Paths are built on
+    the way down, nodes are indexed by them, and plain absolute references
+    are looked up in that index. Any other XPath is evaluated on a parsed
+    tree once the walk is over. `load_data` clears elements as soon as they
+    end, so memory holds the graph rather than the document, and keeps
+    parse results by content hash: loading the same bytes again only
+    rebuilds the objects. Pass `cache=False` when a GraphCache already
+    keeps the graphs.
+    """
 
     def id(self):
         return 'xml-loader'
@@ -15,73 +124,134 @@ class XmlDataSourceLoader(DataSourceService):
     def file_name(self):
         return "city_intersections.xml"
 
-    def __init__(self):
-        pass
+    def __init__(self, cache: bool = True):
+        self._use_cache = cache
 
-    def _create_nodes(self, element: etree._Element, graph: Graph, xpath_map: dict) -> Node:
+    def _walk(self, events, free: bool, tell=None):
         """
-        First pass: creates nodes for elements with children
-        and stores a map XPath -> Node in order to support cyclic references.
+        Builds the graph from (event, element) pairs. Returns it with the
+        references: (source node, canonical path or None, xpath, ordinal of
+        the element holding the reference). `tell()` gives the bytes read, for progress.
         """
-        element_xpath = element.getroottree().getpath(element)
+        graph: Optional[Graph] = None
+        by_path: Dict[str, Node] = {}
+        references: List[Tuple[Node, Optional[str], str, int]] = []
+        stack: List[_Open] = []
+        ordinal = 0
+        used = set()
 
-        # If a node for this XPath already exists, return it (prevents cycles)
-        if element_xpath in xpath_map:
-            return xpath_map[element_xpath]
+        def new_node(entry: _Open) -> Node:
+            node_id = entry.id_attr if entry.id_attr and entry.id_attr not in used else entry.path
+            used.add(node_id)
+            return Node(name=f"{entry.tag} {node_id}", node_id=node_id)
 
-        node = Node(name=element.tag + " " + str(id(element)), node_id=str(id(element)))
-        xpath_map[element_xpath] = node
-
-        for child in element:
-            if len(child):  # has a subtree -> create node
-                child_node = self._create_nodes(child, graph, xpath_map)
-                graph.add_edge(Edge(graph.directed, node, child_node, edge_type="child"))
-            elif child.tag == "reference" or child.tag == "ref":  # references will be processed later
+        for event, element in events:
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue    # comments and processing instructions
+            if event == "start":
+                if not stack:
+                    graph = Graph(directed=element.get("type") == "directed")
+                    entry = _Open(tag, f"/{tag}[1]", ordinal, False, element.get("id"))
+                    entry.node = new_node(entry)
+                else:
+                    parent = stack[-1]
+                    if parent.node is None:
+                        parent.node = new_node(parent)
+                    position = parent.counts[tag] = parent.counts.get(tag, 0) + 1
+                    entry = _Open(tag, f"{parent.path}/{tag}[{position}]", ordinal,
+                                  parent.in_reference or parent.tag == "reference", element.get("id"))
+                ordinal += 1
+                stack.append(entry)
                 continue
-            else:
-                node.add_attribute(child.tag, child.text)
 
-        graph.add_node(node)
-        return node
+            entry = stack.pop()
+            parent = stack[-1] if stack else None
+            if entry.node is not None:
+                graph.add_node(entry.node)
+                by_path[entry.path] = entry.node
+                if not len(by_path) % PROGRESS_EVERY:
+                    self.report_progress(tell() if tell else None, len(by_path))
+                if parent is not None:
+                    graph.add_edge(Edge(graph.directed, parent.node, entry.node, edge_type="child"))
+            if parent is not None:
+                if tag == "reference":
+                    if not entry.in_reference:
+                        text = element.text or ""
+                        references.append((parent.node, _canonical_path(text), text, parent.ordinal))
+                elif entry.node is None and tag != "ref":
+                    parent.node.add_attribute(tag, element.text)
+            if free:
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+        return graph, by_path, references
 
-    def _create_references(self, element: etree._Element, graph: Graph, xpath_map: dict):
+    def _link(self, graph: Graph, by_path: Dict[str, Node], references, tree_root) -> None:
         """
-        Second pass: creates edges for references using XPath.
+        Adds the reference edges in document order; `tree_root()` parses the
+        tree for complex XPaths (None when the source cannot be read again).
         """
-        element_xpath = element.getroottree().getpath(element)
-        from_node = xpath_map.get(element_xpath)
-        if not from_node:
-            return
-
-        for child in element:
-            if child.tag == "reference":
-                target_path = child.text
-                to_node = element.xpath(target_path)
-                if to_node:
-                    to_node_obj = xpath_map.get(to_node[0].getroottree().getpath(to_node[0]))
-                    if to_node_obj:
-                        graph.add_edge(Edge(graph.directed, from_node, to_node_obj, "reference"))
-            else:
-                self._create_references(child, graph, xpath_map)
+        elements = None
+        for from_node, path, xpath, owner in references:
+            if path is None:
+                if tree_root is None:
+                    raise ValueError(f"Reference '{xpath}' is not an absolute path such as /a/b[2]; "
+                                     "only those can be resolved while streaming")
+                if elements is None:
+                    elements = list(tree_root().iter(etree.Element))
+                found = elements[owner].xpath(xpath)
+                if not isinstance(found, list) or not found or not isinstance(found[0], etree._Element):
+                    continue
+                path = _path_of(found[0])
+            to_node = by_path.get(path)
+            if to_node:
+                graph.add_edge(Edge(graph.directed, from_node, to_node, "reference"))
 
     def load_graph(self, root: etree.Element) -> Graph:
-        direction = root.get("type") == "directed"
-        graph = Graph(directed=direction)
-        xpath_map = {}
+        graph, by_path, references = self._walk(etree.iterwalk(root, events=("start", "end")), free=False)
+        self._link(graph, by_path, references, lambda: root)
+        return graph
 
-        # First pass: create all nodes
-        self._create_nodes(root, graph, xpath_map)
+    def load_data(self, file_path: str) -> Graph:
+        key = _content_hash(file_path) if self._use_cache else None
+        if key is not None:
+            with _cache_lock:
+                hit = _cache.get(key)
+                if hit is not None:
+                    _cache.move_to_end(key)
+            if hit is not None:
+                return hit[1].build()
 
-        # Second pass: create edges for references
-        self._create_references(root, graph, xpath_map)
+        with open(file_path, "rb") as f:
+            graph = self._load_file(f, lambda: etree.parse(file_path).getroot())
 
+        # bounded by what the result holds in memory, many times the size of the file
+        size = approx_graph_bytes(graph) if key is not None else 0
+        if key is not None and size <= CACHE_BYTES:
+            parsed = _Parsed.of(graph)
+            with _cache_lock:
+                _cache[key] = (size, parsed)
+                total = sum(entry[0] for entry in _cache.values())
+                while total > CACHE_BYTES:
+                    total -= _cache.popitem(last=False)[1][0]
         return graph
 
-    def load_data(self, file_path: str) -> Graph:
+    def load_stream(self, stream: Stream) -> Graph:
+        """As `load_data`, except that references must be absolute paths: a stream is read only once."""
+        return self._load_file(open_stream(stream), None)
+
+    def _load_file(self, f, tree_root) -> Graph:
         try:
-            tree = etree.parse(file_path)
-            root = tree.getroot()
-            return self.load_graph(root)
+            events = etree.iterparse(f, events=("start", "end"))
+            graph, by_path, references = self._walk(events, free=True, tell=getattr(f, "tell", None))
         except etree.ParseError as e:
-            print(f"Error parsing XML file: {e}")
-            return Graph()
+            raise ValueError(f"Error parsing XML file: {e}") from e
+        self._link(graph, by_path, references, tree_root)
+        return graph
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
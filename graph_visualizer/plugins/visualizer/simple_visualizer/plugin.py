@@ -14,12 +14,10 @@ class SimpleVisualizer(VisualizerPlugin):
             return '<div class="viz-empty">No data</div>'
 
         # --- Convert to networkx graph ---
-        is_directed = graph.directed or any(e.directed for e in graph.edges)
-        G = nx.DiGraph() if is_directed else nx.Graph()
-        for node in graph.nodes:
-            G.add_node(node.id)
-        for e in graph.edges:
-            G.add_edge(e.from_node.id, e.to_node.id)
+        csr = graph.csr()
+        G = nx.DiGraph() if csr.any_directed else nx.Graph()
+        G.add_nodes_from(csr.node_ids)
+        G.add_edges_from(zip(csr.node_ids[csr.sources], csr.node_ids[csr.targets]))
 
         # --- Force-directed layout ---
         initial_pos = nx.shell_layout(G)
@@ -0,0 +1,173 @@
+"""
+Throughput of the explorer under concurrent clients.
+
+Run from the graph_visualizer/web directory:
+
+    python bench_concurrency.py [--clients 1 2 4 8] [--seconds 5] [--shared-session]
+
+Serves the Django app from a threaded WSGI server (wsgiref with
+ThreadingMixIn) on a free local port, with sessions in a throwaway SQLite
+database. Every client opens its own session (or, with --shared-session,
+all use one session and so one workspace), uploads a dataset and then
+loops over a mix of renders, filter explains, node updates and undos for
+the given time. Reported are completed requests per second and latency
+percentiles per client count.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from http.cookiejar import CookieJar
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.abspath(os.path.join(HERE, "..", "..")), os.path.abspath(os.path.join(HERE, ".."))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+sys.path.insert(0, HERE)
+
+DATASET = "social_dataset.json"
+# (weight, kind): renders take the workspace's read lock, commands its write lock
+MIX = [(5, "home"), (3, "bird"), (1, "explain"), (1, "update"), (1, "undo")]
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def setup_django(db_path: str):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gvsite.settings")
+    from django.conf import settings
+    settings.DATABASES["default"]["NAME"] = db_path
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+    from django.core.wsgi import get_wsgi_application
+    app = get_wsgi_application()
+    # expected 400s (e.g. nothing to undo) would flood the output
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    return app
+
+
+class Client:
+    def __init__(self, base: str, jar: CookieJar):
+        self.base = base
+        self.jar = jar
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        self.node_ids = []
+
+    def csrf(self) -> str:
+        return next((c.value for c in self.jar if c.name == "csrftoken"), "")
+
+    def request(self, path: str, body: bytes = None, content_type: str = "application/json"):
+        headers = {"X-CSRFToken": self.csrf(), "Referer": self.base + "/"}
+        if body is not None:
+            headers["Content-Type"] = content_type
+        req = urllib.request.Request(self.base + path, data=body, headers=headers)
+        with self.opener.open(req) as response:
+            return response.read()
+
+    def command(self, command: str, payload: dict):
+        return self.request("/api/graph-command/", json.dumps({"command": command, "payload": payload}).encode())
+
+    def upload(self, file_name: str) -> None:
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"csrfmiddlewaretoken\"\r\n\r\n{self.csrf()}\r\n"
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{file_name}\"\r\n"
+                f"Content-Type: application/json\r\n\r\n{{}}\r\n--{boundary}--\r\n").encode()
+        self.request("/create-workspace/", body, f"multipart/form-data; boundary={boundary}")
+        # a blank search records nothing and answers with the graph
+        graph = json.loads(self.command("search", {"query": ""}))["graph"]
+        self.node_ids = [n["id"] for n in graph["nodes"]]
+
+    def step(self, kind: str, rng: random.Random) -> None:
+        if kind == "home":
+            self.request("/")
+        elif kind == "bird":
+            self.request("/bird-render/", json.dumps({"positions": {}, "visualizer": "simple"}).encode())
+        elif kind == "explain":
+            self.command("explain", {"expression": f"email != user{rng.randint(1, 200)}@example.com"})
+        elif kind == "update":
+            self.command("update-node", {"id": rng.choice(self.node_ids), "updates": {"score": rng.randint(0, 100)}})
+        else:
+            try:
+                self.command("undo", {})
+            except urllib.error.HTTPError:
+                pass  # nothing to undo
+
+
+def run(base: str, clients: int, seconds: float, shared: bool):
+    jars = [CookieJar()] * clients if shared else [CookieJar() for _ in range(clients)]
+    workers = [Client(base, jar) for jar in jars]
+    for i, client in enumerate(workers):
+        if i == 0 or not shared:
+            client.request("/")
+            client.upload(DATASET)
+        else:
+            client.node_ids = workers[0].node_ids
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    kinds = [kind for weight, kind in MIX for _ in range(weight)]
+
+    def loop(client: Client, seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                client.step(rng.choice(kinds), rng)
+            except Exception as e:
+                errors.append(e)
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=loop, args=(client, i)) for i, client in enumerate(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    print(f"{clients:>8}{len(latencies):>10}{len(latencies) / elapsed:>10.1f}{pct(.5):>10.1f}{pct(.95):>10.1f}{len(errors):>8}")
+    if errors:
+        print(f"  first error: {errors[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--shared-session", action="store_true", help="all clients use one session/workspace")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = setup_django(os.path.join(tmp_dir, "bench.sqlite3"))
+        server = make_server("127.0.0.1", 0, app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        try:
+            print(f"{'clients':>8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+            for clients in args.clients:
+                run(base, clients, args.seconds, args.shared_session)
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Opening one dataset many times, with and without the loaded-graph cache.
+
+Run from the graph_visualizer/web directory:
+
+    python bench_graph_cache.py [--nodes 100000] [--workspaces 8]
+
+A synthetic social dataset is written and opened the way create_workspace
+does it. Reported are the time to open it cold (loader), from the memory
+tier, and from the disk tier in a fresh cache (as another process would);
+then the memory traced for --workspaces workspaces on the dataset, each
+with its own load versus all on the cached graph, and the cost of the
+copy a cached workspace makes on its first edit.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.abspath(os.path.join(HERE, "..", "..")), os.path.abspath(os.path.join(HERE, ".."))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from core.graph_cache import GraphCache
+from core.workspace_manager import WorkspaceManager
+from plugins.data_source.bench_memory import write_synthetic_social
+from plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
+from plugins.data_source.json_data_source.dataset.dataset_config import SOCIAL_JSON_CONFIG
+
+
+def timed(f):
+    started = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - started
+
+
+def traced(f):
+    """Returns (result, bytes still allocated by `f` when it returns)."""
+    tracemalloc.start()
+    try:
+        result = f()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--workspaces", type=int, default=8)
+    args = parser.parse_args()
+
+    loader = JsonDataSourceLoader(SOCIAL_JSON_CONFIG)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "social_dataset.json")
+        write_synthetic_social(args.nodes, path)
+        disk_dir = os.path.join(tmp_dir, "graphs")
+
+        cache = GraphCache(disk_dir=disk_dir)
+        graph, cold = timed(lambda: cache.load(loader, path))
+        _, memory = timed(lambda: cache.load(loader, path))
+        _, disk = timed(lambda: GraphCache(disk_dir=disk_dir).load(loader, path))
+        print(f"{args.nodes} nodes, {len(graph.edges)} edges, {os.path.getsize(path) / 2**20:.1f} MiB of JSON")
+        print(f"open cold (loader)     {cold:8.3f} s")
+        print(f"open from memory tier  {memory:8.3f} s")
+        print(f"open from disk tier    {disk:8.3f} s")
+
+        def open_all(load, shared):
+            manager = WorkspaceManager(memory_budget=1 << 40)
+            for _ in range(args.workspaces):
+                manager.create_workspace(graph=load(), shared=shared, cache=cache if shared else None)
+            return manager
+
+        _, private = traced(lambda: open_all(lambda: loader.load_data(path), False))
+        cache = GraphCache()
+        manager, cached = traced(lambda: open_all(lambda: cache.load(loader, path), True))
+        print(f"{args.workspaces} workspaces, own loads   {private / 2**20:8.1f} MiB")
+        print(f"{args.workspaces} workspaces, cached      {cached / 2**20:8.1f} MiB")
+
+        wspace = manager.get_active()
+        node_id = next(iter(wspace.original.nodes)).id
+        _, first = timed(lambda: wspace.update_node(node_id, {"score": 1}))
+        _, second = timed(lambda: wspace.update_node(node_id, {"score": 2}))
+        print(f"first edit (copies the graph) {first:8.3f} s, next edit {second:8.4f} s")
+
+
+if __name__ == "__main__":
+    main()
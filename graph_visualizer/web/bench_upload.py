@@ -0,0 +1,141 @@
+"""
+Time and peak memory from upload to graph, buffered versus streamed.
+
+Run from the graph_visualizer/web directory:
+
+    python bench_upload.py [--nodes 100000]
+
+A synthetic social dataset is written as a multipart request body, and
+each mode runs in its own process reading that body from disk:
+
+  buffered  Django's default upload handlers store the file (in a
+            temporary file past 2.5 MB) and the loader reads it from there
+  streamed  the request goes through create_workspace, whose upload
+            handler feeds the chunks to the load job as they are read
+
+Reported are the wall time until the workspace exists, the peak RSS of the
+process, and its growth over the RSS before the upload.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.abspath(os.path.join(HERE, "..", "..")), os.path.abspath(os.path.join(HERE, ".."))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+sys.path.insert(0, HERE)
+
+DATASET = "social_dataset.json"
+
+
+def write_body(data_path: str, body_path: str) -> str:
+    """Writes a multipart/form-data body uploading `data_path`; returns its boundary."""
+    boundary = uuid.uuid4().hex
+    with open(body_path, "wb") as out, open(data_path, "rb") as data:
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{DATASET}"\r\n'
+                  f'Content-Type: application/json\r\n\r\n'.encode())
+        for block in iter(lambda: data.read(1 << 20), b""):
+            out.write(block)
+        out.write(f"\r\n--{boundary}--\r\n".encode())
+    return boundary
+
+
+def peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def run(mode: str, body_path: str, boundary: str, db_path: str) -> dict:
+    from bench_concurrency import setup_django
+    app = setup_django(db_path)
+    from django.conf import settings
+    from django.http.multipartparser import MultiPartParser
+    from django.core.files.uploadhandler import load_handler
+    from core.graph_cache import GraphCache
+    from core.load_jobs import LOAD_JOBS
+    from core.workspace_manager import WorkspaceManager
+    from plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
+    from plugins.data_source.json_data_source.dataset.dataset_config import SOCIAL_JSON_CONFIG
+
+    settings.ALLOWED_HOSTS.append("testserver")
+    LOAD_JOBS.cache = GraphCache()
+    size = os.path.getsize(body_path)
+    environ = {
+        "REQUEST_METHOD": "POST", "PATH_INFO": "/create-workspace/", "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80", "wsgi.url_scheme": "http", "wsgi.errors": sys.stderr,
+        "CONTENT_TYPE": f"multipart/form-data; boundary={boundary}", "CONTENT_LENGTH": str(size),
+        "HTTP_ACCEPT": "application/json",
+        # an unmasked token in cookie and header passes the CSRF check
+        "HTTP_COOKIE": f"csrftoken={'x' * 32}", "HTTP_X_CSRFTOKEN": "x" * 32,
+    }
+    before = current_rss()
+    started = time.perf_counter()
+    with open(body_path, "rb") as body:
+        if mode == "buffered":
+            handlers = [load_handler(h, None) for h in settings.FILE_UPLOAD_HANDLERS]
+            _, files = MultiPartParser(environ, body, handlers).parse()
+            upload = files["file"]
+            path = upload.temporary_file_path() if hasattr(upload, "temporary_file_path") else None
+            if path is None:
+                fd, path = tempfile.mkstemp()
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in upload.chunks():
+                        f.write(chunk)
+            graph = LOAD_JOBS.cache.load(JsonDataSourceLoader(SOCIAL_JSON_CONFIG), path)
+            WorkspaceManager().create_workspace(graph=graph, shared=True, cache=LOAD_JOBS.cache)
+            nodes = len(graph.nodes)
+        else:
+            environ["wsgi.input"] = body
+            response = b"".join(app(environ, lambda status, headers: None))
+            job = LOAD_JOBS.get(json.loads(response)["job"]["id"])
+            job.wait()
+            if job.error:
+                raise SystemExit(job.error)
+            nodes = job.nodes
+    return {"seconds": time.perf_counter() - started, "peak": peak_rss(), "growth": peak_rss() - before,
+            "nodes": nodes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--mode", choices=["buffered", "streamed"], help=argparse.SUPPRESS)
+    parser.add_argument("--body", help=argparse.SUPPRESS)
+    parser.add_argument("--boundary", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run(args.mode, args.body, args.boundary, args.db)))
+        return
+
+    from plugins.data_source.bench_memory import write_synthetic_social
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, DATASET)
+        write_synthetic_social(args.nodes, data_path)
+        body_path = os.path.join(tmp_dir, "body")
+        boundary = write_body(data_path, body_path)
+        print(f"{args.nodes} nodes, {os.path.getsize(data_path) / 2**20:.1f} MiB uploaded")
+        for mode in ("buffered", "streamed"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--body", body_path, "--boundary", boundary,
+                 "--db", os.path.join(tmp_dir, f"{mode}.sqlite3")],
+                check=True, capture_output=True, text=True).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:9} {r['seconds']:7.2f} s   peak RSS {r['peak'] / 2**20:7.1f} MiB"
+                  f"   (+{r['growth'] / 2**20:6.1f} MiB)   {r['nodes']} nodes")
+
+
+if __name__ == "__main__":
+    main()
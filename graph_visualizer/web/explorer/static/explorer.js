@@ -396,6 +396,35 @@ document.addEventListener("DOMContentLoaded", () => {
   window.gvCurrentVisualizer = type; 
 });
 
+// --------------- LOAD JOBS ---------------
+
+// polls the background loads listed in the workspace panel; the page reloads once one finishes
+function pollLoadJobs() {
+  const rows = document.querySelectorAll(".load-job[data-job]");
+  if (!rows.length) return;
+  Promise.all(Array.from(rows).map(row =>
+    fetch(`/load-jobs/${row.dataset.job}/`, { headers: { "Accept": "application/json" } })
+      .then(r => r.json())
+      .then(data => {
+        const job = data.job;
+        if (!job || !["pending", "running"].includes(job.status)) return true;
+        // a streamed upload of unknown length reports only what it has read
+        const read = job.total_bytes
+          ? `${Math.min(100, Math.floor(100 * job.bytes_read / job.total_bytes))}%`
+          : `${(job.bytes_read / 1048576).toFixed(1)} MiB`;
+        const label = row.querySelector(".load-job-progress");
+        if (label) label.textContent = job.status === "pending" ? "queued" : `${read} · ${job.nodes} nodes`;
+        return false;
+      })
+      .catch(() => false)
+  )).then(finished => {
+    if (finished.some(Boolean)) window.location.reload();
+    else setTimeout(pollLoadJobs, 1000);
+  });
+}
+
+document.addEventListener("DOMContentLoaded", pollLoadJobs);
+
 // --------------- SWITCH VISUALZIERS ---------------
 
 window.gvPositions = window.gvPositions || {};
@@ -1115,6 +1144,16 @@ document.addEventListener('DOMContentLoaded', () => {
                   payload = { from: args[0], to: args[1], type: args[2]};
                   break;
 
+                case 'batch':
+                    if (args.length < 1) throw new Error("Potrebna je JSON lista operacija.");
+                    payload = { operations: JSON.parse(args.join(' ')) };
+                    break;
+
+                case 'undo':
+                case 'redo':
+                    payload = {};
+                    break;
+
                 case 'filter':
                     if (args.length < 1) throw new Error("Potreban je izraz za filtriranje.");
                     payload = { expression: args.join(' ') };
@@ -1125,6 +1164,35 @@ document.addEventListener('DOMContentLoaded', () => {
                     payload = { query: args.join(' ') };
                     break;
                     
+                case 'explain':
+                    if (args.length < 1) throw new Error("Potreban je izraz za filtriranje.");
+                    payload = { expression: args.join(' ') };
+                    break;
+
+                case 'cache-stats':
+                    payload = {};
+                    break;
+
+                case 'save-snapshot':
+                    payload = args.length ? { name: args[0] } : {};
+                    break;
+
+                case 'memory-report':
+                    payload = {};
+                    break;
+
+                case 'history':
+                    payload = {};
+                    break;
+
+                case 'list-indexes':
+                    payload = {};
+                    break;
+
+                case 'drop-index':
+                    payload = args.length ? { attr: args[0] } : {};
+                    break;
+
                 case 'help':
                     logHelp();
                     isValid = false; 
@@ -1166,14 +1234,35 @@ Available commands:
 - <strong>update-node &lt;id&gt; [label=...] [color=...]</strong>: Changes the attributes of an existing node.
 - <strong>delete-node &lt;id&gt;</strong>: Deletes a node and its connections..
 - <strong>create-edge &lt;fromNodeId&gt; &lt;toNodeId&gt; type=... </strong>: Creates a new branch between two nodes.
+- <strong>batch [{"command": "create-node", "payload": {"id": "a"}}, ...]</strong>: Applies many node/edge commands at once; nothing is applied if one of them fails.
+- <strong>undo</strong> / <strong>redo</strong>: Reverts or re-applies the last node/edge change (a batch counts as one).
 - <strong>filter &lt;expression&gt;</strong>: Filters the graph based on an expression.
 - <strong>search &lt;query&gt;</strong>: Searches the graph.
+- <strong>filter &lt;expression&gt;</strong> also accepts AND, OR, NOT and parentheses, e.g. <em>age &gt; 30 AND (city == Paris OR NOT active == true)</em>.
+- <strong>explain &lt;expression&gt;</strong>: Shows the clause order chosen for a filter with per-clause row counts and timings.
+- <strong>cache-stats</strong>: Shows the size and hit/miss/eviction counters of the query result cache.
+- <strong>save-snapshot [name]</strong>: Downloads the workspace (graph, queries, layout, undo history) as a .gvs snapshot file; open it again with the file upload form.
+- <strong>memory-report</strong>: Shows the estimated size of every workspace and which ones are spilled to disk.
+- <strong>history</strong>: Lists the applied queries and which intermediate results are kept in memory.
+- <strong>list-indexes</strong>: Lists the attribute indexes of the workspace.
+- <strong>drop-index [attr]</strong>: Drops the index of an attribute (all indexes without one).
 - <strong>clear</strong>: Clear terminal window.
 - <strong>help</strong>: Showing this help.
         `;
         logToOutput(helpText.replace(/\n/g, '<br>'), 'info');
     }
 
+    function downloadBlob(blob, fileName) {
+        const url = URL.createObjectURL(blob);
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = fileName;
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+        URL.revokeObjectURL(url);
+    }
+
     async function sendCommandToServer(command, payload) {
         try {
             const response = await fetch('/api/graph-command/', {
@@ -1184,7 +1273,14 @@ Available commands:
                 },
                 body: JSON.stringify({ command, payload })
             });
-            
+
+            if (response.ok && (response.headers.get('Content-Disposition') || '').startsWith('attachment')) {
+                const fileName = /filename="([^"]+)"/.exec(response.headers.get('Content-Disposition'));
+                downloadBlob(await response.blob(), fileName ? fileName[1] : 'workspace.gvs');
+                logToOutput(`Snapshot downloaded as ${fileName ? fileName[1] : 'workspace.gvs'}`, 'info');
+                return;
+            }
+
             const result = await response.json();
 
             if (!response.ok) {
@@ -1192,6 +1288,33 @@ Available commands:
             }
             
             logToOutput('Command executed successfully.', 'success');
+            if (result.explain) {
+                logExplain(result.explain);
+                return;
+            }
+            if (result.cache) {
+                const c = result.cache;
+                logToOutput(`Query cache: ${c.entries}/${c.max_entries} entries, ~${Math.round(c.bytes / 1024)} of ${Math.round(c.max_bytes / 1024)} KiB, `
+                    + `${c.hits} hits, ${c.misses} misses, ${c.evictions} evictions`, 'info');
+                return;
+            }
+            if (result.memory) {
+                const m = result.memory;
+                const lines = m.workspaces.map(w => `${w.id}${w.active ? ' (active)' : ''} - ~${Math.round(w.estimated_bytes / 1024)} KiB`
+                    + (w.resident ? ' in memory' : `, spilled to disk (${Math.round(w.disk_bytes / 1024)} KiB)`));
+                lines.push(`Budget: ${Math.round(m.budget / 1024)} KiB`);
+                logToOutput(lines.join('<br>'), 'info');
+                return;
+            }
+            if (result.history) {
+                const lines = result.history.map((h, i) => `${i + 1}. ${h.label} - ${h.evicted ? 'evicted (recomputed on demand)' : `~${Math.round(h.bytes / 1024)} KiB`}`);
+                logToOutput(lines.length ? lines.join('<br>') : 'No queries applied.', 'info');
+                return;
+            }
+            if (result.indexes) {
+                logIndexes(result);
+                return;
+            }
             redrawGraph(result.graph);
 
         } catch (error) {
@@ -1199,6 +1322,20 @@ Available commands:
         }
     }
     
+    function logExplain(explain) {
+        const escape = text => text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+        const steps = explain.plan.map(line => escape(line).replace(/^( +)/, m => '&nbsp;'.repeat(m.length)));
+        logToOutput(`${escape(explain.expression)} -&gt; ${explain.rows} nodes in ${explain.ms} ms<br>${steps.join('<br>')}`, 'info');
+    }
+
+    function logIndexes(result) {
+        if (result.dropped) {
+            logToOutput(`Dropped: ${result.dropped.join(', ') || '(none)'}`, 'info');
+        }
+        const lines = result.indexes.map(ix => `${ix.attr}: ${ix.entries} entries, ~${Math.round(ix.bytes / 1024)} KiB`);
+        logToOutput(lines.length ? lines.join('<br>') : 'No attribute indexes.', 'info');
+    }
+
     function redrawGraph(graphData) {
         simpleInit()
         blockInit()
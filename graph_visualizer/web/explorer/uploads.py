@@ -0,0 +1,90 @@
+"""
+Upload handler that feeds a dataset to its loader while it arrives.
+
+Django normally buffers an upload in memory or in a temporary file before
+the view runs. StreamingUploadHandler instead writes each chunk into a
+BytePipe read by a load job, so the graph is built as the bytes come in
+and neither the upload nor a copy of it is held whole anywhere. The job is
+started held; the view releases it once the request turned out valid.
+"""
+from typing import Callable, Optional
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from core.load_jobs import BytePipe, LoadJob
+
+
+class StreamedUpload(UploadedFile):
+    """Stands in for a file that went to `job` (or was refused with `error`) instead of being stored."""
+
+    def __init__(self, name, content_type, size, charset, job: Optional[LoadJob], error: Optional[str]):
+        super().__init__(None, name, content_type, size, charset)
+        self.job = job
+        self.error = error
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Streams the `field_name` file into the job `start(file_name, pipe,
+    expected_bytes)` returns. When `start` returns None the file is left to
+    the next handlers; when it raises ValueError the data is dropped and
+    the message kept on the StreamedUpload.
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(self, request, start: Callable[[str, BytePipe, Optional[int]], Optional[LoadJob]],
+                 field_name: str = "file"):
+        super().__init__(request)
+        self.start = start
+        self.field_name = field_name
+        self.expected_bytes: Optional[int] = None
+        self.pipe: Optional[BytePipe] = None
+        self.job: Optional[LoadJob] = None
+        self.error: Optional[str] = None
+        self.streaming = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # the request's length stands in for the file's, which browsers do not send
+        self.expected_bytes = content_length or None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.streaming = False
+        if field_name != self.field_name or self.job is not None or self.error is not None:
+            return
+        pipe = BytePipe()
+        try:
+            job = self.start(file_name, pipe, content_length or self.expected_bytes)
+        except ValueError as e:
+            self.error = str(e)
+        else:
+            if job is None:
+                return
+            self.pipe, self.job = pipe, job
+        self.streaming = True
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.streaming:
+            return raw_data
+        if self.pipe is not None:
+            self.pipe.put(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.streaming:
+            return None
+        self.streaming = False
+        if self.pipe is not None:
+            self.pipe.finish()
+        return StreamedUpload(self.file_name, self.content_type, file_size, self.charset, self.job, self.error)
+
+    def upload_interrupted(self):
+        if self.pipe is not None:
+            self.pipe.abort(ValueError("The upload was interrupted"))
+
+    def close(self) -> None:
+        """Cancels a job the view did not release, e.g. after a failed CSRF check."""
+        if self.pipe is not None:
+            self.pipe.abort(ValueError("The upload was not completed"))
+        if self.job is not None and self.job.held:
+            self.job.cancel()
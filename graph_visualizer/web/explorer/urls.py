@@ -8,6 +8,8 @@ urlpatterns = [
     path("reset", views.reset_workspace, name="reset_workspace"),
     path("remove-query", views.remove_query, name="remove_query"),
     path('create-workspace/', views.create_workspace, name='create_workspace'),
+    path('load-jobs/<str:job_id>/', views.load_job, name='load_job'),
+    path('load-jobs/<str:job_id>/cancel/', views.cancel_load_job, name='cancel_load_job'),
     path('switch-workspace/<str:wspace_id>/', views.switch_workspace, name='switch_workspace'),
     path('close-workspace/<str:wspace_id>/', views.close_workspace, name='close_workspace'),
     path("switch-visualizer/<str:visualizer_key>/", views.switch_visualizer, name="switch_visualizer"),
@@ -1,24 +1,48 @@
 import json
 from django.http import JsonResponse
 from django.shortcuts import render, redirect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse, HttpRequest
-from core.workspace_manager import WorkspaceManager
+from django.http import FileResponse, JsonResponse, HttpRequest
+from django.conf import settings
+from core.workspace_manager import SessionWorkspaces, WorkspaceManager
 from core.render_service import render_graph_html
 from core.tree_render import render_tree_details
 from core.bird_render import render_bird_svg
 from core.search_filter import FilterParseError, FilterTypeError
+from core.query_strategies import RESULT_CACHE
+from core.graph_cache import GRAPH_CACHE
+from core.load_jobs import FAILED, LOAD_JOBS
 import os
+import tempfile
+from core.snapshot import SnapshotError
 from core.plugin_registry import get_plugin_names, PLUGINS
 from django.urls import reverse
+from .uploads import StreamingUploadHandler
 from graph_visualizer.plugins.data_source.json_data_source.json_data_source import JsonDataSourceLoader
 from graph_visualizer.plugins.data_source.xml_data_source.xml_data_source import XmlDataSourceLoader
+from graph_visualizer.plugins.data_source.csv_data_source.csv_data_source import CsvDataSourceLoader
 from plugins.data_source.json_data_source.dataset.dataset_config import (
     PEOPLE_JSON_CONFIG, NETWORK_JSON_CONFIG, SOCIAL_JSON_CONFIG, PROJECT_JSON_CONFIG
 )
 
-# One global manager instance
-_WS_MANAGER = WorkspaceManager()
+# one workspace manager per session; idle sessions are dropped with their cookie's lifetime.
+# Set GRAPH_EXPLORER_SHARED_DIR to share the workspaces between worker processes.
+_SESSIONS = SessionWorkspaces(idle_timeout=settings.SESSION_COOKIE_AGE)
+
+# commands that only read the workspace and can run alongside renders
+_READ_COMMANDS = {'explain', 'history', 'list-indexes'}
+
+def _manager(request: HttpRequest) -> WorkspaceManager:
+    if not request.session.session_key:
+        request.session.create()
+    return _SESSIONS.get(request.session.session_key)
+
+# seconds a form upload waits for its load job, so small files open at once as before
+LOAD_WAIT = 2.0
+
+def _wants_json(request: HttpRequest) -> bool:
+    return "application/json" in request.headers.get("Accept", "")
 
 JSON_CONFIGS = {
     c["file_name"]: c for c in [PEOPLE_JSON_CONFIG, NETWORK_JSON_CONFIG, SOCIAL_JSON_CONFIG, PROJECT_JSON_CONFIG]
@@ -43,23 +67,73 @@ def home(request):
 
     }
 
-    active_ws = _WS_MANAGER.get_active()
-    if active_ws:
-        ctx.update({
-            "main_html": render_graph_html(active_ws.current, visualizer_key, width=1000, height=620),
-            "tree_html": render_tree_details(active_ws.current),
-            "bird_html": render_bird_svg(active_ws.current),
-            "applied_queries": active_ws.queries,
-            "stats": {"nodes": len(active_ws.current.nodes), "edges": len(active_ws.current.edges)},
-            "workspaces": _WS_MANAGER.get_all(),
-            "active_id": _WS_MANAGER.active_id,
-        })
+ 
+    manager = _manager(request)
+    load_jobs = []
+    for job in LOAD_JOBS.of(manager):
+        if not job.finished:
+            load_jobs.append(job.report())
+            continue
+        # a finished job is reported once, on the next page view
+        LOAD_JOBS.discard(job.id)
+        if job.status == FAILED and not ctx["error"]:
+            ctx["error"] = f"{job.name}: {job.error}"
+    ctx["load_jobs"] = load_jobs
+
+    with manager.use() as active_ws:
+        if active_ws:
+            ctx.update({
+                "main_html": render_graph_html(active_ws.current, visualizer_key, width=1000, height=620),
+                "tree_html": render_tree_details(active_ws.current),
+                "bird_html": render_bird_svg(active_ws.current),
+                "applied_queries": active_ws.queries,
+                "stats": {"nodes": len(active_ws.current.nodes), "edges": len(active_ws.current.edges)},
+                "workspaces": manager.get_all(),
+                "active_id": manager.active_id,
+            })
         
     return render(request, "explorer.html", ctx)
 
 
+def _loader_for(file_name: str):
+    _, file_extension = os.path.splitext(file_name)
+    if file_extension.lower() == ".json":
+        config = JSON_CONFIGS.get(file_name)
+        if not config:
+            raise ValueError(f"No configuration found for JSON file: {file_name}")
+        return JsonDataSourceLoader(config)
+    if file_extension.lower() == ".xml":
+        # load jobs go through GraphCache, which keeps graphs by content hash already
+        return XmlDataSourceLoader(cache=False)
+    if file_extension.lower() in (".csv", ".tsv"):
+        # an edge list, or a node list; the delimiter is taken from the header row
+        return CsvDataSourceLoader()
+    raise ValueError(f"Unsupported file type: {file_extension}")
+
+@csrf_exempt
 @require_http_methods(["POST"])
 def create_workspace(request):
+    # datasets are parsed while they upload: the handler has to be in place before
+    # anything (the CSRF check included) reads request.POST, so that check runs below
+    manager = _manager(request)
+
+    def start(file_name, pipe, expected_bytes):
+        if file_name.lower().endswith(".gvs"):
+            return None
+        # loaded in the background through GRAPH_CACHE: every workspace on the same dataset
+        # shares one graph until it edits it; GRAPH_EXPLORER_GRAPH_CACHE_DIR adds a disk tier
+        return LOAD_JOBS.submit(manager, _loader_for(file_name), pipe, name=file_name,
+                                total_bytes=expected_bytes, held=True)
+
+    handler = StreamingUploadHandler(request, start)
+    request.upload_handlers.insert(0, handler)
+    try:
+        return _create_workspace(request)
+    finally:
+        handler.close()
+
+@csrf_protect
+def _create_workspace(request):
     try:
         uploaded_file = request.FILES.get("file")
 
@@ -69,54 +143,68 @@ def create_workspace(request):
         file_name = uploaded_file.name
         _, file_extension = os.path.splitext(file_name)
 
-        if file_extension.lower() == ".json":
-            config = JSON_CONFIGS.get(file_name)
-            if not config:
-                raise ValueError(f"No configuration found for JSON file: {file_name}")
-            
-            loader = JsonDataSourceLoader(config)
-            
-            BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            file_path = os.path.join(BASE_DIR, "plugins", "data_source", "json_data_source", "dataset", file_name)
-            
-        elif file_extension.lower() == ".xml":
-            loader = XmlDataSourceLoader()
-            
-            BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            file_path = os.path.join(BASE_DIR, "plugins", "data_source", "xml_data_source", "data", file_name)
-            
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
-
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}. Make sure it exists in the correct directory.")
-
-        graph = loader.load_data(file_path)
-        _WS_MANAGER.create_workspace(graph=graph)
-
-    except (ValueError, FileNotFoundError) as e:
+        if file_extension.lower() == ".gvs":
+            # a saved workspace: graph, queries and positions come back without re-parsing
+            fd, path = tempfile.mkstemp(suffix=".gvs")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in uploaded_file.chunks():
+                        f.write(chunk)
+                _manager(request).open_snapshot(path)
+            finally:
+                os.remove(path)
+            return redirect("home")
+
+        job = getattr(uploaded_file, "job", None)
+        if job is None:
+            raise ValueError(getattr(uploaded_file, "error", None) or f"Unsupported file type: {file_extension}")
+        job.release()
+        if _wants_json(request):
+            return JsonResponse({'status': 'success', 'job': job.report()})
+        if job.wait(LOAD_WAIT) and job.status == FAILED:
+            LOAD_JOBS.discard(job.id)
+            raise ValueError(job.error)
+
+    except (ValueError, FileNotFoundError, SnapshotError) as e:
         request.session["error"] = str(e)
     except Exception as e:
         request.session["error"] = f"An unexpected error occurred: {e}"
 
     return redirect("home")
 
+def load_job(request, job_id):
+    """Progress of a background load: status, bytes read of total_bytes, nodes built, and the workspace once done."""
+    job = LOAD_JOBS.get(job_id, _manager(request))
+    if job is None:
+        return JsonResponse({'error': 'No such load job'}, status=404)
+    return JsonResponse({'status': 'success', 'job': job.report()})
+
+@require_http_methods(["POST"])
+def cancel_load_job(request, job_id):
+    job = LOAD_JOBS.get(job_id, _manager(request))
+    if job is None:
+        return JsonResponse({'error': 'No such load job'}, status=404)
+    job.cancel()
+    if _wants_json(request):
+        return JsonResponse({'status': 'success', 'job': job.report()})
+    return redirect("home")
+
 @require_http_methods(["POST"])
 def switch_workspace(request, wspace_id):
-    _WS_MANAGER.switch_workspace(wspace_id)
+    _manager(request).switch_workspace(wspace_id)
     return redirect("home")
 
 @require_http_methods(["POST"])
 def close_workspace(request, wspace_id):
-    _WS_MANAGER.close_workspace(wspace_id)
+    _manager(request).close_workspace(wspace_id)
     return redirect("home")
 
 def apply_search(request):
     q = request.GET.get("q", "").strip()
     visualizer = request.GET.get("visualizer", "simple")
-    active_ws = _WS_MANAGER.get_active()
-    if active_ws and q:
-        active_ws.apply_search(q)
+    with _manager(request).use(write=True) as active_ws:
+        if active_ws and q:
+            active_ws.apply_search(q)
     return redirect(f"/?visualizer={visualizer}")
 
 def apply_filter(request):
@@ -124,53 +212,53 @@ def apply_filter(request):
     visualizer = request.GET.get("visualizer", "simple")
     if not expr: return redirect(f"/?visualizer={visualizer}")
     
-    active_ws = _WS_MANAGER.get_active()
-    if not active_ws: return redirect(f"/?visualizer={visualizer}")
-    
-    try:
-        active_ws.apply_filter(expr)
-    except (FilterParseError, FilterTypeError) as e:
-        request.session["error"] = str(e)
+    with _manager(request).use(write=True) as active_ws:
+        if not active_ws: return redirect(f"/?visualizer={visualizer}")
+
+        try:
+            active_ws.apply_filter(expr)
+        except (FilterParseError, FilterTypeError) as e:
+            request.session["error"] = str(e)
     return redirect(f"/?visualizer={visualizer}")
 
 
 @require_http_methods(["POST"])
 def reset_workspace(request):
-    active_ws = _WS_MANAGER.get_active()
-    if active_ws:
-        active_ws.reset()
+    with _manager(request).use(write=True) as active_ws:
+        if active_ws:
+            active_ws.reset()
     return redirect("home")
 
 @require_http_methods(["POST"])
 def remove_query(request):
     idx = int(request.POST.get("idx", "-1"))
-    active_ws = _WS_MANAGER.get_active()
-    if active_ws and idx >= 0:
-        active_ws.remove_query(idx)
+    with _manager(request).use(write=True) as active_ws:
+        if active_ws and idx >= 0:
+            active_ws.remove_query(idx)
     return redirect("home")
 
 @require_http_methods(["POST"])
 def switch_visualizer(request, visualizer_key):
-    active_ws = _WS_MANAGER.get_active()
-    if not active_ws:
-        return JsonResponse({
-            "html": "<p>No active workspace</p>",
-            "visualizer": visualizer_key
-        })
-
     try:
         body = json.loads(request.body)
         positions = body.get("positions", {})  
     except json.JSONDecodeError:
         positions = {}
 
-    html = render_graph_html(
-        active_ws.current,
-        visualizer_key,
-        width=1000,
-        height=620,
-        context={"positions": positions} 
-    )
+    with _manager(request).use() as active_ws:
+        if not active_ws:
+            return JsonResponse({
+                "html": "<p>No active workspace</p>",
+                "visualizer": visualizer_key
+            })
+
+        html = render_graph_html(
+            active_ws.current,
+            visualizer_key,
+            width=1000,
+            height=620,
+            context={"positions": positions} 
+        )
 
     return JsonResponse({
         "html": html,
@@ -181,9 +269,6 @@ def switch_visualizer(request, visualizer_key):
 def bird_render(request):
     try:
         data = json.loads(request.body.decode("utf-8"))
-        active_ws = _WS_MANAGER.get_active()
-        if not active_ws:
-            return JsonResponse({"error": "No active workspace"}, status=400)
 
         positions = {}
         for node_id, coords in (data.get("positions") or {}).items():
@@ -201,7 +286,13 @@ def bird_render(request):
             "visualizer": visualizer  
         }
 
-        html = render_bird_svg(active_ws.current, context=context)
+        with _manager(request).use() as active_ws:
+            if not active_ws:
+                return JsonResponse({"error": "No active workspace"}, status=400)
+            if positions:
+                # layout only, not graph state: replacing the dict is safe under the read lock
+                active_ws.positions = positions
+            html = render_bird_svg(active_ws.current, context=context)
         return JsonResponse({"html": html})
 
     except json.JSONDecodeError:
@@ -224,50 +315,93 @@ def handle_graph_command_api(request: HttpRequest):
         command = data.get('command')
         payload = data.get('payload', {})
         
-        active_ws = _WS_MANAGER.get_active()
-        if not active_ws:
-            return JsonResponse({'error': 'No active workspace'}, status=404)
-
-        if command == 'create-node':
-            active_ws.create_node(payload)
-        elif command == 'update-node':
-            node_id = payload.get('id')
-            updates = payload.get('updates')
-            if not node_id or updates is None:
-                raise ValueError("Update-node requires 'id' and 'updates'.")
-            active_ws.update_node(node_id, updates)
-        elif command == 'delete-node':
-            node_id = payload.get('id')
-            if not node_id:
-                raise ValueError("Delete-node requires 'id'.")
-            active_ws.delete_node(node_id)
-        elif command == 'create-edge': 
-            from_id = payload.get('from')
-            to_id = payload.get('to')
-            edge_type = payload.get('type', 'related')
-            if not from_id or not to_id:
-                raise ValueError("Create-edge requires 'from' and 'to' IDs.")
-            active_ws.create_edge(from_id, to_id, edge_type)
-        elif command == 'filter':
-            expression = payload.get('expression')
-            if not expression:
-                raise ValueError("The filter requires 'expression'.")
-            active_ws.apply_filter(expression)
-        elif command == 'search':
-            query = payload.get('query')
-            if query is None:
-                 raise ValueError("Search requires a 'query'.")
-            active_ws.apply_search(query)
-        else:
-            return JsonResponse({'error': f'Unknown command: {command}'}, status=400)
-
-        current_graph = active_ws.current
-        graph_json = {
-            "nodes": [{"id": n.id, "name": n.name, "attributes": n.attributes} for n in current_graph.nodes],
-            "edges": [{"id": e.id, "from": e.from_node.id, "to": e.to_node.id, "type": e.type} for e in current_graph.edges]
-        }
-        
-        return JsonResponse({'status': 'success', 'graph': graph_json})
+        manager = _manager(request)
+
+        if command == 'cache-stats':
+            return JsonResponse({'status': 'success', 'cache': RESULT_CACHE.stats(), 'graphs': GRAPH_CACHE.stats()})
+        if command == 'memory-report':
+            return JsonResponse({'status': 'success', 'memory': {
+                'budget': manager.memory_budget, 'workspaces': manager.memory_report()}})
+        if command == 'save-snapshot':
+            name = os.path.basename(payload.get('name') or manager.active_id or '')
+            if not name:
+                return JsonResponse({'error': 'No active workspace'}, status=404)
+            # sent as a download; the temporary file is deleted once the response is closed
+            f = tempfile.TemporaryFile()
+            try:
+                manager.save_snapshot(f)
+            except BaseException:
+                f.close()
+                raise
+            f.seek(0)
+            return FileResponse(f, as_attachment=True, filename=name if name.endswith('.gvs') else name + '.gvs',
+                                content_type='application/octet-stream')
+
+        with manager.use(write=command not in _READ_COMMANDS) as active_ws:
+            if not active_ws:
+                return JsonResponse({'error': 'No active workspace'}, status=404)
+
+            if command == 'create-node':
+                active_ws.create_node(payload)
+            elif command == 'update-node':
+                node_id = payload.get('id')
+                updates = payload.get('updates')
+                if not node_id or updates is None:
+                    raise ValueError("Update-node requires 'id' and 'updates'.")
+                active_ws.update_node(node_id, updates)
+            elif command == 'delete-node':
+                node_id = payload.get('id')
+                if not node_id:
+                    raise ValueError("Delete-node requires 'id'.")
+                active_ws.delete_node(node_id)
+            elif command == 'create-edge': 
+                from_id = payload.get('from')
+                to_id = payload.get('to')
+                edge_type = payload.get('type', 'related')
+                if not from_id or not to_id:
+                    raise ValueError("Create-edge requires 'from' and 'to' IDs.")
+                active_ws.create_edge(from_id, to_id, edge_type)
+            elif command == 'batch':
+                operations = payload.get('operations')
+                if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+                    raise ValueError("Batch requires 'operations': a list of {command, payload} objects.")
+                active_ws.batch(operations)
+            elif command == 'undo':
+                active_ws.undo()
+            elif command == 'redo':
+                active_ws.redo()
+            elif command == 'filter':
+                expression = payload.get('expression')
+                if not expression:
+                    raise ValueError("The filter requires 'expression'.")
+                active_ws.apply_filter(expression)
+            elif command == 'search':
+                query = payload.get('query')
+                if query is None:
+                     raise ValueError("Search requires a 'query'.")
+                active_ws.apply_search(query)
+            elif command == 'explain':
+                expression = payload.get('expression')
+                if not expression:
+                    raise ValueError("Explain requires 'expression'.")
+                return JsonResponse({'status': 'success', 'explain': active_ws.explain_filter(expression)})
+            elif command == 'history':
+                return JsonResponse({'status': 'success', 'history': active_ws.history_report()})
+            elif command == 'list-indexes':
+                return JsonResponse({'status': 'success', 'indexes': active_ws.list_indexes()})
+            elif command == 'drop-index':
+                dropped = active_ws.drop_index(payload.get('attr'))
+                return JsonResponse({'status': 'success', 'dropped': dropped, 'indexes': active_ws.list_indexes()})
+            else:
+                return JsonResponse({'error': f'Unknown command: {command}'}, status=400)
+
+            current_graph = active_ws.current
+            graph_json = {
+                "nodes": [{"id": n.id, "name": n.name, "attributes": n.attributes} for n in current_graph.nodes],
+                "edges": [{"id": e.id, "from": e.from_node.id, "to": e.to_node.id, "type": e.type} for e in current_graph.edges]
+            }
+
+            return JsonResponse({'status': 'success', 'graph': graph_json})
 
     except (ValueError, FilterParseError, FilterTypeError) as e:
         return JsonResponse({'error': str(e)}, status=400)